@@ -0,0 +1,282 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from PyQt6.QtCore import Qt, QEvent
+from PyQt6.QtGui import QKeyEvent
+from PyQt6.QtWidgets import QApplication
+
+import video_player
+from video_player import SubtitleCache, percentile
+
+
+class VirtualClock:
+    # Media clock advanced by the benchmark instead of wall time
+    def __init__(self):
+        self.now = 0
+
+    def advance(self, ms):
+        self.now += ms
+
+
+class FakeEventManager:
+    def __init__(self):
+        self.callbacks = {}
+
+    def event_attach(self, event_type, callback, *args):
+        self.callbacks[event_type] = (callback, args)
+
+    def event_detach(self, event_type):
+        self.callbacks.pop(event_type, None)
+
+
+class FakeMedia:
+    def __init__(self, path):
+        self.path = path
+        self.events = FakeEventManager()
+
+    def event_manager(self):
+        return self.events
+
+    def get_mrl(self):
+        return self.path
+
+    def parse_with_options(self, flags, timeout):
+        return -1  # Nothing to probe, the player preloads right away
+
+
+class FakeMediaPlayer:
+    # Stand-in for vlc.MediaPlayer: position moves only with the virtual clock
+    def __init__(self, clock, length=4 * 3600 * 1000):
+        self.clock = clock
+        self.length = length
+        self.position = 0
+        self.anchor = 0
+        self.playing = False
+        self.media = None
+        self.events = FakeEventManager()
+
+    def get_time(self):
+        if self.playing:
+            return min(self.length, self.position + self.clock.now - self.anchor)
+        return self.position
+
+    def set_time(self, ms):
+        self.position = ms
+        self.anchor = self.clock.now
+
+    def play(self):
+        if not self.playing:
+            self.position = self.get_time()
+            self.anchor = self.clock.now
+            self.playing = True
+        return 0
+
+    def pause(self):
+        if self.playing:
+            self.position = self.get_time()
+            self.playing = False
+
+    def set_pause(self, paused):
+        if paused:
+            self.pause()
+        else:
+            self.play()
+
+    def is_playing(self):
+        return self.playing
+
+    def get_length(self):
+        return self.length
+
+    def set_media(self, media):
+        self.media = media
+
+    def get_media(self):
+        return self.media
+
+    def event_manager(self):
+        return self.events
+
+    def set_hwnd(self, handle):
+        pass
+
+    def set_xwindow(self, handle):
+        pass
+
+    def video_set_spu(self, track):
+        return 0
+
+    def video_set_subtitle_file(self, path):
+        return 0
+
+    def audio_set_mute(self, mute):
+        pass
+
+    def stop(self):
+        self.playing = False
+
+    def release(self):
+        pass
+
+
+class FakeInstance:
+    def __init__(self, clock):
+        self.clock = clock
+
+    def media_player_new(self):
+        return FakeMediaPlayer(self.clock)
+
+    def media_new(self, path, *options):
+        return FakeMedia(path)
+
+    def release(self):
+        pass
+
+
+def format_srt_time(ms):
+    return '%02d:%02d:%02d,%03d' % (ms // 3600000, ms // 60000 % 60,
+                                    ms // 1000 % 60, ms % 1000)
+
+
+def write_srt(path, cue_count, label):
+    start = 1000
+    with open(path, 'w', encoding='utf-8') as f:
+        for index in range(1, cue_count + 1):
+            end = start + 1500 + index % 7 * 150
+            f.write(f"{index}\n{format_srt_time(start)} --> {format_srt_time(end)}\n"
+                    f"{label} line {index}\n\n")
+            start = end + 300 + index % 5 * 40
+
+
+# A cached reopen skips parsing: it must take well under a cold parse
+CACHED_LOAD_MAX_FRACTION = 0.5
+CACHED_LOAD_FLOOR_MS = 50  # Below this, fixed costs dominate either way
+
+
+def process_events_until(app, condition):
+    while not condition():
+        app.processEvents()
+
+
+def make_player(clock, cache_dir):
+    video_player.load_vlc().Instance = lambda *args: FakeInstance(clock)
+    player = video_player.VideoPlayer()
+    player.subtitle_cache = SubtitleCache(cache_dir)
+    player.thumbnail_cache = None  # The fake player has no frames to grab
+    player.search_index = video_player.SubtitleSearchIndex(
+        os.path.join(cache_dir, 'search.sqlite3'))
+    player.review_store = video_player.ReviewStore(os.path.join(cache_dir, 'review.sqlite3'))
+    return player
+
+
+def bench_load(app, player, english_path, persian_path):
+    started = time.perf_counter()
+    player.load_subtitle(english_path, 'english')
+    player.load_subtitle(persian_path, 'persian')
+    process_events_until(app, lambda: not player.subtitle_tasks)
+    return (time.perf_counter() - started) * 1000
+
+
+def bench_ticks(player, clock, seconds):
+    # Play through the file, ticking every 100 ms of media time like the old timer
+    player.seek(0)
+    player.media_player.play()
+    player.is_playing = True
+    ticks = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        clock.advance(100)
+        player.update_subtitle()
+        if not player.media_player.is_playing():
+            player.media_player.play()
+            player.is_playing = True
+        ticks += 1
+    return ticks / (time.perf_counter() - started)
+
+
+KEYS = [
+    ('Right', Qt.Key.Key_Right, Qt.KeyboardModifier.NoModifier),
+    ('Ctrl+Right', Qt.Key.Key_Right, Qt.KeyboardModifier.ControlModifier),
+    ('Left', Qt.Key.Key_Left, Qt.KeyboardModifier.NoModifier),
+    ('Down', Qt.Key.Key_Down, Qt.KeyboardModifier.NoModifier),
+    ('Up', Qt.Key.Key_Up, Qt.KeyboardModifier.NoModifier),
+    ('Space', Qt.Key.Key_Space, Qt.KeyboardModifier.NoModifier),
+]
+
+
+def bench_keys(player, clock, presses):
+    timeline = player.primary_track.timeline
+    latencies = {name: [] for name, _, _ in KEYS}
+    random.seed(1)
+    for _ in range(presses):
+        # Jump somewhere random so every press sees a different cue
+        player.seek(random.randrange(timeline.ends[-1]))
+        player.find_current_subtitle_index()
+        for name, key, modifiers in KEYS:
+            event = QKeyEvent(QEvent.Type.KeyPress, key, modifiers)
+            started = time.perf_counter()
+            player.keyPressEvent(event)
+            latencies[name].append((time.perf_counter() - started) * 1e6)
+            clock.advance(50)
+    return {name: sorted(values) for name, values in latencies.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark VideoPlayer hot paths against a fake libvlc player")
+    parser.add_argument('--sizes', default='1000,10000,50000,200000',
+                        help="Comma separated cue counts")
+    parser.add_argument('--tick-seconds', type=float, default=1.0)
+    parser.add_argument('--presses', type=int, default=200)
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    work_dir = tempfile.mkdtemp(prefix='bench_player_')
+    video_path = os.path.join(work_dir, 'video.mkv')
+    open(video_path, 'wb').close()
+    slow_cached_loads = []
+
+    for cue_count in [int(size) for size in args.sizes.split(',')]:
+        english_path = os.path.join(work_dir, f'english_{cue_count}.srt')
+        persian_path = os.path.join(work_dir, f'persian_{cue_count}.srt')
+        write_srt(english_path, cue_count, 'english')
+        write_srt(persian_path, cue_count, 'persian')
+
+        clock = VirtualClock()
+        cache_dir = os.path.join(work_dir, f'cache_{cue_count}')
+        os.makedirs(cache_dir)
+        player = make_player(clock, cache_dir)
+        player.load_video(video_path)
+        cold_ms = bench_load(app, player, english_path, persian_path)
+        player.load_video(video_path)
+        cached_ms = bench_load(app, player, english_path, persian_path)
+
+        ticks_per_second = bench_ticks(player, clock, args.tick_seconds)
+        key_latencies = bench_keys(player, clock, args.presses)
+        player.close()
+
+        print(f"\n{cue_count} cues")
+        print(f"  load (both tracks): cold {cold_ms:.1f} ms, cached {cached_ms:.1f} ms")
+        if cached_ms > max(cold_ms * CACHED_LOAD_MAX_FRACTION, CACHED_LOAD_FLOOR_MS):
+            slow_cached_loads.append(cue_count)
+        print(f"  update_subtitle:    {ticks_per_second:,.0f} ticks/s")
+        print(f"  {'key':<12}{'p50 us':>10}{'p95 us':>10}{'p99 us':>10}")
+        for name, values in key_latencies.items():
+            print(f"  {name:<12}{percentile(values, 0.5):>10.1f}"
+                  f"{percentile(values, 0.95):>10.1f}{percentile(values, 0.99):>10.1f}")
+
+    if slow_cached_loads:
+        print(f"\nFAIL: cached load not under {CACHED_LOAD_MAX_FRACTION:.0%} of the cold load "
+              f"for {', '.join(map(str, slow_cached_loads))} cues")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import pysrt
+from video_player import CueStore, parse_subtitle_file
+
+
+def format_srt_time(ms):
+    return '%02d:%02d:%02d,%03d' % (ms // 3600000, ms // 60000 % 60,
+                                    ms // 1000 % 60, ms % 1000)
+
+
+def write_synthetic_srt(path, size_mb):
+    # Auto-transcript style file: short back-to-back cues of two lines
+    target_size = size_mb * 1024 * 1024
+    start = 0
+    index = 1
+    with open(path, 'w', encoding='utf-8') as f:
+        while f.tell() < target_size:
+            end = start + 1800
+            f.write(f"{index}\n{format_srt_time(start)} --> {format_srt_time(end)}\n"
+                    f"this is synthetic transcript line number {index}\n"
+                    f"with a second line of <i>text</i> for wrapping\n\n")
+            start = end + 200
+            index += 1
+    return index - 1
+
+
+def measure(label, func):
+    # Time and memory are taken in separate runs, tracemalloc slows parsing
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    del result
+
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<12} {elapsed:8.2f} s   peak {peak / (1024 * 1024):8.1f} MB   "
+          f"{len(result)} cues")
+    return elapsed, peak
+
+
+def parse_with_pysrt(path):
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        return pysrt.from_string(f.read())
+
+
+def parse_with_store(path):
+    store = CueStore()
+    for _ in parse_subtitle_file(path, store):
+        pass
+    store.finish()
+    return store
+
+
+def time_to_first_batch(path):
+    store = CueStore()
+    started = time.perf_counter()
+    batches = parse_subtitle_file(path, store)
+    next(batches)
+    elapsed = time.perf_counter() - started
+    batches.close()
+    print(f"{'first batch':<12} {elapsed * 1000:8.2f} ms  {len(store)} cues usable")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the streaming cue parser against pysrt")
+    parser.add_argument('--size-mb', type=int, default=50)
+    parser.add_argument('--file', help="Existing subtitle file to use instead")
+    args = parser.parse_args()
+
+    if args.file:
+        path = args.file
+    else:
+        path = os.path.join(tempfile.gettempdir(), f"bench_{args.size_mb}mb.srt")
+        if not os.path.exists(path):
+            cues = write_synthetic_srt(path, args.size_mb)
+            print(f"Generated {path} with {cues} cues")
+
+    print(f"File size: {os.path.getsize(path) / (1024 * 1024):.1f} MB")
+    time_to_first_batch(path)
+    store_time, store_peak = measure('CueStore', lambda: parse_with_store(path))
+    pysrt_time, pysrt_peak = measure('pysrt', lambda: parse_with_pysrt(path))
+
+    # The streaming parser exists to beat pysrt on both counts
+    failures = []
+    if store_time >= pysrt_time:
+        failures.append("parse time")
+    if store_peak >= pysrt_peak:
+        failures.append("peak memory")
+    if failures:
+        print(f"\nFAIL: CueStore is not below pysrt in {' and '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -25,14 +25,12 @@ pyinstaller --clean ^
     --name "Language_Learning_Video_Player" ^
     --add-data "LICENSE;." ^
     --hidden-import=vlc ^
-    --hidden-import=pysrt ^
     --hidden-import=PyQt6 ^
     --hidden-import=PyQt6.QtCore ^
     --hidden-import=PyQt6.QtGui ^
     --hidden-import=PyQt6.QtWidgets ^
     --collect-all vlc ^
     --exclude-module matplotlib ^
-    --exclude-module numpy ^
     --exclude-module PIL ^
     --exclude-module tkinter ^
     src/video_player.py
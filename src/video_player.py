@@ -1,65 +1,4285 @@
 import sys
 import os
+import time
+
+# Taken before the heavy imports so the startup timeline covers them
+STARTUP_BEGIN = time.perf_counter()
+
+import bz2
+import codecs
 import ctypes
-import webbrowser
+import hashlib
+import heapq
+import html
+import io
+import json
+import mmap
+import multiprocessing
+import re
+import sqlite3
+import struct
+import tempfile
+import threading
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict, deque, namedtuple
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor,
+                                as_completed, wait)
+from itertools import compress, repeat
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QPushButton, QFileDialog, QLabel,
-                             QSplitter, QDialog, QTextBrowser, QMessageBox)
-from PyQt6.QtCore import Qt, QTimer
-from PyQt6.QtGui import QFont, QColor
-import pysrt
-
-# Try to import VLC with better error handling
-try:
-    import vlc
-except (ImportError, OSError, ctypes.ArgumentError) as e:
-    # Use a safer way to find VLC
-    if sys.platform.startswith('win'):
-        # Predefined paths instead of environment variables
-        program_files = os.path.expandvars(r"C:\Program Files")
-        program_files_x86 = os.path.expandvars(r"C:\Program Files (x86)")
-        local_appdata = os.path.expandvars(r"%LOCALAPPDATA%")
-
-        vlc_paths = [
-            os.path.join(program_files, 'VideoLAN', 'VLC'),
-            os.path.join(program_files_x86, 'VideoLAN', 'VLC'),
-            os.path.join(local_appdata, 'Programs', 'VideoLAN', 'VLC')
-        ]
-
-        # Use a safer PATH modification approach
-        for path in vlc_paths:
-            if os.path.exists(path) and os.path.isdir(path):
-                current_path = os.environ.get('PATH', '')
-                if path not in current_path:
-                    os.environ['PATH'] = path + os.pathsep + current_path
+                             QSplitter, QDialog, QTextBrowser, QMessageBox,
+                             QInputDialog, QLineEdit, QListWidget,
+                             QListWidgetItem, QListView, QAbstractItemView,
+                             QDockWidget, QSpinBox, QCheckBox, QComboBox)
+from PyQt6.QtCore import (Qt, QTimer, QObject, QStandardPaths, QPointF, QSize,
+                          QRunnable, QThread, QThreadPool, pyqtSignal,
+                          QAbstractListModel, QModelIndex)
+from PyQt6.QtGui import (QFont, QBrush, QColor, QIcon, QImage, QPainter, QPixmap, QStaticText,
+                         QTextOption, QTransform)
+
+
+class StartupTimeline:
+    # Milestones since process start (import, Qt init, VLC init, first paint)
+    def __init__(self, begin):
+        self.begin = begin
+        self.marks = []
+
+    def mark(self, name):
+        self.marks.append((name, (time.perf_counter() - self.begin) * 1000))
+
+    def as_dict(self):
+        return {name: round(ms, 1) for name, ms in self.marks}
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.as_dict(), f, indent=2)
+        for name, ms in self.marks:
+            print(f"{ms:9.1f} ms  {name}")
+
+
+startup_timeline = StartupTimeline(STARTUP_BEGIN)
+startup_timeline.mark('imports')
+
+# Dump the timeline once VLC is up: --startup-timeline or VPLL_STARTUP_TIMELINE=1
+STARTUP_TIMELINE_REQUESTED = ('--startup-timeline' in sys.argv or
+                              os.environ.get('VPLL_STARTUP_TIMELINE') == '1')
+
+# Keep a second player parked at the next likely jump: --preseek or VPLL_PRESEEK=1
+PRESEEK_REQUESTED = '--preseek' in sys.argv or os.environ.get('VPLL_PRESEEK') == '1'
+
+# Time the hot handlers into a rotating log: --profile or VPLL_PROFILE=1
+PROFILE_REQUESTED = '--profile' in sys.argv or os.environ.get('VPLL_PROFILE') == '1'
+hot_path_profiler = None  # HotPathProfiler once installed
+
+vlc = None  # Imported on first use, see load_vlc()
+
+
+def load_vlc():
+    # Import python-vlc, adding the usual install folders to PATH on Windows
+    # if libvlc is not found. Deferred so the window can show first.
+    global vlc
+    if vlc is not None:
+        return vlc
+
+    # Try to import VLC with better error handling
+    try:
+        import vlc as vlc_module
+    except (ImportError, OSError, ctypes.ArgumentError):
+        # Use a safer way to find VLC
+        if sys.platform.startswith('win'):
+            # Predefined paths instead of environment variables
+            program_files = os.path.expandvars(r"C:\Program Files")
+            program_files_x86 = os.path.expandvars(r"C:\Program Files (x86)")
+            local_appdata = os.path.expandvars(r"%LOCALAPPDATA%")
+
+            vlc_paths = [
+                os.path.join(program_files, 'VideoLAN', 'VLC'),
+                os.path.join(program_files_x86, 'VideoLAN', 'VLC'),
+                os.path.join(local_appdata, 'Programs', 'VideoLAN', 'VLC')
+            ]
+
+            # Use a safer PATH modification approach
+            for path in vlc_paths:
+                if os.path.exists(path) and os.path.isdir(path):
+                    current_path = os.environ.get('PATH', '')
+                    if path not in current_path:
+                        os.environ['PATH'] = path + os.pathsep + current_path
+                    break
+
+        import vlc as vlc_module
+
+    vlc = vlc_module
+    startup_timeline.mark('vlc_import')
+    return vlc
+
+
+np = None  # NumPy, imported on first use, see load_numpy()
+
+
+def load_numpy():
+    # Subtitle sync and the merged index need NumPy, keep it out of start-up
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+def show_vlc_missing():
+    # Create message box without web browser launch
+    msg_box = QMessageBox()
+    msg_box.setWindowTitle("VLC Not Found")
+    msg_box.setText(
+        "VLC Media Player is required but was not found.")
+    msg_box.setInformativeText(
+        "Please install VLC from videolan.org")
+    msg_box.setStandardButtons(QMessageBox.StandardButton.Ok)
+    msg_box.exec()
+    sys.exit(1)
+
+
+APP_DIR_NAME = 'video-player-for-language-learners'
+
+
+def app_cache_dir(*parts):
+    # Per-user cache folder for data that can always be rebuilt
+    base = QStandardPaths.writableLocation(
+        QStandardPaths.StandardLocation.GenericCacheLocation)
+    path = os.path.join(base, APP_DIR_NAME, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def app_data_dir(*parts):
+    # Per-user folder for data that cannot be rebuilt, like review progress
+    base = QStandardPaths.writableLocation(
+        QStandardPaths.StandardLocation.GenericDataLocation)
+    path = os.path.join(base, APP_DIR_NAME, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class SubtitleTimeline:
+    # Sorted integer-millisecond index over one subtitle track.
+    # Built once per load so lookups during playback are O(log n) bisects
+    # instead of recomputing cue times on every tick.
+    def __init__(self, starts=(), ends=()):
+        self.starts = array('q', starts)
+        self.ends = array('q', ends)
+        self.rebuild_max_ends()
+
+    def rebuild_max_ends(self):
+        # Running maximum of end times, lets bisect find overlapping cues
+        self.max_ends = array('q')
+        running_end = -1
+        for end_time in self.ends:
+            if end_time > running_end:
+                running_end = end_time
+            self.max_ends.append(running_end)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def span(self, index):
+        return self.starts[index], self.ends[index]
+
+    def cue_at(self, time):
+        # First cue whose [start, end] contains time, or -1
+        last_started = bisect_right(self.starts, time) - 1
+        first_open = bisect_left(self.max_ends, time)
+        if first_open <= last_started:
+            return first_open
+        return -1
+
+    def index_at(self, time):
+        # Cue to treat as current: the one playing, otherwise the last one
+        # that already started (0 before the first cue)
+        index = self.cue_at(time)
+        if index >= 0:
+            return index
+        return max(0, bisect_right(self.starts, time) - 1)
+
+    def next_cue(self, time):
+        # First cue starting after time, or -1
+        index = bisect_right(self.starts, time)
+        return index if index < len(self.starts) else -1
+
+    def previous_cue(self, time):
+        # Last cue that has completely ended before time, or -1
+        return bisect_left(self.max_ends, time) - 1
+
+    def overlapping(self, range_start, range_end):
+        # Indexes of all cues that overlap [range_start, range_end]
+        first = bisect_left(self.max_ends, range_start)
+        last = bisect_right(self.starts, range_end)
+        return [i for i in range(first, last) if self.ends[i] >= range_start]
+
+
+Cue = namedtuple('Cue', 'start end text')
+
+
+class CueStore(SubtitleTimeline):
+    # Array-backed storage for one parsed track: start/end columns plus text.
+    # Cues are appended while the file streams in, so the store doubles as
+    # a live timeline that is usable before parsing finishes.
+    def __init__(self):
+        super().__init__()
+        self.texts = []
+        self.is_sorted = True
+
+    def append(self, start, end, text):
+        if self.starts and start < self.starts[-1]:
+            self.is_sorted = False
+        running_end = self.max_ends[-1] if self.max_ends else -1
+        self.starts.append(start)
+        self.ends.append(end)
+        self.max_ends.append(max(running_end, end))
+        self.texts.append(text)
+
+    def __getitem__(self, index):
+        return Cue(self.starts[index], self.ends[index], self.texts[index])
+
+    def __iter__(self):
+        for index in range(len(self.starts)):
+            yield self[index]
+
+    @classmethod
+    def from_columns(cls, starts, ends, max_ends, texts):
+        store = cls()
+        store.starts = starts
+        store.ends = ends
+        store.max_ends = max_ends
+        store.texts = texts
+        return store
+
+    def copy(self):
+        return CueStore.from_columns(array('q', self.starts), array('q', self.ends),
+                                     array('q', self.max_ends), list(self.texts))
+
+    def finish(self):
+        # Sort out-of-order cues (common in ASS files), returns True if moved
+        if self.is_sorted:
+            return False
+        order = sorted(range(len(self.starts)),
+                       key=lambda i: (self.starts[i], self.ends[i]))
+        self.starts = array('q', (self.starts[i] for i in order))
+        self.ends = array('q', (self.ends[i] for i in order))
+        self.texts = [self.texts[i] for i in order]
+        self.rebuild_max_ends()
+        self.is_sorted = True
+        return True
+
+
+class CueAlignment:
+    # Maps each primary (English) cue to the secondary cues that overlap it.
+    # Built with one sweep over both sorted timelines and stored CSR-style:
+    # indices[offsets[i]:offsets[i + 1]] are the partners of primary cue i.
+    def __init__(self, primary, secondary):
+        self.offsets = array('l', [0])
+        self.indices = array('l')
+        count = len(secondary)
+        first = 0  # Every secondary cue before this ends before the primary starts
+        last = 0   # Every secondary cue from here on starts after the primary ends
+        for start, end in zip(primary.starts, primary.ends):
+            while first < count and secondary.max_ends[first] <= start:
+                first += 1
+            while last < count and secondary.starts[last] < end:
+                last += 1
+            for j in range(first, last):
+                if secondary.starts[j] < end and secondary.ends[j] > start:
+                    self.indices.append(j)
+            self.offsets.append(len(self.indices))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def partners(self, index):
+        return self.indices[self.offsets[index]:self.offsets[index + 1]]
+
+
+class MergedTimeline:
+    # One interval index over every loaded track. The cue boundaries of all
+    # tracks cut the time axis into segments; per segment, each track has a
+    # column with the number of its cues that have started and the number
+    # that have closed for good (see max_ends). The first cue not closed
+    # yet is the one playing if it has started, so a single bisect per
+    # tick answers for all tracks at once.
+    def __init__(self, timelines):
+        # A track's answer only changes where a cue starts or just after its
+        # running end maximum (ends are inclusive). The counts per point
+        # are searchsorted in NumPy, no Python loop over the cues.
+        load_numpy()
+        columns = []
+        for timeline in timelines:
+            starts = np.sort(np.frombuffer(timeline.starts, dtype=np.int64))  # Partial loads may be unsorted
+            closes = np.frombuffer(timeline.max_ends, dtype=np.int64) + 1
+            columns.append((starts, closes))
+        points = np.unique(np.concatenate(
+            [column for pair in columns for column in pair] or [np.empty(0, np.int64)]))
+        self.points = array('q', points.tobytes())
+        self.started = []
+        self.closed = []
+        for starts, closes in columns:
+            self.started.append(array('q', np.searchsorted(
+                starts, points, side='right').astype(np.int64).tobytes()))
+            self.closed.append(array('q', np.searchsorted(
+                closes, points, side='right').astype(np.int64).tobytes()))
+
+    def segment_at(self, time):
+        return bisect_right(self.points, time) - 1
+
+    def next_boundary(self, segment):
+        # Time the segment after this one starts, or None past the last cue
+        if segment + 1 < len(self.points):
+            return self.points[segment + 1]
+        return None
+
+    def cue_at(self, column, segment):
+        # Same answer as SubtitleTimeline.cue_at for that track
+        if segment < 0:
+            return -1
+        first_open = self.closed[column][segment]
+        return first_open if first_open < self.started[column][segment] else -1
+
+    def index_at(self, column, segment):
+        # Same answer as SubtitleTimeline.index_at for that track
+        index = self.cue_at(column, segment)
+        if index >= 0:
+            return index
+        return max(0, self.started[column][segment] - 1) if segment >= 0 else 0
+
+
+class SubtitleTrack:
+    # One subtitle track: its cues, their source file and the label showing
+    # them. reveal_step is the practice visibility state from which the
+    # track appears (1: with the primary track, 2: with everything), and
+    # shown lets the user switch a track off entirely.
+    def __init__(self, key, title, reveal_step, label):
+        self.key = key
+        self.title = title
+        self.reveal_step = reveal_step
+        self.label = label
+        self.button = None
+        self.shown = True
+        self.store = None
+        self.timeline = None
+        self.path = None
+        self.alignment = None  # Primary cue -> overlapping cues of this track
+        self.sync = None  # (scale, offset) applied to the store's cue times
+        self.embedded_track = None  # Matroska track number when path is a video
+        self.column = None  # Column in the merged timeline while loaded
+        self.highlights = {}  # Cue text -> markup with its rare words coloured
+
+
+SyncResult = namedtuple('SyncResult', 'scale offset confidence matched')
+
+
+def occupancy_signal(starts, ends, length, resolution):
+    # 1.0 wherever a cue is on screen, one sample per resolution ms
+    first = np.clip(starts // resolution, 0, length).astype(np.int64)
+    last = np.clip(ends // resolution + 1, 0, length).astype(np.int64)
+    edges = (np.bincount(first, minlength=length + 1) -
+             np.bincount(last, minlength=length + 1))
+    return (np.cumsum(edges[:length]) > 0).astype(np.float32)
+
+
+class SubtitleSync:
+    # Finds the map t -> scale * t + offset that lines a track up with a
+    # reference track. Both tracks become occupancy signals and one FFT
+    # cross-correlation per common frame-rate ratio finds the best global
+    # offset; a least-squares fit over the cue starts that then coincide
+    # refines offset and drift to the millisecond.
+    RESOLUTION_MS = 50
+    MAX_OFFSET_MS = 10 * 60 * 1000
+    FRAME_RATE_RATIOS = (1.0, 25 / 23.976, 23.976 / 25, 25 / 24, 24 / 25,
+                         24 / 23.976, 23.976 / 24)
+    MATCH_TOLERANCE_MS = 1000
+    MIN_CONFIDENCE = 0.3  # Correlation of the signals at the best offset
+
+    def __init__(self, reference):
+        load_numpy()
+        self.reference_starts = np.frombuffer(reference.starts, dtype=np.int64)
+        self.reference_ends = np.frombuffer(reference.ends, dtype=np.int64)
+
+    def find(self, timeline, refine=True):
+        # SyncResult for the timeline, None if either track is empty.
+        # refine=False keeps the correlation's answer, for references such
+        # as detected speech whose starts are too loose to fit against.
+        starts = np.frombuffer(timeline.starts, dtype=np.int64)
+        ends = np.frombuffer(timeline.ends, dtype=np.int64)
+        if not len(starts) or not len(self.reference_starts):
+            return None
+
+        resolution = self.RESOLUTION_MS
+        max_lag = self.MAX_OFFSET_MS // resolution
+        last_time = max(int(self.reference_ends.max()),
+                        int(ends.max() * max(self.FRAME_RATE_RATIOS)))
+        length = last_time // resolution + 2
+        size = 1 << (length + max_lag).bit_length()  # No wrap-around within max_lag
+        # Zero-mean signals so the peak reads as a correlation coefficient
+        reference = occupancy_signal(self.reference_starts, self.reference_ends,
+                                     length, resolution)
+        reference -= reference.mean()
+        reference_norm = float(np.linalg.norm(reference))
+        reference_spectrum = np.fft.rfft(reference, size)
+
+        best = None
+        for ratio in self.FRAME_RATE_RATIOS:
+            signal = occupancy_signal(starts * ratio, ends * ratio, length, resolution)
+            signal -= signal.mean()
+            # correlation[k] = sum(reference[n + k] * signal[n]): signal shifted by k
+            correlation = np.fft.irfft(reference_spectrum * np.conj(np.fft.rfft(signal, size)), size)
+            candidates = np.concatenate((correlation[:max_lag + 1], correlation[-max_lag:]))
+            index = int(np.argmax(candidates))
+            lag = index if index <= max_lag else index - len(candidates)
+            score = candidates[index] / max(1e-9, reference_norm * float(np.linalg.norm(signal)))
+            if best is None or score > best[0]:
+                best = (float(score), ratio, lag * resolution)
+
+        confidence, scale, offset = best
+        scale, offset, matched = self.refine(starts, scale, offset, 3 if refine else 0)
+        return SyncResult(scale, offset, confidence, matched)
+
+    def refine(self, starts, scale, offset, iterations=3):
+        # Fit scale and offset on cue starts landing near a reference start
+        reference = self.reference_starts
+        matched = 0
+        for iteration in range(iterations + 1):
+            predicted = starts * scale + offset
+            after = np.clip(np.searchsorted(reference, predicted), 1, len(reference) - 1)
+            before = after - 1
+            nearest = np.where(np.abs(reference[before] - predicted) <=
+                               np.abs(reference[after] - predicted), before, after)
+            if len(reference) == 1:
+                nearest = np.zeros_like(nearest)
+            close = np.abs(reference[nearest] - predicted) <= self.MATCH_TOLERANCE_MS
+            matched = int(close.sum())
+            if matched < 10 or iteration == iterations:
+                break
+            scale, offset = np.polyfit(starts[close], reference[nearest[close]], 1)
+        return float(scale), float(offset), matched
+
+
+def corrected_timeline(timeline, scale, offset):
+    # Copy of the timeline moved by t -> scale * t + offset, same cue order
+    load_numpy()
+    corrected = SubtitleTimeline()
+    starts = np.rint(np.frombuffer(timeline.starts, dtype=np.int64) * scale + offset)
+    ends = np.rint(np.frombuffer(timeline.ends, dtype=np.int64) * scale + offset)
+    corrected.starts.frombytes(starts.astype(np.int64).tobytes())
+    corrected.ends.frombytes(ends.astype(np.int64).tobytes())
+    corrected.max_ends.frombytes(np.maximum.accumulate(ends).astype(np.int64).tobytes())
+    return corrected
+
+
+class SubtitleCache:
+    # On-disk cache of parsed cue stores so reopening a file skips parsing.
+    # index.json maps path|size|mtime to a content hash; each blob is named
+    # by that hash and holds the raw time columns plus one UTF-8 text block.
+    # Blob mtimes double as LRU order for size-bounded eviction. Tracks
+    # embedded in a video are keyed by stat and track number alone, since
+    # hashing a multi-GB video would cost more than extracting the track.
+    MAGIC = b'VPLC'
+    VERSION = 2  # 2: files are no longer always read as UTF-8
+    HEADER = struct.Struct('<4sHxxQQ32s')  # magic, version, cues, text bytes, hash
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()  # Loader threads share one cache
+        self.index_path = os.path.join(directory, 'index.json')
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    @staticmethod
+    def file_key(path, stat, embedded_track=None):
+        path = os.path.normcase(os.path.abspath(path))
+        key = f"{path}|{stat.st_size}|{stat.st_mtime_ns}"
+        return key if embedded_track is None else f"{key}|track{embedded_track}"
+
+    @staticmethod
+    def content_hash(path):
+        digest = hashlib.blake2b(digest_size=32)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def blob_path(self, content_hash):
+        return os.path.join(self.directory, content_hash + '.cues')
+
+    def lookup(self, path, embedded_track=None):
+        # Returns (store or None, content hash)
+        key = self.file_key(path, os.stat(path), embedded_track)
+        with self.lock:
+            content_hash = self.index.get(key)
+        if content_hash:
+            store = self.read_blob(content_hash)
+            if store is not None:
+                return store, content_hash
+        if embedded_track is not None:
+            return None, hashlib.blake2b(key.encode('utf-8'), digest_size=32).hexdigest()
+
+        # Unknown stat (touched, copied or new file): try by content
+        content_hash = self.content_hash(path)
+        store = self.read_blob(content_hash)
+        if store is not None:
+            with self.lock:
+                self.index[key] = content_hash
+                self.write_index()
+        return store, content_hash
+
+    def read_blob(self, content_hash):
+        blob_path = self.blob_path(content_hash)
+        try:
+            with open(blob_path, 'rb') as f:
+                data = f.read()
+            os.utime(blob_path)  # Mark as recently used
+        except OSError:
+            return None
+
+        try:
+            magic, version, count, text_size, digest = self.HEADER.unpack_from(data)
+            if (magic != self.MAGIC or version != self.VERSION or
+                    digest != bytes.fromhex(content_hash)):
+                return None
+
+            columns = []
+            offset = self.HEADER.size
+            for _ in range(3):
+                column = array('q')
+                column.frombytes(data[offset:offset + count * column.itemsize])
+                offset += count * column.itemsize
+                columns.append(column)
+            text_block = data[offset:offset + text_size].decode('utf-8')
+        except (struct.error, ValueError):
+            return None  # Truncated or foreign file, parse again
+
+        texts = text_block.split('\0') if count else []
+        if len(texts) != count or any(len(column) != count for column in columns):
+            return None
+        return CueStore.from_columns(columns[0], columns[1], columns[2], texts)
+
+    def save(self, path, content_hash, store, embedded_track=None):
+        text_block = '\0'.join(text.replace('\0', '') for text in store.texts)
+        text_bytes = text_block.encode('utf-8')
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, len(store),
+                                  len(text_bytes), bytes.fromhex(content_hash))
+
+        blob_path = self.blob_path(content_hash)
+        temp_path = blob_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(header)
+            f.write(store.starts.tobytes())
+            f.write(store.ends.tobytes())
+            f.write(store.max_ends.tobytes())
+            f.write(text_bytes)
+        os.replace(temp_path, blob_path)
+
+        with self.lock:
+            self.index[self.file_key(path, os.stat(path), embedded_track)] = content_hash
+            self.evict()
+            self.write_index()
+
+    def evict(self):
+        blobs = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.cues'):
+                stat = entry.stat()
+                blobs.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in blobs)
+        for _, size, blob_path in sorted(blobs):
+            if total <= self.max_bytes:
+                break
+            os.remove(blob_path)
+            total -= size
+
+        # Forget index entries whose blob is gone
+        live = {entry.name[:-5] for entry in os.scandir(self.directory)
+                if entry.name.endswith('.cues')}
+        self.index = {key: content_hash for key, content_hash in self.index.items()
+                      if content_hash in live}
+
+    def write_index(self):
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        os.replace(temp_path, self.index_path)
+
+
+def read_wav_samples(path):
+    # First channel of a 16-bit PCM WAV file as a read-only memmap, so a
+    # film's worth of audio is paged in as it is scanned instead of loaded
+    load_numpy()
+    channels = sample_rate = bits = None
+    with open(path, 'rb') as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:] != b'WAVE':
+            raise ValueError("Not a WAV file")
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError("WAV file has no audio data")
+            chunk_id, size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                _, channels, sample_rate, _, _, bits = struct.unpack_from('<HHIIHH', f.read(size))
+                f.seek(size % 2, os.SEEK_CUR)
+            elif chunk_id == b'data':
+                offset = f.tell()
+                break
+            else:
+                f.seek(size + size % 2, os.SEEK_CUR)
+    if bits != 16:
+        raise ValueError(f"Unsupported WAV format ({bits} bits)")
+    available = os.path.getsize(path) - offset
+    if not size or size > available:
+        size = available  # Header not finalized by the writer
+    count = size // (2 * channels)
+    if not count:
+        raise ValueError("WAV file has no audio data")
+    samples = np.memmap(path, dtype='<i2', mode='r', offset=offset, shape=(count, channels))
+    return samples[:, 0], sample_rate
+
+
+def detect_speech(samples, sample_rate, frame_ms=20, hangover_ms=300, min_speech_ms=150):
+    # Energy-based voice activity detection. Frame energies of the
+    # differentiated signal (a cheap high-pass against rumble and music bass)
+    # are compared with a threshold set from the file's own noise floor and
+    # loud level; a moving average bridges the gaps between words. Returns
+    # the speech regions as a SubtitleTimeline in milliseconds.
+    load_numpy()
+    frame = max(1, sample_rate * frame_ms // 1000)
+    frame_count = len(samples) // frame
+    energy = np.empty(frame_count, dtype=np.float32)
+    chunk_frames = max(1, (1 << 20) // frame)  # Bounded memory on long films
+    for first in range(0, frame_count, chunk_frames):
+        last = min(frame_count, first + chunk_frames)
+        block = np.asarray(samples[first * frame:last * frame], dtype=np.float32)
+        block = np.diff(block.reshape(last - first, frame), axis=1)
+        energy[first:last] = np.log10(np.einsum('ij,ij->i', block, block) / frame + 1.0) * 10
+
+    timeline = SubtitleTimeline()
+    if not frame_count:
+        return timeline
+    noise_floor, loud = np.percentile(energy, (10, 95))
+    threshold = noise_floor + max(6.0, (loud - noise_floor) * 0.4)
+    active = (energy > threshold).astype(np.float32)
+    window = max(1, hangover_ms // frame_ms)
+    active = np.convolve(active, np.ones(window, dtype=np.float32) / window, 'same') > 0.2
+
+    edges = np.diff(np.concatenate(([0], active.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1) * frame_ms
+    ends = np.flatnonzero(edges == -1) * frame_ms - 1
+    keep = ends - starts >= min_speech_ms
+    starts, ends = starts[keep].astype(np.int64), ends[keep].astype(np.int64)
+    timeline.starts.frombytes(starts.tobytes())
+    timeline.ends.frombytes(ends.tobytes())
+    timeline.max_ends.frombytes(ends.tobytes())  # Regions never overlap
+    return timeline
+
+
+class SpeechActivityCache:
+    # Speech regions found in each video's audio, one small file per video
+    # named after its video_fingerprint(), so renaming or moving the video
+    # keeps them. Reading them back is instant, while finding them means
+    # decoding the whole audio track again.
+    MAGIC = b'VPLS'
+    HEADER = struct.Struct('<4sxxxxQ')  # magic, region count
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def entry_path(self, video_path):
+        return os.path.join(self.directory, video_fingerprint(video_path) + '.speech')
+
+    def lookup(self, video_path):
+        try:
+            with open(self.entry_path(video_path), 'rb') as f:
+                data = f.read()
+            magic, count = self.HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            return None
+        timeline = SubtitleTimeline()
+        column_size = count * timeline.starts.itemsize
+        if magic != self.MAGIC or len(data) != self.HEADER.size + 2 * column_size:
+            return None
+        timeline.starts.frombytes(data[self.HEADER.size:self.HEADER.size + column_size])
+        timeline.ends.frombytes(data[self.HEADER.size + column_size:])
+        timeline.max_ends.extend(timeline.ends)
+        return timeline
+
+    def save(self, video_path, timeline):
+        path = self.entry_path(video_path)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, len(timeline.starts)))
+            f.write(timeline.starts.tobytes())
+            f.write(timeline.ends.tobytes())
+        os.replace(path + '.tmp', path)
+
+
+class KeyframeIndexCache:
+    # Sorted keyframe times of each video, one small file per video named
+    # after its video_fingerprint() like SpeechActivityCache. An empty
+    # table records that the video has no usable keyframe index.
+    MAGIC = b'VPLK'
+    HEADER = struct.Struct('<4sxxxxQ')  # magic, keyframe count
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def entry_path(self, video_path):
+        return os.path.join(self.directory, video_fingerprint(video_path) + '.keyframes')
+
+    def lookup(self, video_path):
+        # array of keyframe times (empty for none), or None if not cached
+        try:
+            with open(self.entry_path(video_path), 'rb') as f:
+                data = f.read()
+            magic, count = self.HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            return None
+        times = array('q')
+        if magic != self.MAGIC or len(data) != self.HEADER.size + count * times.itemsize:
+            return None
+        times.frombytes(data[self.HEADER.size:])
+        return times
+
+    def save(self, video_path, times):
+        path = self.entry_path(video_path)
+        times = array('q', times or ())
+        with open(path + '.tmp', 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, len(times)))
+            f.write(times.tobytes())
+        os.replace(path + '.tmp', path)
+        return times
+
+
+def video_fingerprint(path, sample_bytes=1 << 20):
+    # Names a video by its size and its first and last megabyte, which
+    # survives renames and moves; hashing all of a multi-GB file would cost
+    # more than anything keyed by it
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size).encode('ascii'), digest_size=16)
+    with open(path, 'rb') as f:
+        digest.update(f.read(sample_bytes))
+        if size > 2 * sample_bytes:
+            f.seek(-sample_bytes, os.SEEK_END)
+            digest.update(f.read(sample_bytes))
+    return digest.hexdigest()
+
+
+class ThumbnailCache:
+    # Small JPEG frames of cue starts, one folder per video fingerprint and
+    # one file per cue start in ms. Reading a frame touches its file, so
+    # file mtimes give the LRU order once the folders outgrow max_bytes;
+    # eviction then goes a tenth below the limit so it is not rerun for
+    # every frame that follows.
+    EXTENSION = '.jpg'
+    QUALITY = 80
+
+    def __init__(self, directory, max_bytes=128 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total_bytes = None  # Counted on the first save
+
+    def entry_path(self, fingerprint, time_ms):
+        return os.path.join(self.directory, fingerprint, f'{time_ms}{self.EXTENSION}')
+
+    def cached_times(self, fingerprint):
+        # Cue starts that have a frame, from one listing instead of a stat per cue
+        try:
+            names = os.listdir(os.path.join(self.directory, fingerprint))
+        except OSError:
+            return set()
+        times = set()
+        for name in names:
+            stem, extension = os.path.splitext(name)
+            if extension == self.EXTENSION:
+                try:
+                    times.add(int(stem))
+                except ValueError:
+                    pass
+        return times
+
+    def lookup(self, fingerprint, time_ms):
+        path = self.entry_path(fingerprint, time_ms)
+        image = QImage(path)
+        if image.isNull():
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return image
+
+    def save(self, fingerprint, time_ms, image):
+        os.makedirs(os.path.join(self.directory, fingerprint), exist_ok=True)
+        path = self.entry_path(fingerprint, time_ms)
+        if not image.save(path + '.tmp', 'JPEG', self.QUALITY):
+            raise OSError(f"Could not write {path}")
+        os.replace(path + '.tmp', path)
+        size = os.path.getsize(path)
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = sum(size for _, size, _ in self.entries())
+            else:
+                self.total_bytes += size
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+    def entries(self):
+        # (mtime, size, path) of every frame
+        entries = []
+        for folder in os.scandir(self.directory):
+            if not folder.is_dir():
+                continue
+            for entry in os.scandir(folder.path):
+                if entry.name.endswith(self.EXTENSION):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes * 0.9:
+                break
+            os.remove(path)
+            total -= size
+        self.total_bytes = total
+        for folder in os.scandir(self.directory):
+            if folder.is_dir():
+                try:
+                    os.rmdir(folder.path)  # Only succeeds once a video has no frames left
+                except OSError:
+                    pass
+
+
+SUBTITLE_EXTENSIONS = ('.srt', '.vtt', '.ass', '.ssa')
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi')
+
+
+def find_sibling_video(subtitle_path):
+    # Video in the same folder that "Movie.en.srt" or "Movie.srt" belongs to
+    folder = os.path.dirname(subtitle_path)
+    stem = os.path.splitext(os.path.basename(subtitle_path))[0].lower()
+    best = None
+    try:
+        names = os.listdir(folder or '.')
+    except OSError:
+        return None
+    for name in names:
+        video_stem, extension = os.path.splitext(name)
+        video_stem = video_stem.lower()
+        if extension.lower() not in VIDEO_EXTENSIONS:
+            continue
+        if stem == video_stem or stem.startswith(video_stem + '.'):
+            if best is None or len(video_stem) > len(os.path.splitext(best)[0]):
+                best = name
+    return os.path.join(folder, best) if best else None
+
+
+_CUE_TIME = re.compile(r'(?:(\d+):)?(\d{1,2}):(\d{1,2})[,.](\d{1,3})')
+_ASS_TIME = re.compile(r'(\d+):(\d{1,2}):(\d{1,2})[.,](\d{1,3})')
+_VTT_TAG = re.compile(r'</?(?:c|v|lang|ruby|rt)(?:[.\s][^>]*)?>|<\d[\d:.]*>')
+_ASS_OVERRIDE = re.compile(r'{[^}]*}')
+
+
+def _time_to_ms(match):
+    hours, minutes, seconds, fraction = match.groups()
+    return (((int(hours or 0) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 +
+            int(fraction.ljust(3, '0')))
+
+
+def _parse_cue_timing(line):
+    # "00:00:01,000 --> 00:00:02,500" (SRT) or "00:01.000 --> 00:02.500 ..." (WebVTT)
+    start_text, _, end_text = line.partition('-->')
+    start = _CUE_TIME.search(start_text)
+    end = _CUE_TIME.search(end_text)
+    if not start or not end:
+        return None
+    return _time_to_ms(start), _time_to_ms(end)
+
+
+def iter_block_cues(lines, webvtt=False):
+    # Single pass over SRT or WebVTT blocks, yields (start, end, text)
+    timing = None
+    text_lines = []
+    skipping_block = False
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            if timing:
+                yield timing[0], timing[1], '\n'.join(text_lines)
+            timing = None
+            text_lines = []
+            skipping_block = False
+            continue
+        if skipping_block:
+            continue
+
+        if '-->' in line:
+            parsed = _parse_cue_timing(line)
+            if parsed:
+                if timing:
+                    # Missing blank line: a trailing number is the next index
+                    if text_lines and text_lines[-1].strip().isdigit():
+                        text_lines.pop()
+                    yield timing[0], timing[1], '\n'.join(text_lines)
+                timing = parsed
+                text_lines = []
+                continue
+
+        if timing:
+            if webvtt:
+                line = _VTT_TAG.sub('', line)
+            text_lines.append(line)
+        elif webvtt and line.startswith(('WEBVTT', 'NOTE', 'STYLE', 'REGION')):
+            skipping_block = True
+
+    if timing:
+        yield timing[0], timing[1], '\n'.join(text_lines)
+
+
+def iter_ass_cues(lines):
+    # Single pass over the [Events] section of an ASS/SSA script
+    in_events = False
+    fields = None
+    for line in lines:
+        line = line.strip()
+        if line.startswith('['):
+            in_events = line.lower() == '[events]'
+            continue
+        if not in_events:
+            continue
+
+        key, _, value = line.partition(':')
+        if key == 'Format':
+            fields = [field.strip().lower() for field in value.split(',')]
+        elif key == 'Dialogue' and fields:
+            values = value.lstrip().split(',', len(fields) - 1)
+            if len(values) < len(fields):
+                continue
+            event = dict(zip(fields, values))
+            start = _ASS_TIME.search(event.get('start', ''))
+            end = _ASS_TIME.search(event.get('end', ''))
+            if not start or not end:
+                continue
+            yield _time_to_ms(start), _time_to_ms(end), _ass_text(event.get('text', ''))
+
+
+def _ass_text(text):
+    text = _ASS_OVERRIDE.sub('', text)
+    return text.replace('\\N', '\n').replace('\\n', '\n').replace('\\h', ' ')
+
+
+def detect_subtitle_format(path, first_line):
+    first_line = first_line.lstrip('\ufeff').strip()
+    if first_line.startswith('WEBVTT'):
+        return 'vtt'
+    if first_line.lower() == '[script info]':
+        return 'ass'
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.ass', '.ssa'):
+        return 'ass'
+    if extension == '.vtt':
+        return 'vtt'
+    return 'srt'
+
+
+def iter_subtitle_cues(lines, subtitle_format):
+    if subtitle_format == 'ass':
+        return iter_ass_cues(lines)
+    return iter_block_cues(lines, webvtt=subtitle_format == 'vtt')
+
+
+SNIFF_BYTES = 64 * 1024
+_CP1256_ONLY = re.compile(rb'[\x81\x8d\x8f\x90\x9d]')  # Persian letters and ZWNJ, unused in cp1252
+_HIGH_BYTE_RUN = re.compile(rb'[\x80-\xff]+')
+
+
+def sniff_subtitle_encoding(sample):
+    # Codec for a subtitle file from its first bytes: a BOM, the zero bytes
+    # of BOM-less UTF-16, valid UTF-8, or else a Windows code page. In
+    # cp1256 Persian and Arabic words are runs of high bytes, while the
+    # accented letters of cp1252 text mostly stand alone between ASCII ones.
+    if sample.startswith((b'\xff\xfe\x00\x00', b'\x00\x00\xfe\xff')):
+        return 'utf-32'
+    if sample.startswith(b'\xef\xbb\xbf'):
+        return 'utf-8-sig'
+    if sample.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return 'utf-16'
+
+    # Subtitle numbers and timings are ASCII, so UTF-16 shows a zero in
+    # every other byte
+    pairs = len(sample) // 2
+    if pairs:
+        even_zeros = sample[0:pairs * 2:2].count(0)
+        odd_zeros = sample[1:pairs * 2:2].count(0)
+        if odd_zeros > pairs * 0.05 and even_zeros < odd_zeros * 0.1:
+            return 'utf-16-le'
+        if even_zeros > pairs * 0.05 and odd_zeros < even_zeros * 0.1:
+            return 'utf-16-be'
+
+    try:
+        # A sample may end inside a character, which is not an error
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        pass
+
+    if _CP1256_ONLY.search(sample):
+        return 'cp1256'
+    runs = _HIGH_BYTE_RUN.findall(sample)
+    high_bytes = sum(map(len, runs))
+    in_words = sum(len(run) for run in runs if len(run) > 1)
+    return 'cp1256' if in_words >= high_bytes / 2 else 'cp1252'
+
+
+class EncodingCache:
+    # Codec sniffed for each subtitle file, keyed like SubtitleCache entries
+    # so an edited file is sniffed again. Shared by the loader threads.
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.codecs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            codec = self.codecs.get(key)
+            if codec is not None:
+                self.codecs.move_to_end(key)
+            return codec
+
+    def put(self, key, codec):
+        with self.lock:
+            self.codecs[key] = codec
+            if len(self.codecs) > self.capacity:
+                self.codecs.popitem(last=False)
+
+
+subtitle_encodings = EncodingCache()
+
+
+def open_subtitle_text(path):
+    # Text stream over a subtitle file in its own encoding. The sample the
+    # codec is sniffed from is peeked into the read buffer, so the file is
+    # still read once, front to back, and never decoded twice.
+    raw = open(path, 'rb', buffering=SNIFF_BYTES)
+    try:
+        key = SubtitleCache.file_key(path, os.fstat(raw.fileno()))
+        codec = subtitle_encodings.get(key)
+        if codec is None:
+            codec = sniff_subtitle_encoding(raw.peek(SNIFF_BYTES)[:SNIFF_BYTES])
+            subtitle_encodings.put(key, codec)
+        return io.TextIOWrapper(raw, encoding=codec, errors='replace')
+    except BaseException:
+        raw.close()
+        raise
+
+
+def parse_subtitle_file(path, store, batch_size=500):
+    # Stream cues from disk into store, yielding the bytes read so far after
+    # every batch so the caller can show the first cues and report progress
+    with open_subtitle_text(path) as f:
+        first_line = f.readline()
+        lines = _prepend(first_line, f)
+        subtitle_format = detect_subtitle_format(path, first_line)
+        pending = 0
+        for start, end, text in iter_subtitle_cues(lines, subtitle_format):
+            store.append(start, end, text)
+            pending += 1
+            if pending >= batch_size:
+                pending = 0
+                yield f.buffer.tell()
+        yield f.buffer.tell()
+
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
+
+
+MATROSKA_EXTENSIONS = ('.mkv', '.mks', '.webm')
+MATROSKA_TEXT_CODECS = ('S_TEXT/UTF8', 'S_TEXT/ASCII', 'S_TEXT/ASS', 'S_TEXT/SSA',
+                        'S_TEXT/WEBVTT', 'D_WEBVTT/SUBTITLES')
+
+# EBML element IDs, length marker included as they appear in the file
+_EBML_HEADER = 0x1A45DFA3
+_EBML_DOC_TYPE = 0x4282
+_MKV_SEGMENT = 0x18538067
+_MKV_SEEK_HEAD = 0x114D9B74
+_MKV_SEEK = 0x4DBB
+_MKV_SEEK_ID = 0x53AB
+_MKV_SEEK_POSITION = 0x53AC
+_MKV_INFO = 0x1549A966
+_MKV_TIMESTAMP_SCALE = 0x2AD7B1
+_MKV_TRACKS = 0x1654AE6B
+_MKV_TRACK_ENTRY = 0xAE
+_MKV_TRACK_NUMBER = 0xD7
+_MKV_TRACK_TYPE = 0x83
+_MKV_TRACK_UID = 0x73C5
+_MKV_CODEC_ID = 0x86
+_MKV_LANGUAGE = 0x22B59C
+_MKV_LANGUAGE_BCP47 = 0x22B59D
+_MKV_NAME = 0x536E
+_MKV_FLAG_DEFAULT = 0x88
+_MKV_FLAG_FORCED = 0x55AA
+_MKV_DEFAULT_DURATION = 0x23E383
+_MKV_CONTENT_ENCODINGS = 0x6D80
+_MKV_CONTENT_ENCODING = 0x6240
+_MKV_CONTENT_ENCODING_TYPE = 0x5033
+_MKV_CONTENT_COMPRESSION = 0x5034
+_MKV_CONTENT_COMP_ALGO = 0x4254
+_MKV_CONTENT_COMP_SETTINGS = 0x4255
+_MKV_CLUSTER = 0x1F43B675
+_MKV_CLUSTER_TIMESTAMP = 0xE7
+_MKV_SIMPLE_BLOCK = 0xA3
+_MKV_BLOCK_GROUP = 0xA0
+_MKV_BLOCK = 0xA1
+_MKV_BLOCK_DURATION = 0x9B
+_MKV_REFERENCE_BLOCK = 0xFB
+_MKV_CUES = 0x1C53BB6B
+_MKV_CUE_POINT = 0xBB
+_MKV_CUE_TIME = 0xB3
+_MKV_CUE_TRACK_POSITIONS = 0xB7
+_MKV_CUE_TRACK = 0xF7
+_MKV_CUE_CLUSTER_POSITION = 0xF1
+_MKV_CUE_RELATIVE_POSITION = 0xF0
+_MKV_TAGS = 0x1254C367
+_MKV_TAG = 0x7373
+_MKV_TAG_TARGETS = 0x63C0
+_MKV_TAG_TRACK_UID = 0x63C5
+_MKV_SIMPLE_TAG = 0x67C8
+_MKV_TAG_NAME = 0x45A3
+_MKV_TAG_STRING = 0x4487
+_MKV_TOP_LEVEL = {_MKV_SEEK_HEAD, _MKV_INFO, _MKV_TRACKS, _MKV_CLUSTER, _MKV_CUES, _MKV_TAGS,
+                  0x1043A770, 0x1941A469}  # + Chapters, Attachments
+_MKV_VIDEO_TRACK = 0x01
+_MKV_SUBTITLE_TRACK = 0x11
+_MKV_BLOCK_HEADER = struct.Struct('>hB')  # relative timestamp, flags
+
+MatroskaTextTrack = namedtuple(
+    'MatroskaTextTrack',
+    'number codec language name default forced encodings default_duration')
+
+
+class MatroskaReader:
+    # Pulls text subtitle tracks out of a Matroska/WebM file through mmap.
+    # Only element headers are parsed on the way in: the Cues element points
+    # straight at the subtitle blocks, so video and audio payloads are never
+    # touched. Cues may list only some of a track's blocks, so they are
+    # trusted only when they account for every frame the track's statistics
+    # tags count; otherwise the block headers of every cluster are walked,
+    # still skipping payloads.
+    MISSING_DURATION_MS = 3000  # Last cue of a track without durations
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"Not a Matroska file: {path}")
+        if hasattr(self.data, 'madvise'):
+            # Header hops skip most of the file, don't let readahead fetch it
+            self.data.madvise(mmap.MADV_RANDOM)
+        self.size = len(self.data)
+        self.timestamp_scale = 1000000  # Nanoseconds per timestamp tick
+        self.tracks = {}  # track number -> MatroskaTextTrack
+        self.video_tracks = []  # Track numbers of the video tracks
+        self.track_uids = {}  # track number -> TrackUID, which tags refer to
+        self.cues_position = None
+        self.tags_position = None
+        self.first_cluster = None
+        try:
+            self.read_headers()
+        except (IndexError, struct.error):
+            self.close()
+            raise ValueError(f"Damaged Matroska file: {path}")
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def read_vint(self, position):
+        # Raw variable-length integer with its length marker kept, and its length
+        first = self.data[position]
+        if not first:
+            raise ValueError(f"Damaged Matroska file at byte {position}")
+        length = 9 - first.bit_length()
+        return int.from_bytes(self.data[position:position + length], 'big'), length
+
+    def read_element(self, position):
+        # (element id, data position, data size or None when unknown)
+        element_id, id_length = self.read_vint(position)
+        size, size_length = self.read_vint(position + id_length)
+        marker = 1 << (7 * size_length)
+        size -= marker
+        return (element_id, position + id_length + size_length,
+                None if size == marker - 1 else size)
+
+    def children(self, start, end):
+        position = start
+        while position < end:
+            element_id, data, size = self.read_element(position)
+            if size is None:
+                size = end - data
+            yield element_id, data, size
+            position = data + size
+
+    def read_uint(self, data, size):
+        return int.from_bytes(self.data[data:data + size], 'big')
+
+    def read_string(self, data, size):
+        return self.data[data:data + size].rstrip(b'\0').decode('utf-8', 'replace')
+
+    def read_headers(self):
+        element_id, data, size = self.read_element(0)
+        if element_id != _EBML_HEADER:
+            raise ValueError(f"Not a Matroska file: {self.path}")
+        doc_type = 'matroska'
+        for child_id, child, child_size in self.children(data, data + size):
+            if child_id == _EBML_DOC_TYPE:
+                doc_type = self.read_string(child, child_size)
+        if doc_type not in ('matroska', 'webm'):
+            raise ValueError(f"Unsupported EBML document type: {doc_type}")
+
+        position = data + size
+        while True:
+            element_id, data, size = self.read_element(position)
+            if element_id == _MKV_SEGMENT:
+                break
+            position = data + size
+        self.segment_start = data
+        self.segment_end = self.size if size is None else min(self.size, data + size)
+
+        found = self.find_top_level()
+        if _MKV_INFO in found:
+            _, data, size = self.read_element(found[_MKV_INFO])
+            for child_id, child, child_size in self.children(data, data + size):
+                if child_id == _MKV_TIMESTAMP_SCALE:
+                    self.timestamp_scale = self.read_uint(child, child_size)
+        if _MKV_TRACKS not in found:
+            raise ValueError(f"No tracks in Matroska file: {self.path}")
+        _, data, size = self.read_element(found[_MKV_TRACKS])
+        for child_id, child, child_size in self.children(data, data + size):
+            if child_id == _MKV_TRACK_ENTRY:
+                track = self.read_track_entry(child, child_size)
+                if track is not None:
+                    self.tracks[track.number] = track
+        self.cues_position = found.get(_MKV_CUES)
+        self.tags_position = found.get(_MKV_TAGS)
+
+    def find_top_level(self):
+        # Positions of the top-level elements, from their headers and the
+        # SeekHead, stepping over clusters by their size
+        found = {}
+        position = self.segment_start
+        try:
+            while position < self.segment_end:
+                element_id, data, size = self.read_element(position)
+                found.setdefault(element_id, position)
+                if element_id == _MKV_SEEK_HEAD:
+                    for seek_id, seek_position in self.read_seek_head(data, size):
+                        found.setdefault(seek_id, seek_position)
+                if element_id == _MKV_CLUSTER and self.first_cluster is None:
+                    self.first_cluster = position
+                if size is None or (self.first_cluster is not None and all(
+                        key in found for key in (_MKV_INFO, _MKV_TRACKS, _MKV_CUES))):
+                    break  # Can't step over an unknown-size cluster, or done
+                position = data + size
+        except (ValueError, IndexError):
+            pass  # Damaged or truncated tail, keep what was found before it
+        return found
+
+    def read_seek_head(self, data, size):
+        for seek_id, seek, seek_size in self.children(data, data + size):
+            if seek_id != _MKV_SEEK:
+                continue
+            target = position = None
+            for child_id, child, child_size in self.children(seek, seek + seek_size):
+                if child_id == _MKV_SEEK_ID:
+                    target = self.read_uint(child, child_size)
+                elif child_id == _MKV_SEEK_POSITION:
+                    position = self.segment_start + self.read_uint(child, child_size)
+            if target is not None and position is not None and position < self.segment_end:
+                yield target, position
+
+    def read_track_entry(self, data, size):
+        # MatroskaTextTrack for a text subtitle track we can decode, else
+        # None; video tracks are noted in video_tracks on the way
+        fields = {'type': 0, 'number': 0, 'codec': '', 'language': 'eng', 'bcp47': None,
+                  'name': '', 'default': True, 'forced': False, 'default_duration': 0}
+        encodings = []
+        for child_id, child, child_size in self.children(data, data + size):
+            if child_id == _MKV_TRACK_TYPE:
+                fields['type'] = self.read_uint(child, child_size)
+            elif child_id == _MKV_TRACK_NUMBER:
+                fields['number'] = self.read_uint(child, child_size)
+            elif child_id == _MKV_TRACK_UID:
+                fields['uid'] = self.read_uint(child, child_size)
+            elif child_id == _MKV_CODEC_ID:
+                fields['codec'] = self.read_string(child, child_size)
+            elif child_id == _MKV_LANGUAGE:
+                fields['language'] = self.read_string(child, child_size)
+            elif child_id == _MKV_LANGUAGE_BCP47:
+                fields['bcp47'] = self.read_string(child, child_size)
+            elif child_id == _MKV_NAME:
+                fields['name'] = self.read_string(child, child_size)
+            elif child_id == _MKV_FLAG_DEFAULT:
+                fields['default'] = bool(self.read_uint(child, child_size))
+            elif child_id == _MKV_FLAG_FORCED:
+                fields['forced'] = bool(self.read_uint(child, child_size))
+            elif child_id == _MKV_DEFAULT_DURATION:
+                fields['default_duration'] = self.read_uint(child, child_size)
+            elif child_id == _MKV_CONTENT_ENCODINGS:
+                encodings = self.read_content_encodings(child, child_size)
+
+        if 'uid' in fields:
+            self.track_uids[fields['number']] = fields.pop('uid')
+        if fields['type'] == _MKV_VIDEO_TRACK:
+            self.video_tracks.append(fields['number'])
+        if (fields['type'] != _MKV_SUBTITLE_TRACK or encodings is None or
+                fields['codec'] not in MATROSKA_TEXT_CODECS):
+            return None
+        return MatroskaTextTrack(
+            fields['number'], fields['codec'], fields['bcp47'] or fields['language'],
+            fields['name'], fields['default'], fields['forced'], encodings,
+            fields['default_duration'])
+
+    def read_content_encodings(self, data, size):
+        # [(compression algorithm, settings)], None if we can't undo them
+        encodings = []
+        for encoding_id, encoding, encoding_size in self.children(data, data + size):
+            if encoding_id != _MKV_CONTENT_ENCODING:
+                continue
+            algorithm, settings = 0, b''
+            for child_id, child, child_size in self.children(encoding, encoding + encoding_size):
+                if child_id == _MKV_CONTENT_ENCODING_TYPE and self.read_uint(child, child_size):
+                    return None  # Encrypted
+                if child_id == _MKV_CONTENT_COMPRESSION:
+                    for comp_id, comp, comp_size in self.children(child, child + child_size):
+                        if comp_id == _MKV_CONTENT_COMP_ALGO:
+                            algorithm = self.read_uint(comp, comp_size)
+                        elif comp_id == _MKV_CONTENT_COMP_SETTINGS:
+                            settings = bytes(self.data[comp:comp + comp_size])
+            if algorithm not in (0, 1, 3):  # zlib, bzlib, header stripping
+                return None
+            encodings.append((algorithm, settings))
+        return encodings
+
+    def cue_targets(self, track_number):
+        # {cluster position: block offsets inside it, None meaning unknown}
+        # for every cue entry of the track
+        targets = {}
+        if self.cues_position is None:
+            return targets
+        element_id, data, size = self.read_element(self.cues_position)
+        if element_id != _MKV_CUES:
+            return targets
+        for point_id, point, point_size in self.children(data, data + size):
+            if point_id != _MKV_CUE_POINT:
+                continue
+            for child_id, child, child_size in self.children(point, point + point_size):
+                if child_id != _MKV_CUE_TRACK_POSITIONS:
+                    continue
+                track = cluster = relative = None
+                for entry_id, entry, entry_size in self.children(child, child + child_size):
+                    if entry_id == _MKV_CUE_TRACK:
+                        track = self.read_uint(entry, entry_size)
+                    elif entry_id == _MKV_CUE_CLUSTER_POSITION:
+                        cluster = self.segment_start + self.read_uint(entry, entry_size)
+                    elif entry_id == _MKV_CUE_RELATIVE_POSITION:
+                        relative = self.read_uint(entry, entry_size)
+                if track == track_number and cluster is not None:
+                    targets.setdefault(cluster, set()).add(relative)
+        return targets
+
+    def keyframe_times(self):
+        # Sorted keyframe times in ms of the first video track, or None if
+        # the file has none. Cue points are written for video keyframes, so
+        # they usually answer without touching a cluster; otherwise every
+        # block header is read for its keyframe flag, payloads skipped.
+        if not self.video_tracks:
+            return None
+        track_number = self.video_tracks[0]
+        ticks = self.cue_point_times(track_number)
+        if not ticks:
+            ticks = self.scan_keyframes(track_number)
+        scale = self.timestamp_scale
+        return sorted({tick * scale // 1000000 for tick in ticks}) or None
+
+    def cue_point_times(self, track_number):
+        times = []
+        if self.cues_position is None:
+            return times
+        element_id, data, size = self.read_element(self.cues_position)
+        if element_id != _MKV_CUES:
+            return times
+        for point_id, point, point_size in self.children(data, data + size):
+            if point_id != _MKV_CUE_POINT:
+                continue
+            time = None
+            tracks = set()
+            for child_id, child, child_size in self.children(point, point + point_size):
+                if child_id == _MKV_CUE_TIME:
+                    time = self.read_uint(child, child_size)
+                elif child_id == _MKV_CUE_TRACK_POSITIONS:
+                    for entry_id, entry, entry_size in self.children(child, child + child_size):
+                        if entry_id == _MKV_CUE_TRACK:
+                            tracks.add(self.read_uint(entry, entry_size))
+            if time is not None and track_number in tracks:
+                times.append(time)
+        return times
+
+    def scan_keyframes(self, track_number):
+        times = []
+        position = self.first_cluster
+        while position is not None and position < self.segment_end:
+            element_id, data, size = self.read_element(position)
+            end = self.segment_end if size is None else data + size
+            if element_id != _MKV_CLUSTER:
+                position = end
+                continue
+            timestamp = 0
+            position = data
+            while position < end:
+                child_id, child, child_size = self.read_element(position)
+                if child_id in _MKV_TOP_LEVEL:
+                    break  # End of an unknown-size cluster
+                child_end = end if child_size is None else child + child_size
+                if child_id == _MKV_CLUSTER_TIMESTAMP:
+                    timestamp = self.read_uint(child, child_size)
+                elif child_id == _MKV_SIMPLE_BLOCK:
+                    track, length = self.read_vint(child)
+                    if track - (1 << (7 * length)) == track_number:
+                        relative, flags = _MKV_BLOCK_HEADER.unpack_from(self.data, child + length)
+                        if flags & 0x80:
+                            times.append(timestamp + relative)
+                elif child_id == _MKV_BLOCK_GROUP:
+                    # A block without references to other frames is a keyframe
+                    block = None
+                    referenced = False
+                    for group_id, group, _ in self.children(child, child_end):
+                        if group_id == _MKV_BLOCK:
+                            block = group
+                        elif group_id == _MKV_REFERENCE_BLOCK:
+                            referenced = True
+                    if block is not None and not referenced:
+                        track, length = self.read_vint(block)
+                        if track - (1 << (7 * length)) == track_number:
+                            relative, _ = _MKV_BLOCK_HEADER.unpack_from(self.data, block + length)
+                            times.append(timestamp + relative)
+                position = child_end
+        return times
+
+    def frame_count(self, track_number):
+        # Blocks in the track per the NUMBER_OF_FRAMES statistics tag that
+        # muxers like mkvmerge write, or None
+        uid = self.track_uids.get(track_number)
+        if uid is None or self.tags_position is None:
+            return None
+        element_id, data, size = self.read_element(self.tags_position)
+        if element_id != _MKV_TAGS:
+            return None
+        for tag_id, tag, tag_size in self.children(data, data + size):
+            if tag_id != _MKV_TAG:
+                continue
+            uids = set()
+            frames = None
+            for child_id, child, child_size in self.children(tag, tag + tag_size):
+                if child_id == _MKV_TAG_TARGETS:
+                    uids.update(self.read_uint(target, target_size) for target_id, target, target_size
+                                in self.children(child, child + child_size)
+                                if target_id == _MKV_TAG_TRACK_UID)
+                elif child_id == _MKV_SIMPLE_TAG:
+                    fields = {}
+                    for field_id, field, field_size in self.children(child, child + child_size):
+                        if field_id in (_MKV_TAG_NAME, _MKV_TAG_STRING):
+                            fields[field_id] = self.read_string(field, field_size)
+                    if fields.get(_MKV_TAG_NAME) == 'NUMBER_OF_FRAMES':
+                        frames = fields.get(_MKV_TAG_STRING)
+            if uid in uids and frames is not None:
+                return int(frames) if frames.isdigit() else None
+        return None
+
+    def iter_track_blocks(self, track_number):
+        # (timestamp ticks, duration ticks or None, payload, file position)
+        # for each block of the track, in file order
+        targets = self.cue_targets(track_number)
+        if not targets or self.frame_count(track_number) != sum(map(len, targets.values())):
+            # No cues for the track, or cues that may miss some of its blocks
+            position = self.first_cluster
+            while position is not None and position < self.segment_end:
+                element_id, data, size = self.read_element(position)
+                end = self.segment_end if size is None else data + size
+                if element_id == _MKV_CLUSTER:
+                    end = yield from self.scan_cluster(track_number, data, end)
+                position = end
+            return
+
+        for cluster_position in sorted(targets):
+            element_id, data, size = self.read_element(cluster_position)
+            if element_id != _MKV_CLUSTER:
+                continue
+            end = self.segment_end if size is None else data + size
+            offsets = targets[cluster_position]
+            if None in offsets:
+                yield from self.scan_cluster(track_number, data, end)
+                continue
+            timestamp = self.cluster_timestamp(data, end)
+            for offset in sorted(offsets):
+                yield from self.read_block(track_number, data + offset, timestamp)
+
+    def cluster_timestamp(self, data, end):
+        for child_id, child, child_size in self.children(data, end):
+            if child_id == _MKV_CLUSTER_TIMESTAMP:
+                return self.read_uint(child, child_size)
+        return 0
+
+    def scan_cluster(self, track_number, data, end):
+        # Block headers only; returns where the cluster ended
+        timestamp = 0
+        position = data
+        while position < end:
+            element_id, child, size = self.read_element(position)
+            if element_id in _MKV_TOP_LEVEL:
+                return position  # End of an unknown-size cluster
+            if element_id == _MKV_CLUSTER_TIMESTAMP:
+                timestamp = self.read_uint(child, size)
+            elif element_id in (_MKV_SIMPLE_BLOCK, _MKV_BLOCK_GROUP):
+                yield from self.read_block(track_number, position, timestamp)
+            position = child + (end - child if size is None else size)
+        return end
+
+    def read_block(self, track_number, position, cluster_timestamp):
+        element_id, data, size = self.read_element(position)
+        duration = None
+        if element_id == _MKV_BLOCK_GROUP:
+            block = None
+            for child_id, child, child_size in self.children(data, data + size):
+                if child_id == _MKV_BLOCK:
+                    block = child, child_size
+                elif child_id == _MKV_BLOCK_DURATION:
+                    duration = self.read_uint(child, child_size)
+            if block is None:
+                return
+            data, size = block
+        elif element_id != _MKV_SIMPLE_BLOCK:
+            return
+
+        track, length = self.read_vint(data)
+        if track - (1 << (7 * length)) != track_number:
+            return  # Another track's block: its payload is never read
+        relative, flags = _MKV_BLOCK_HEADER.unpack_from(self.data, data + length)
+        if flags & 0x06:
+            return  # Laced, never used for text
+        payload = data + length + _MKV_BLOCK_HEADER.size
+        yield (cluster_timestamp + relative, duration,
+               self.data[payload:data + size], position)
+
+    def decode_text(self, track, payload):
+        for algorithm, settings in track.encodings:
+            if algorithm == 0:
+                payload = zlib.decompress(payload)
+            elif algorithm == 1:
+                payload = bz2.decompress(payload)
+            else:
+                payload = settings + payload
+        text = payload.decode('utf-8', 'replace').replace('\r\n', '\n').strip('\0')
+        if track.codec in ('S_TEXT/ASS', 'S_TEXT/SSA'):
+            # ReadOrder, Layer, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+            return _ass_text(text.split(',', 8)[-1])
+        if 'WEBVTT' in track.codec:
+            return _VTT_TAG.sub('', text)
+        return text
+
+    def iter_cues(self, track):
+        # (start ms, end ms, text, file position) in file order. Cues without
+        # a duration run until the next one starts.
+        scale = self.timestamp_scale
+        pending = None
+        for ticks, duration, payload, position in self.iter_track_blocks(track.number):
+            start = ticks * scale // 1000000
+            if duration is not None:
+                end = start + duration * scale // 1000000
+            elif track.default_duration:
+                end = start + track.default_duration // 1000000
+            else:
+                end = None
+            if pending is not None:
+                if pending[1] is None:
+                    pending[1] = max(pending[0], start)
+                yield tuple(pending)
+            pending = [start, end, self.decode_text(track, payload), position]
+        if pending is not None:
+            if pending[1] is None:
+                pending[1] = pending[0] + self.MISSING_DURATION_MS
+            yield tuple(pending)
+
+
+def parse_matroska_track(path, track_number, store, batch_size=500):
+    # parse_subtitle_file for a text track inside a Matroska file, yielding
+    # the file position reached after every batch
+    with MatroskaReader(path) as reader:
+        track = reader.tracks.get(track_number)
+        if track is None:
+            raise ValueError(f"No text subtitle track {track_number} in {path}")
+        pending = 0
+        for start, end, text, position in reader.iter_cues(track):
+            store.append(start, end, text)
+            pending += 1
+            if pending >= batch_size:
+                pending = 0
+                yield position
+        yield reader.size
+
+
+class Mp4Reader:
+    # Reads the keyframe table of an MP4/MOV file through mmap: the sync
+    # sample list (stss) of the video track, timed with its decode time
+    # deltas (stts), composition offsets (ctts) and edit list. Only the
+    # moov box is read; media data is stepped over by box sizes.
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"Not an MP4 file: {path}")
+        if hasattr(self.data, 'madvise'):
+            self.data.madvise(mmap.MADV_RANDOM)
+        self.size = len(self.data)
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def boxes(self, start, end):
+        # (type, data position, data end) of each box in [start, end)
+        position = start
+        while position + 8 <= end:
+            size, box_type = struct.unpack_from('>I4s', self.data, position)
+            header = 8
+            if size == 1:
+                size = struct.unpack_from('>Q', self.data, position + 8)[0]
+                header = 16
+            elif size == 0:
+                size = end - position
+            if size < header:
+                raise ValueError(f"Damaged MP4 file at byte {position}")
+            yield box_type, position + header, min(end, position + size)
+            position += size
+
+    def child(self, start, end, *path):
+        # Data span of the first box along path below [start, end), or None
+        for box_type in path:
+            for found_type, data, data_end in self.boxes(start, end):
+                if found_type == box_type:
+                    start, end = data, data_end
+                    break
+            else:
+                return None
+        return start, end
+
+    def table(self, span, columns, signed=False):
+        # Entry columns of a full box holding a 32-bit entry count and
+        # 32-bit entries; signed entries are signed from box version 1 on
+        data, _ = span
+        version = self.data[data]
+        count = struct.unpack_from('>I', self.data, data + 4)[0]
+        values = array('i' if signed and version >= 1 else 'I')
+        values.frombytes(self.data[data + 8:data + 8 + 4 * columns * count])
+        if sys.byteorder == 'little':
+            values.byteswap()
+        return [values[column::columns] for column in range(columns)]
+
+    def keyframe_times(self):
+        # Sorted keyframe times in ms of the first video track, or None
+        # when every frame is a keyframe or there is no video track
+        moov = self.child(0, self.size, b'moov')
+        if moov is None:
+            raise ValueError(f"No movie box in MP4 file: {self.path}")
+        for box_type, data, end in self.boxes(*moov):
+            if box_type != b'trak':
+                continue
+            handler = self.child(data, end, b'mdia', b'hdlr')
+            if handler is None or self.data[handler[0] + 8:handler[0] + 12] != b'vide':
+                continue
+            return self.track_keyframe_times(data, end)
+        return None
+
+    def track_keyframe_times(self, data, end):
+        mdhd = self.child(data, end, b'mdia', b'mdhd')
+        stbl = self.child(data, end, b'mdia', b'minf', b'stbl')
+        if mdhd is None or stbl is None:
+            return None
+        version = self.data[mdhd[0]]
+        timescale = struct.unpack_from('>I', self.data, mdhd[0] + (20 if version == 1 else 12))[0]
+        stss = self.child(*stbl, b'stss')
+        stts = self.child(*stbl, b'stts')
+        if stss is None or stts is None or not timescale:
+            return None
+        sync_samples = sorted(self.table(stss, 1)[0])  # 1-based sample numbers
+        decode_times = self.sample_values(sync_samples, *self.table(stts, 2), cumulative=True)
+        ctts = self.child(*stbl, b'ctts')
+        if ctts is not None:
+            offsets = self.sample_values(sync_samples, *self.table(ctts, 2, signed=True))
+        else:
+            offsets = repeat(0)
+
+        shift = 0
+        elst = self.child(data, end, b'edts', b'elst')
+        if elst is not None:
+            version = self.data[elst[0]]
+            entry = struct.Struct('>Qq' if version == 1 else '>Ii')
+            count = struct.unpack_from('>I', self.data, elst[0] + 4)[0]
+            for index in range(count):
+                _, media_time = entry.unpack_from(
+                    self.data, elst[0] + 8 + index * (entry.size + 4))
+                if media_time != -1:
+                    shift = media_time
+                    break
+        return sorted({max(0, (decode + offset - shift) * 1000 // timescale)
+                       for decode, offset in zip(decode_times, offsets)}) or None
+
+    @staticmethod
+    def sample_values(samples, counts, values, cumulative=False):
+        # Value of each sorted sample number from run-length (count, value)
+        # entries, or the running total of the values before it
+        results = []
+        run = 0
+        run_first = 1  # Sample number the current run starts at
+        total = 0  # Sum of the values of all samples before run_first
+        for sample in samples:
+            while run < len(counts) and sample >= run_first + counts[run]:
+                total += counts[run] * values[run]
+                run_first += counts[run]
+                run += 1
+            if run >= len(counts):
                 break
+            results.append(total + (sample - run_first) * values[run] if cumulative
+                           else values[run])
+        return results
+
+
+def read_keyframe_times(path):
+    # Sorted keyframe times in ms of a video, None if unknown or all-intra
+    extension = os.path.splitext(path)[1].lower()
+    if extension in MATROSKA_EXTENSIONS:
+        with MatroskaReader(path) as reader:
+            return reader.keyframe_times()
+    if extension in ('.mp4', '.m4v', '.mov'):
+        with Mp4Reader(path) as reader:
+            return reader.keyframe_times()
+    return None
+
+
+def cue_seek_times(timeline, keyframes, max_lead_ms):
+    # Where to seek for each cue of timeline: the keyframe before its start
+    # when that is at most max_lead_ms earlier and no earlier cue is still
+    # showing there, since playback can begin right at a keyframe with
+    # nothing to decode first; otherwise the start itself, which libvlc
+    # reaches by decoding forward from the keyframe before it
+    times = array('q', timeline.starts)
+    keyframe = 0
+    previous_end = 0
+    for index, start in enumerate(timeline.starts):
+        while keyframe + 1 < len(keyframes) and keyframes[keyframe + 1] <= start:
+            keyframe += 1
+        before = keyframes[keyframe]
+        if before <= start and start - before <= max_lead_ms and before >= previous_end:
+            times[index] = before
+        previous_end = timeline.max_ends[index]
+    return times
+
+
+def describe_matroska_track(track):
+    label = track.name or track.language
+    if track.name and track.language not in track.name:
+        label = f"{track.name} [{track.language}]"
+    flags = ', forced' if track.forced else ''
+    return f"Embedded track {track.number}: {label} ({track.codec}{flags})"
+
+
+class SubtitleLoadSignals(QObject):
+    first_batch = pyqtSignal(object, object)  # task, CueStore with the opening cues
+    progress = pyqtSignal(object, int)        # task, percent of the file read
+    finished = pyqtSignal(object, object)     # task, complete CueStore
+    failed = pyqtSignal(object, str)
+    cancelled = pyqtSignal(object)
+
+
+class SubtitleLoadTask(QRunnable):
+    # Loads one subtitle file, or a text track embedded in a Matroska video,
+    # on a pool thread: cache lookup, streaming parse and cache write all
+    # happen off the GUI thread. Results come back through queued signals;
+    # cancel() stops it at the next batch.
+    def __init__(self, path, track_key, cache, embedded_track=None):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.path = path
+        self.track_key = track_key
+        self.cache = cache
+        self.embedded_track = embedded_track  # Matroska track number
+        self.signals = SubtitleLoadSignals()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            load_numpy()  # Here rather than on the GUI thread at install
+            store, content_hash = None, None
+            if self.cache is not None:
+                try:
+                    store, content_hash = self.cache.lookup(self.path, self.embedded_track)
+                except OSError as e:
+                    print(f"Error reading subtitle cache: {e}")
+            if store is not None:
+                self.signals.finished.emit(self, store)
+                return
+
+            store = CueStore()
+            size = max(1, os.path.getsize(self.path))
+            if self.embedded_track is None:
+                batches = parse_subtitle_file(self.path, store)
+            else:
+                batches = parse_matroska_track(self.path, self.embedded_track, store)
+            try:
+                for position in batches:
+                    if self.cancel_event.is_set():
+                        self.signals.cancelled.emit(self)
+                        return
+                    if position < size and len(store) <= 500:
+                        # The first batch is enough to show the opening cues
+                        self.signals.first_batch.emit(self, store.copy())
+                    self.signals.progress.emit(self, min(100, position * 100 // size))
+            finally:
+                batches.close()
+            store.finish()
+
+            if self.cache is not None and content_hash:
+                try:
+                    self.cache.save(self.path, content_hash, store, self.embedded_track)
+                except OSError as e:
+                    print(f"Error writing subtitle cache: {e}")
+            self.signals.finished.emit(self, store)
+        except Exception as e:
+            self.signals.failed.emit(self, str(e))
+
+
+class AudioSpeechSignals(QObject):
+    progress = pyqtSignal(object, int)    # task, percent of the audio decoded
+    finished = pyqtSignal(object, object)  # task, SubtitleTimeline of speech regions
+    failed = pyqtSignal(object, str)
+
 
+class AudioSpeechTask(QRunnable):
+    # Finds where people speak in a video on a pool thread. A second,
+    # windowless libvlc player transcodes the audio to 8 kHz mono WAV through
+    # stream output, which runs as fast as the decoder allows; audio
+    # callbacks would be fed at playback speed. detect_speech() then scans
+    # the file and the regions are cached per video.
+    SAMPLE_RATE = 8000
+
+    def __init__(self, instance, video_path, cache):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.instance = instance
+        self.video_path = video_path
+        self.cache = cache
+        self.signals = AudioSpeechSignals()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        if self.cancel_event.is_set():
+            return  # Cancelled while it waited for subtitle loads
+        wav_path = None
+        try:
+            speech = self.cache.lookup(self.video_path)
+            if speech is None:
+                handle, wav_path = tempfile.mkstemp(suffix='.wav', dir=self.cache.directory)
+                os.close(handle)
+                if not self.decode_audio(wav_path):
+                    return  # Cancelled
+                samples, sample_rate = read_wav_samples(wav_path)
+                speech = detect_speech(samples, sample_rate)
+                del samples  # Unmap before the file is removed
+                self.cache.save(self.video_path, speech)
+            self.signals.finished.emit(self, speech)
+        except Exception as e:
+            self.signals.failed.emit(self, str(e))
+        finally:
+            if wav_path:
+                try:
+                    os.remove(wav_path)
+                except OSError:
+                    pass
+
+    def decode_audio(self, wav_path):
+        # False when cancelled, raises when libvlc gives up on the file
+        destination = wav_path.replace('\\', '/').replace('"', '\\"')
+        media = self.instance.media_new(
+            self.video_path,
+            f':sout=#transcode{{vcodec=none,scodec=none,acodec=s16l,channels=1,'
+            f'samplerate={self.SAMPLE_RATE}}}:std{{access=file,mux=wav,dst="{destination}"}}',
+            ':no-sout-video', ':no-sout-spu')
+        player = self.instance.media_player_new()
+        outcome = []
+        done = threading.Event()
+
+        def on_event(event, result):
+            outcome.append(result)
+            done.set()
+
+        events = player.event_manager()
+        events.event_attach(vlc.EventType.MediaPlayerEndReached, on_event, 'end')
+        events.event_attach(vlc.EventType.MediaPlayerEncounteredError, on_event, 'error')
+        player.set_media(media)
+        try:
+            if player.play() == -1:
+                raise RuntimeError("VLC could not open the video")
+            while not done.wait(0.25):
+                if self.cancel_event.is_set():
+                    return False
+                self.signals.progress.emit(self, int(max(0.0, player.get_position()) * 100))
+        finally:
+            events.event_detach(vlc.EventType.MediaPlayerEndReached)
+            events.event_detach(vlc.EventType.MediaPlayerEncounteredError)
+            player.stop()  # Also finalizes the WAV header
+            player.release()
+            media.release()
+        if outcome[0] == 'error':
+            raise RuntimeError("VLC could not decode the audio")
+        return True
+
+
+class ThumbnailSignals(QObject):
+    ready = pyqtSignal(object, str)  # task, fingerprint the frames are cached under
+    frame_saved = pyqtSignal(object, int)  # task, cue start the frame shows
+    finished = pyqtSignal(object, int, int)  # task, cues with a frame, cues
+    failed = pyqtSignal(object, str)
+
+
+# libvlc's format callback with the chroma as a raw pointer; python-vlc
+# declares it c_char_p, which hands the callback a copy it cannot write to
+_VIDEO_FORMAT_CB = ctypes.CFUNCTYPE(
+    ctypes.c_uint, ctypes.POINTER(ctypes.c_void_p), ctypes.c_void_p,
+    ctypes.POINTER(ctypes.c_uint), ctypes.POINTER(ctypes.c_uint),
+    ctypes.POINTER(ctypes.c_uint), ctypes.POINTER(ctypes.c_uint))
+
+
+class ThumbnailTask(QRunnable):
+    # Grabs a small frame at the start of every primary cue, on a thread
+    # at idle priority. It has its own libvlc instance and muted player,
+    # which decodes on one software thread into memory through video
+    # callbacks, so the main player keeps its window, its decoder and its
+    # hardware acceleration. Cues that already have a frame are skipped,
+    # which makes a run cut short pick up where it stopped next time.
+    WIDTH = 160
+    VLC_ARGS = ('--quiet', '--no-audio', '--no-spu', '--no-osd', '--no-sub-autodetect-file',
+                '--avcodec-hw=none', '--avcodec-threads=1', '--avcodec-skiploopfilter=4')
+    OPEN_TIMEOUT_S = 10.0
+    FRAME_TIMEOUT_S = 3.0  # Skip a cue whose frame never arrives
+    PAUSE_S = 0.05  # Between frames, leaves the CPU to playback
+
+    def __init__(self, video_path, timeline, keyframes, max_lead_ms, cache):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.video_path = video_path
+        self.timeline = timeline
+        self.keyframes = keyframes
+        self.max_lead_ms = max_lead_ms
+        self.cache = cache
+        self.fingerprint = None
+        self.signals = ThumbnailSignals()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        # The thumbnail pool runs nothing else, so its thread is left idle
+        QThread.currentThread().setPriority(QThread.Priority.IdlePriority)
+        try:
+            self.fingerprint = video_fingerprint(self.video_path)
+            self.signals.ready.emit(self, self.fingerprint)
+            # Frames are keyed by cue start but grabbed from the seek
+            # target, usually a keyframe, which needs nothing decoded first
+            starts = self.timeline.starts
+            if self.keyframes:
+                targets = cue_seek_times(self.timeline, self.keyframes, self.max_lead_ms)
+            else:
+                targets = starts
+            cached = self.cache.cached_times(self.fingerprint)
+            pending = {}
+            for start, target in zip(starts, targets):
+                if start not in cached:
+                    pending.setdefault(start, target)
+            total = len(cached) + len(pending)
+            saved = self.grab_frames(pending) if pending else 0
+            if not self.cancel_event.is_set():
+                self.signals.finished.emit(self, len(cached) + saved, total)
+        except Exception as e:
+            self.signals.failed.emit(self, str(e))
+
+    def grab_frames(self, pending):
+        # Returns how many frames were saved. The player plays only while a
+        # frame is awaited; the second frame shown after a seek is kept, as
+        # the first may still be from before it.
+        frame = {'buffer': None, 'width': 0, 'height': 0, 'pitch': 0, 'images': []}
+        capturing = threading.Event()
+        captured = threading.Event()
+
+        def setup(opaque, chroma, width, height, pitches, lines):
+            scaled = max(2, round(self.WIDTH * height[0] / max(1, width[0])) // 2 * 2)
+            ctypes.memmove(chroma, b'RV32', 4)
+            width[0], height[0] = self.WIDTH, scaled
+            pitches[0], lines[0] = self.WIDTH * 4, scaled
+            frame.update(buffer=ctypes.create_string_buffer(self.WIDTH * 4 * scaled),
+                         width=self.WIDTH, height=scaled, pitch=self.WIDTH * 4)
+            return 1
+
+        def lock(opaque, planes):
+            planes[0] = ctypes.addressof(frame['buffer'])
+            return None
+
+        def display(opaque, picture):
+            if capturing.is_set():
+                images = frame['images']
+                images.append(ctypes.string_at(frame['buffer'], frame['pitch'] * frame['height']))
+                if len(images) >= 2:
+                    captured.set()
+
+        setup_callback = _VIDEO_FORMAT_CB(setup)
+        callbacks = (ctypes.cast(setup_callback, vlc.CallbackDecorators.VideoFormatCb),
+                     vlc.CallbackDecorators.VideoCleanupCb(lambda opaque: None),
+                     vlc.CallbackDecorators.VideoLockCb(lock),
+                     vlc.CallbackDecorators.VideoUnlockCb(lambda opaque, picture, planes: None),
+                     vlc.CallbackDecorators.VideoDisplayCb(display))
+
+        def wait_for_frame(timeout):
+            # The second frame shown from now on, None on timeout or cancel
+            frame['images'] = []
+            captured.clear()
+            capturing.set()
+            deadline = time.monotonic() + timeout
+            try:
+                while not captured.wait(0.1):
+                    if self.cancel_event.is_set() or time.monotonic() > deadline:
+                        return None
+            finally:
+                capturing.clear()
+            return QImage(frame['images'][1], frame['width'], frame['height'],
+                          frame['pitch'], QImage.Format.Format_RGB32).copy()
+
+        instance = vlc.Instance(' '.join(self.VLC_ARGS))
+        player = instance.media_player_new()
+        media = instance.media_new(self.video_path)
+        player.video_set_format_callbacks(callbacks[0], callbacks[1])
+        player.video_set_callbacks(callbacks[2], callbacks[3], callbacks[4], None)
+        player.set_media(media)
+        saved = 0
+        try:
+            if player.play() == -1:
+                raise RuntimeError("VLC could not open the video")
+            if wait_for_frame(self.OPEN_TIMEOUT_S) is None:
+                if self.cancel_event.is_set():
+                    return saved
+                raise RuntimeError("VLC could not decode the video")
+            player.set_pause(1)
+            for start, target in sorted(pending.items()):
+                if self.cancel_event.wait(self.PAUSE_S):
+                    break
+                player.set_time(max(0, target))
+                player.set_pause(0)
+                image = wait_for_frame(self.FRAME_TIMEOUT_S)
+                player.set_pause(1)
+                if image is not None:
+                    self.cache.save(self.fingerprint, start, image)
+                    saved += 1
+                    self.signals.frame_saved.emit(self, start)
+                elif player.get_state() in (vlc.State.Ended, vlc.State.Error):
+                    break  # Cues past the end of the video, no more frames to come
+        finally:
+            player.stop()
+            player.release()
+            media.release()
+            instance.release()
+        return saved
+
+
+ClipJob = namedtuple('ClipJob', 'cue start end texts')  # texts: {track title: line}
+
+# Clip kind -> (file extension, stream output transcode options). Both are
+# MP4 files with AAC audio, which phones and flashcard apps play as is.
+CLIP_FORMATS = {
+    'audio': ('.m4a', 'vcodec=none,acodec=mp4a,ab=128,channels=2,samplerate=44100'),
+    'video': ('.mp4', 'vcodec=h264,venc=x264{preset=veryfast,threads=1},vb=1000,width=640,'
+                      'acodec=mp4a,ab=128,channels=2,samplerate=44100'),
+}
+
+_clip_vlc = None  # libvlc instance of an export worker process
+
+
+def export_cue_clip(video_path, start, end, destination, clip_format):
+    # Runs in an export worker process: transcodes start..end ms of the
+    # video through stream output, one decoder and encoder thread so the
+    # worker processes share the cores. The clip is written under a
+    # temporary name and renamed once complete, so a clip that exists is
+    # always whole.
+    global _clip_vlc
+    if _clip_vlc is None:
+        load_vlc()
+        _clip_vlc = vlc.Instance('--quiet --no-video-title-show')
+    _, transcode = CLIP_FORMATS[clip_format]
+    temp_path = destination + '.part'
+    target = temp_path.replace('\\', '/').replace('"', '\\"')
+    options = [f':start-time={start / 1000:.3f}', f':stop-time={end / 1000:.3f}',
+               f':sout=#transcode{{{transcode}}}:std{{access=file,mux=mp4,dst="{target}"}}',
+               ':no-sout-spu', ':no-sub-autodetect-file', ':avcodec-threads=1']
+    if clip_format == 'audio':
+        options.append(':no-sout-video')
+    media = _clip_vlc.media_new(video_path, *options)
+    player = _clip_vlc.media_player_new()
+    outcome = []
+    done = threading.Event()
+
+    def on_event(event, result):
+        outcome.append(result)
+        done.set()
+
+    events = player.event_manager()
+    events.event_attach(vlc.EventType.MediaPlayerEndReached, on_event, 'end')
+    events.event_attach(vlc.EventType.MediaPlayerEncounteredError, on_event, 'error')
+    player.set_media(media)
     try:
-        import vlc
-    except Exception as e:
-        # Create message box without web browser launch
-        app = QApplication(sys.argv)
-        msg_box = QMessageBox()
-        msg_box.setWindowTitle("VLC Not Found")
-        msg_box.setText(
-            "VLC Media Player is required but was not found.")
-        msg_box.setInformativeText(
-            "Please install VLC from videolan.org")
-        msg_box.setStandardButtons(QMessageBox.StandardButton.Ok)
-        msg_box.exec()
-        sys.exit(1)
+        if player.play() == -1:
+            raise RuntimeError("VLC could not open the video")
+        # Far longer than transcoding takes, only there so a stuck clip
+        # cannot hold its worker forever
+        if not done.wait(60 + 10 * (end - start) / 1000):
+            outcome.append('timeout')
+    finally:
+        events.event_detach(vlc.EventType.MediaPlayerEndReached)
+        events.event_detach(vlc.EventType.MediaPlayerEncounteredError)
+        player.stop()  # Also finalizes the MP4 file
+        player.release()
+        media.release()
+    if outcome[0] != 'end' or not os.path.exists(temp_path):
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise RuntimeError("VLC could not cut the clip")
+    os.replace(temp_path, destination)
+
+
+class ClipExporter:
+    # Cuts cues of a video into clips in one folder, several at a time in
+    # worker processes, and lists them in manifest.json with the lines of
+    # every track. Clips already in the folder are kept, so an export that
+    # was cancelled or cut short resumes where it stopped when run again.
+    # Clip names carry a hash of the source video's full path, the format
+    # and the padded span, so only a clip cut the same way counts as there.
+    MANIFEST = 'manifest.json'
+    MANIFEST_EVERY = 50  # Clips between manifest rewrites
+
+    def __init__(self, video_path, folder, clip_format, workers=None):
+        self.video_path = video_path
+        self.folder = folder
+        self.clip_format = clip_format
+        self.workers = workers
+        self.stem = os.path.splitext(os.path.basename(video_path))[0]
+        self.source = os.path.normcase(os.path.abspath(video_path))
+        self.manifest_path = os.path.join(folder, self.MANIFEST)
+
+    def clip_name(self, job):
+        digest = hashlib.blake2b(f'{self.source}|{self.clip_format}|{job.start}|{job.end}'.encode(),
+                                 digest_size=4).hexdigest()
+        return f"{self.stem}_{job.cue + 1:05d}_{digest}{CLIP_FORMATS[self.clip_format][0]}"
+
+    def read_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                clips = json.load(f)['clips']
+            return {clip['clip']: clip for clip in clips}
+        except (OSError, ValueError, KeyError, TypeError):
+            return {}
+
+    def write_manifest(self, clips):
+        # Only clips that are on disk, other exports to the folder included
+        entries = sorted((clip for name, clip in clips.items()
+                          if os.path.exists(os.path.join(self.folder, name))),
+                         key=lambda clip: (clip['video'], clip['start']))
+        with open(self.manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'clips': entries}, f, ensure_ascii=False, indent=1)
+        os.replace(self.manifest_path + '.tmp', self.manifest_path)
+
+    def entry(self, job):
+        return {'clip': self.clip_name(job), 'video': os.path.basename(self.video_path),
+                'start': job.start, 'end': job.end, 'texts': job.texts}
+
+    def run(self, jobs, progress=None, cancel_event=None):
+        # Returns (clips made, clips already there, [(cue, error)]).
+        # progress(clips done, clips) is called from the calling thread.
+        os.makedirs(self.folder, exist_ok=True)
+        clips = self.read_manifest()
+        pending = []
+        for job in jobs:
+            clips[self.clip_name(job)] = self.entry(job)
+            if not os.path.exists(os.path.join(self.folder, self.clip_name(job))):
+                pending.append(job)
+        existing = len(jobs) - len(pending)
+        made = 0
+        failed = []
+        if progress is not None:
+            progress(existing, len(jobs))
+        if pending:
+            with ProcessPoolExecutor(self.workers,
+                                     mp_context=multiprocessing.get_context('spawn')) as pool:
+                futures = {pool.submit(export_cue_clip, self.video_path, job.start, job.end,
+                                       os.path.join(self.folder, self.clip_name(job)),
+                                       self.clip_format): job
+                           for job in pending}
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                        made += 1
+                    except Exception as e:
+                        failed.append((futures[future].cue, str(e)))
+                    completed = made + len(failed)
+                    if completed % self.MANIFEST_EVERY == 0:
+                        self.write_manifest(clips)
+                    if progress is not None:
+                        progress(existing + completed, len(jobs))
+                    if cancel_event is not None and cancel_event.is_set():
+                        pool.shutdown(wait=True, cancel_futures=True)
+                        break
+            # Clips already handed to a worker when cancelled are finished too
+            made = sum(1 for job in pending
+                       if os.path.exists(os.path.join(self.folder, self.clip_name(job))))
+        self.write_manifest(clips)
+        return made, existing, failed
+
+
+SearchHit = namedtuple('SearchHit', 'path embedded_track cue start end text')
+
+
+class SQLiteStore:
+    # One SQLite database shared by the GUI and pool threads. Each thread
+    # gets its own connection; WAL lets reads run while another thread
+    # writes, and write_lock keeps writers from queueing on the file lock.
+    SCHEMA = ""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.write_lock = threading.Lock()
+        with self.connection() as db:
+            db.executescript(self.SCHEMA)
+
+    def connection(self):
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self.local.db = db
+        return db
+
+
+class SubtitleSearchIndex(SQLiteStore):
+    # Full-text index over every subtitle file the player has seen, in one
+    # SQLite FTS5 table. A cue's rowid is file_id << CUE_BITS | cue index,
+    # so a file's cues are one rowid range: replacing a changed file is a
+    # range delete, and limiting a search to the open files is a range
+    # constraint FTS5 answers without touching the rest of the library.
+    # Files are re-read only when their size or mtime changed.
+    CUE_BITS = 20
+    MAX_CUES = 1 << CUE_BITS
+    STANDALONE = -1  # track column of subtitle files, else the Matroska track
+    _TAG = re.compile(r'<[^>]*>')
+    _WORD = re.compile(r'\w+')
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY, path TEXT NOT NULL, track INTEGER NOT NULL,
+            size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, UNIQUE (path, track));
+        CREATE TABLE IF NOT EXISTS folders (path TEXT PRIMARY KEY);
+        CREATE VIRTUAL TABLE IF NOT EXISTS cues USING fts5(
+            text, start_ms UNINDEXED, end_ms UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4');
+    """
+
+    @staticmethod
+    def normalized(path):
+        return os.path.abspath(path)
+
+    def is_current(self, path, embedded_track=None, stat=None):
+        stat = stat or os.stat(path)
+        track = self.STANDALONE if embedded_track is None else embedded_track
+        row = self.connection().execute(
+            'SELECT size, mtime_ns FROM files WHERE path = ? AND track = ?',
+            (self.normalized(path), track)).fetchone()
+        return row == (stat.st_size, stat.st_mtime_ns)
+
+    def add_store(self, path, store, embedded_track=None):
+        # Index a parsed track unless the file is unchanged since last time
+        stat = os.stat(path)
+        if self.is_current(path, embedded_track, stat):
+            return False
+        track = self.STANDALONE if embedded_track is None else embedded_track
+        rows = ((index, self._TAG.sub('', text), store.starts[index], store.ends[index])
+                for index, text in enumerate(store.texts[:self.MAX_CUES]))
+        with self.write_lock, self.connection() as db:
+            file_id = self._replace_file(db, self.normalized(path), track, stat)
+            base = file_id << self.CUE_BITS
+            db.executemany('INSERT INTO cues (rowid, text, start_ms, end_ms) VALUES (?, ?, ?, ?)',
+                           ((base + index, text, start, end) for index, text, start, end in rows))
+        return True
+
+    def _replace_file(self, db, path, track, stat):
+        row = db.execute('SELECT id FROM files WHERE path = ? AND track = ?',
+                         (path, track)).fetchone()
+        if row is None:
+            return db.execute('INSERT INTO files (path, track, size, mtime_ns) VALUES (?, ?, ?, ?)',
+                              (path, track, stat.st_size, stat.st_mtime_ns)).lastrowid
+        self._delete_cues(db, row[0])
+        db.execute('UPDATE files SET size = ?, mtime_ns = ? WHERE id = ?',
+                   (stat.st_size, stat.st_mtime_ns, row[0]))
+        return row[0]
+
+    def _delete_cues(self, db, file_id):
+        db.execute('DELETE FROM cues WHERE rowid BETWEEN ? AND ?',
+                   (file_id << self.CUE_BITS, ((file_id + 1) << self.CUE_BITS) - 1))
+
+    def folders(self):
+        return [row[0] for row in self.connection().execute('SELECT path FROM folders')]
+
+    def index_folder(self, folder, progress=None, cancel_event=None):
+        # Bring every subtitle file under folder up to date; returns the
+        # number of files (re)indexed. progress(done, total) after each file.
+        folder = self.normalized(folder)
+        with self.write_lock, self.connection() as db:
+            db.execute('INSERT OR IGNORE INTO folders (path) VALUES (?)', (folder,))
+        paths = []
+        for root, _, names in os.walk(folder):
+            paths.extend(os.path.join(root, name) for name in names
+                         if os.path.splitext(name)[1].lower() in SUBTITLE_EXTENSIONS)
+
+        indexed = 0
+        for done, path in enumerate(paths, 1):
+            if cancel_event is not None and cancel_event.is_set():
+                return indexed
+            try:
+                if not self.is_current(path):
+                    store = CueStore()
+                    for _ in parse_subtitle_file(path, store):
+                        pass
+                    store.finish()
+                    indexed += self.add_store(path, store)
+            except (OSError, ValueError) as e:
+                print(f"Error indexing {path}: {e}")
+            if progress is not None:
+                progress(done, len(paths))
+
+        # Forget files deleted from the folder since the last scan
+        seen = set(paths)
+        prefix = os.path.join(folder, '')
+        with self.write_lock, self.connection() as db:
+            gone = [(file_id, path) for file_id, path in db.execute(
+                        'SELECT id, path FROM files WHERE track = ? AND path >= ? AND path < ?',
+                        (self.STANDALONE, prefix, prefix + '\U0010FFFF'))
+                    if path not in seen]
+            for file_id, _ in gone:
+                self._delete_cues(db, file_id)
+                db.execute('DELETE FROM files WHERE id = ?', (file_id,))
+        return indexed
+
+    @classmethod
+    def match_expression(cls, query):
+        # Every word must appear, the last one may be a prefix (search as you type)
+        words = cls._WORD.findall(query)
+        if not words:
+            return None
+        terms = [f'"{word}"' for word in words]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, query, limit=200, prefer=()):
+        # Hits for the query; cues of the files in prefer, given as
+        # (path, embedded_track) pairs, come first
+        expression = self.match_expression(query)
+        if expression is None:
+            return []
+        db = self.connection()
+        file_ids = {}
+        for path, embedded_track in prefer:
+            track = self.STANDALONE if embedded_track is None else embedded_track
+            row = db.execute('SELECT id FROM files WHERE path = ? AND track = ?',
+                             (self.normalized(path), track)).fetchone()
+            if row is not None:
+                file_ids[row[0]] = None
+
+        statement = 'SELECT rowid, start_ms, end_ms, text FROM cues WHERE cues MATCH ?'
+        rows = []
+        for file_id in file_ids:
+            rows += db.execute(statement + ' AND rowid BETWEEN ? AND ? LIMIT ?',
+                               (expression, file_id << self.CUE_BITS,
+                                ((file_id + 1) << self.CUE_BITS) - 1, limit - len(rows))).fetchall()
+            if len(rows) >= limit:
+                break
+        if len(rows) < limit:
+            seen = {row[0] for row in rows}
+            for row in db.execute(statement + ' LIMIT ?', (expression, limit + len(seen))):
+                if row[0] not in seen and len(rows) < limit:
+                    rows.append(row)
+
+        files = {}
+        hits = []
+        for rowid, start, end, text in rows:
+            file_id = rowid >> self.CUE_BITS
+            if file_id not in files:
+                files[file_id] = db.execute('SELECT path, track FROM files WHERE id = ?',
+                                            (file_id,)).fetchone()
+            path, track = files[file_id]
+            hits.append(SearchHit(path, None if track == self.STANDALONE else track,
+                                  rowid & (self.MAX_CUES - 1), start, end, text))
+        return hits
+
+
+_NAME_SEPARATORS = re.compile(r'[\s._\-()\[\]]+')
+
+
+def subtitle_language(words, languages):
+    # Track key named by the last language word of a file name, else None
+    return next((key for word in reversed(words)
+                 for key, names in languages.items() if word in names), None)
+
+
+def pair_subtitles(videos, subtitles, languages):
+    # {video name: {track key: subtitle name}} for the files of one folder.
+    # "Movie.en.srt", "Movie_Persian.srt" and "Movie.fa.forced.srt" belong to
+    # "Movie.mkv" by name; the words after the video's name give the track
+    # (languages: track key -> lower-case names and codes). A subtitle named
+    # exactly like the video goes to the first track, and when a folder
+    # holds a single video its subtitles need only a language.
+    stems = {video: os.path.splitext(video)[0].lower() for video in videos}
+    pairs = {video: {} for video in videos}
+    forced = {}
+    first_key = next(iter(languages))
+    for subtitle in sorted(subtitles):
+        stem = os.path.splitext(subtitle)[0].lower()
+        owners = [video for video in videos if stem == stems[video] or (
+            stem.startswith(stems[video]) and not stem[len(stems[video])].isalnum())]
+        if owners:
+            video = max(owners, key=lambda video: len(stems[video]))
+            rest = stem[len(stems[video]):]
+        elif len(videos) == 1:
+            video, rest = videos[0], stem
+        else:
+            continue
+
+        words = [word for word in _NAME_SEPARATORS.split(rest) if word]
+        key = subtitle_language(words, languages)
+        if key is None:
+            if words:
+                continue  # Some other language or a variant we cannot place
+            key = first_key
+        is_forced = 'forced' in words
+        if key not in pairs[video] or (forced[video, key] and not is_forced):
+            pairs[video][key] = subtitle
+            forced[video, key] = is_forced
+    return pairs
+
+
+LibraryEntry = namedtuple('LibraryEntry', 'video subtitles')  # subtitles: {track key: path}
+
+
+class MediaLibrary(SQLiteStore):
+    # Catalog of the videos under the folders the user added, each paired
+    # with its subtitle files. Folders are listed on a thread pool, which
+    # matters most on network shares. Rescans are incremental: a folder
+    # whose mtime is unchanged has the same entries, so it is not listed
+    # again and its stored subfolders are visited directly. Only folders
+    # where files came, went or were renamed get paired again.
+    SCAN_WORKERS = 8
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS roots (path TEXT PRIMARY KEY);
+        CREATE TABLE IF NOT EXISTS directories (
+            path TEXT PRIMARY KEY, root TEXT NOT NULL, mtime_ns INTEGER NOT NULL,
+            subdirectories TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS entries (
+            video TEXT PRIMARY KEY, directory TEXT NOT NULL, subtitles TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS entries_directory ON entries (directory);
+        CREATE INDEX IF NOT EXISTS directories_root ON directories (root);
+    """
+
+    def __init__(self, path, languages):
+        super().__init__(path)
+        self.languages = languages
+
+    def roots(self):
+        return [row[0] for row in self.connection().execute('SELECT path FROM roots ORDER BY path')]
+
+    def add_root(self, folder):
+        folder = os.path.abspath(folder)
+        with self.write_lock, self.connection() as db:
+            db.execute('INSERT OR IGNORE INTO roots (path) VALUES (?)', (folder,))
+        return folder
+
+    def remove_root(self, folder):
+        with self.write_lock, self.connection() as db:
+            db.execute('DELETE FROM entries WHERE directory IN '
+                       '(SELECT path FROM directories WHERE root = ?)', (folder,))
+            db.execute('DELETE FROM directories WHERE root = ?', (folder,))
+            db.execute('DELETE FROM roots WHERE path = ?', (folder,))
+
+    def entries(self):
+        return [LibraryEntry(video, json.loads(subtitles)) for video, subtitles in
+                self.connection().execute('SELECT video, subtitles FROM entries ORDER BY video')]
+
+    def read_directory(self, path, known):
+        # Runs on the scan workers: (path, mtime, subdirectories, pairs or
+        # None when unchanged), or None when the folder is gone
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            if known is not None and known[0] == mtime:
+                return path, mtime, json.loads(known[1]), None
+            videos, subtitles, subdirectories = [], [], []
+            with os.scandir(path) as listing:
+                for entry in listing:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append(entry.path)
+                        continue
+                    extension = os.path.splitext(entry.name)[1].lower()
+                    if extension in VIDEO_EXTENSIONS:
+                        videos.append(entry.name)
+                    elif extension in SUBTITLE_EXTENSIONS:
+                        subtitles.append(entry.name)
+        except OSError:
+            return None
+        return path, mtime, subdirectories, pair_subtitles(videos, subtitles, self.languages)
+
+    def scan(self, root, progress=None):
+        # Bring the catalog for root up to date; returns the folders re-read.
+        # progress(folders visited) is called from the calling thread.
+        db = self.connection()
+        known = {path: (mtime, subdirectories) for path, mtime, subdirectories in db.execute(
+            'SELECT path, mtime_ns, subdirectories FROM directories WHERE root = ?', (root,))}
+        seen = set()
+        changed = 0
+        with ThreadPoolExecutor(self.SCAN_WORKERS, thread_name_prefix='library-scan') as pool:
+            pending = {pool.submit(self.read_directory, root, known.get(root))}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if result is None:
+                        continue
+                    path, mtime, subdirectories, pairs = result
+                    seen.add(path)
+                    for subdirectory in subdirectories:
+                        pending.add(pool.submit(self.read_directory, subdirectory,
+                                                known.get(subdirectory)))
+                    if pairs is not None:
+                        self.store_directory(root, path, mtime, subdirectories, pairs)
+                        changed += 1
+                if progress is not None:
+                    progress(len(seen))
+
+        gone = [path for path in known if path not in seen]
+        with self.write_lock, db:
+            for path in gone:
+                db.execute('DELETE FROM entries WHERE directory = ?', (path,))
+                db.execute('DELETE FROM directories WHERE path = ?', (path,))
+        return changed
+
+    def store_directory(self, root, path, mtime, subdirectories, pairs):
+        with self.write_lock, self.connection() as db:
+            db.execute('DELETE FROM entries WHERE directory = ?', (path,))
+            db.executemany(
+                'INSERT OR REPLACE INTO entries (video, directory, subtitles) VALUES (?, ?, ?)',
+                ((os.path.join(path, video), path,
+                  json.dumps({key: os.path.join(path, name) for key, name in tracks.items()}))
+                 for video, tracks in pairs.items()))
+            db.execute('INSERT OR REPLACE INTO directories (path, root, mtime_ns, subdirectories) '
+                       'VALUES (?, ?, ?, ?)', (path, root, mtime, json.dumps(subdirectories)))
+
+
+def primary_language_subtitles(names, languages):
+    # The subtitle files of one folder in the first track's language: the
+    # ones paired with a video for that track, and any named for it
+    videos = [name for name in names if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS]
+    subtitles = [name for name in names
+                 if os.path.splitext(name)[1].lower() in SUBTITLE_EXTENSIONS]
+    first_key = next(iter(languages))
+    chosen = {tracks[first_key] for tracks in pair_subtitles(videos, subtitles, languages).values()
+              if first_key in tracks}
+    for name in subtitles:
+        words = _NAME_SEPARATORS.split(os.path.splitext(name)[0].lower())
+        if subtitle_language(words, languages) == first_key:
+            chosen.add(name)
+    return sorted(chosen)
+
+
+_MARKUP_TAG = re.compile(r'<[^>]*>')
+_POSSESSIVE = re.compile(r"'s\b")
+_ENGLISH_WORD = re.compile(r"[a-z]+(?:'[a-z]+)*")
+# Lines of SRT and WebVTT files that are not cue text
+_CUE_FRAMING = re.compile(r'^(?:\s*\d+\s*|.*-->.*|WEBVTT.*)$', re.MULTILINE)
+
+
+def english_words(text):
+    text = _MARKUP_TAG.sub(' ', text.lower().replace('\u2019', "'"))
+    return _ENGLISH_WORD.findall(_POSSESSIVE.sub('', text))
+
+
+def subtitle_file_text(path):
+    # All cue text of a subtitle file as one string. Counting words needs
+    # no timings, so SRT and WebVTT skip the cue parser entirely
+    with open_subtitle_text(path) as f:
+        first_line = f.readline()
+        if detect_subtitle_format(path, first_line) == 'ass':
+            return '\n'.join(text for _, _, text in iter_ass_cues(_prepend(first_line, f)))
+        return _CUE_FRAMING.sub('', first_line + f.read())
+
+
+def count_subtitle_words(paths):
+    # Runs in the corpus worker processes. Counts the words of each file and
+    # returns (path, size, mtime_ns, tokens, packed counts) per file, plus
+    # the batch's summed counts and file counts so the parent only merges
+    # one table per batch
+    files = []
+    batch_counts = Counter()
+    batch_files = Counter()
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            words = english_words(subtitle_file_text(path))
+        except OSError:
+            continue
+        counts = Counter(words)
+        batch_counts.update(words)
+        batch_files.update(counts.keys())
+        files.append((path, stat.st_size, stat.st_mtime_ns, sum(counts.values()),
+                      VocabularyCorpus.pack(counts)))
+    return files, batch_counts, batch_files
+
+
+def file_coverage(files, core_words):
+    # Runs in the corpus worker processes: (file id, share of the running
+    # words in core_words, distinct words outside it) per (file id, packed counts)
+    results = []
+    for file_id, packed in files:
+        words, counts = VocabularyCorpus.unpack(packed)
+        in_core = list(map(core_words.__contains__, words))
+        tokens = sum(counts)
+        covered = sum(compress(counts, in_core))
+        results.append((file_id, covered / tokens if tokens else 1.0,
+                        len(words) - sum(in_core)))
+    return results
+
+
+class VocabularyCorpus(SQLiteStore):
+    # Word frequencies of the English subtitles in the analyzed folders.
+    # Each file's counts are stored packed in its row (the per-episode
+    # table) and summed into the words table (the global one). The core
+    # vocabulary is the most frequent words that together make up
+    # CORE_COVERAGE of all running words; anything outside it is rare, and
+    # a file's coverage is the share of its running words in the core.
+    # Parsing and counting run in a process pool in batches; files whose
+    # size and mtime are unchanged are not read again. Results are merged
+    # in memory and committed together with their share of the global
+    # counts every CHECKPOINT_FILES files, so an interrupted run keeps its
+    # progress and the totals always match the stored files.
+    CORE_COVERAGE = 0.95
+    BATCH_FILES = 100
+    CHECKPOINT_FILES = 1000
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS folders (path TEXT PRIMARY KEY);
+        CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, folder TEXT NOT NULL,
+            size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, tokens INTEGER NOT NULL,
+            counts BLOB NOT NULL, coverage REAL, rare_words INTEGER);
+        CREATE INDEX IF NOT EXISTS files_folder ON files (folder);
+        CREATE TABLE IF NOT EXISTS words (
+            word TEXT PRIMARY KEY, count INTEGER NOT NULL, files INTEGER NOT NULL) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+    """
+
+    def __init__(self, path, languages):
+        super().__init__(path)
+        self.languages = languages
+
+    @staticmethod
+    def pack(counts):
+        # Word count, the counts as 32-bit integers, then the words
+        data = struct.pack('<I', len(counts)) + array('I', counts.values()).tobytes()
+        return zlib.compress(data + '\n'.join(counts).encode('utf-8'), 1)
+
+    @staticmethod
+    def unpack(packed):
+        # ([words], array of their counts)
+        data = zlib.decompress(packed)
+        size = struct.unpack_from('<I', data)[0]
+        counts = array('I')
+        counts.frombytes(data[4:4 + 4 * size])
+        words = data[4 + 4 * size:].decode('utf-8').split('\n') if size else []
+        return words, counts
+
+    def folders(self):
+        return [row[0] for row in self.connection().execute('SELECT path FROM folders ORDER BY path')]
+
+    def core_min_count(self):
+        # Words counted at least this often are core vocabulary
+        row = self.connection().execute(
+            "SELECT value FROM meta WHERE key = 'core_min_count'").fetchone()
+        return row[0] if row else None
+
+    def rare_words(self, words):
+        # The given words that are outside the core vocabulary, None when
+        # nothing has been analyzed yet
+        threshold = self.core_min_count()
+        if threshold is None:
+            return None
+        words = list(set(words))
+        common = set()
+        db = self.connection()
+        for first in range(0, len(words), 500):
+            chunk = words[first:first + 500]
+            common.update(row[0] for row in db.execute(
+                f"SELECT word FROM words WHERE count >= ? AND word IN "
+                f"({','.join('?' * len(chunk))})", [threshold] + chunk))
+        return {word for word in words if word not in common}
+
+    def coverage(self):
+        # {path: (coverage, rare words)} of the analyzed files
+        return {path: (coverage, rare) for path, coverage, rare in self.connection().execute(
+            'SELECT path, coverage, rare_words FROM files WHERE coverage IS NOT NULL')}
+
+    def list_folder(self, folder):
+        paths = []
+        for directory, subdirectories, names in os.walk(folder):
+            subdirectories[:] = [name for name in subdirectories if not name.startswith('.')]
+            paths.extend(os.path.join(directory, name)
+                         for name in primary_language_subtitles(names, self.languages))
+        return paths
+
+    def analyze(self, folders, progress=None, workers=None):
+        # Bring the corpus up to date with the folders; returns the files
+        # (re)counted. progress(files done, files to count) is called from
+        # the calling thread.
+        db = self.connection()
+        with self.write_lock, db:
+            db.executemany('INSERT OR IGNORE INTO folders (path) VALUES (?)',
+                           ((folder,) for folder in folders))
+
+        stale = []  # (file id, packed counts) whose counts must come off the totals
+        pending = []
+        for folder in folders:
+            known = {path: (file_id, size, mtime_ns) for file_id, path, size, mtime_ns in db.execute(
+                'SELECT id, path, size, mtime_ns FROM files WHERE folder = ?', (folder,))}
+            for path in self.list_folder(folder):
+                previous = known.pop(path, None)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if previous is not None and previous[1:] == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                if previous is not None:
+                    stale.append(previous[0])
+                pending.append(path)
+            stale.extend(file_id for file_id, _, _ in known.values())
+
+        if stale:
+            self.remove_files(stale)
+        if pending:
+            self.count_files(folders, pending, progress, workers)
+        if stale or pending or self.core_min_count() is None:
+            self.update_coverage(workers)
+        return len(pending)
+
+    def remove_files(self, file_ids):
+        db = self.connection()
+        counts = Counter()
+        files = Counter()
+        for file_id in file_ids:
+            row = db.execute('SELECT counts FROM files WHERE id = ?', (file_id,)).fetchone()
+            if row is not None:
+                words, file_counts = self.unpack(row[0])
+                counts.update(dict(zip(words, file_counts)))
+                files.update(words)
+        with self.write_lock, db:
+            db.executemany('DELETE FROM files WHERE id = ?', ((file_id,) for file_id in file_ids))
+            db.executemany('UPDATE words SET count = count - ?, files = files - ? WHERE word = ?',
+                           ((count, files[word], word) for word, count in counts.items()))
+            db.execute('DELETE FROM words WHERE count <= 0')
+
+    def count_files(self, folders, paths, progress, workers):
+        def folder_of(path):
+            return max((folder for folder in folders
+                        if path.startswith(os.path.join(folder, ''))), key=len)
+
+        def checkpoint():
+            with self.write_lock, db:
+                db.executemany(
+                    'INSERT OR REPLACE INTO files (path, folder, size, mtime_ns, tokens, counts) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    ((path, folder_of(path), size, mtime_ns, tokens, packed)
+                     for path, size, mtime_ns, tokens, packed in pending_files))
+                db.executemany(
+                    'INSERT INTO words (word, count, files) VALUES (?, ?, ?) '
+                    'ON CONFLICT (word) DO UPDATE SET count = count + excluded.count, '
+                    'files = files + excluded.files',
+                    ((word, count, pending_file_counts[word])
+                     for word, count in pending_counts.items()))
+            pending_files.clear()
+            pending_counts.clear()
+            pending_file_counts.clear()
+
+        batches = [paths[first:first + self.BATCH_FILES]
+                   for first in range(0, len(paths), self.BATCH_FILES)]
+        db = self.connection()
+        pending_files = []
+        pending_counts = Counter()
+        pending_file_counts = Counter()
+        done = 0
+        # Spawned rather than forked workers: forking a process that runs Qt
+        # and libvlc threads is unsafe, and Windows only spawns anyway
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            for future in as_completed([pool.submit(count_subtitle_words, batch)
+                                        for batch in batches]):
+                files, counts, file_counts = future.result()
+                pending_files.extend(files)
+                pending_counts.update(counts)
+                pending_file_counts.update(file_counts)
+                if len(pending_files) >= self.CHECKPOINT_FILES:
+                    checkpoint()
+                done += len(files)
+                if progress is not None:
+                    progress(done, len(paths))
+        checkpoint()
+
+    def update_coverage(self, workers):
+        db = self.connection()
+        total = db.execute('SELECT COALESCE(SUM(tokens), 0) FROM files').fetchone()[0]
+        threshold = 1
+        covered = 0
+        for (count,) in db.execute('SELECT count FROM words ORDER BY count DESC'):
+            covered += count
+            threshold = count
+            if covered >= total * self.CORE_COVERAGE:
+                break
+        core_words = frozenset(row[0] for row in db.execute(
+            'SELECT word FROM words WHERE count >= ?', (threshold,)))
+
+        files = db.execute('SELECT id, counts FROM files').fetchall()
+        batches = [files[first:first + self.BATCH_FILES * 4]
+                   for first in range(0, len(files), self.BATCH_FILES * 4)]
+        results = []
+        if len(batches) > 1:
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                for batch_results in pool.map(file_coverage, batches, repeat(core_words)):
+                    results.extend(batch_results)
+        elif batches:
+            results = file_coverage(batches[0], core_words)
+        with self.write_lock, db:
+            db.executemany('UPDATE files SET coverage = ?, rare_words = ? WHERE id = ?',
+                           ((coverage, rare, file_id) for file_id, coverage, rare in results))
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('core_min_count', ?)",
+                       (threshold,))
+
+
+def rare_word_markup(text, rare_words, color='#FFD54F'):
+    # text with its rare words coloured, tags left alone; None if it has none
+    if not Qt.mightBeRichText(text):
+        text = html.escape(text, quote=False)
+    found = False
+
+    def mark(match):
+        nonlocal found
+        word = match.group(0)
+        if match.group(1) is not None:
+            return word  # A tag or an entity
+        normalized = word.lower().replace('\u2019', "'")
+        if normalized.endswith("'s"):
+            normalized = normalized[:-2]
+        if normalized not in rare_words:
+            return word
+        found = True
+        return f'<span style="color: {color};">{word}</span>'
+
+    marked = re.sub(r"(<[^>]*>|&#?\w+;)|[A-Za-z]+(?:['\u2019][A-Za-z]+)*", mark, text)
+    return marked if found else None
+
+
+class ReviewCard:
+    # One primary cue under review, keyed by its subtitle file, embedded
+    # track (-1 for files), start in the file (which syncing leaves alone)
+    # and text. Not by cue index: a re-parse may number the cues anew.
+    FIELDS = ('subtitle', 'track', 'start', 'text', 'video', 'end', 'ease',
+              'interval', 'repetitions', 'lapses', 'replays', 'due', 'reviewed')
+    __slots__ = FIELDS
+
+    def __init__(self, subtitle, track, start, text, video, end, ease=2.5,
+                 interval=0.0, repetitions=0, lapses=0, replays=0, due=0.0, reviewed=None):
+        self.subtitle = subtitle
+        self.track = track
+        self.start = start
+        self.text = text
+        self.video = video
+        self.end = end
+        self.ease = ease
+        self.interval = interval  # days
+        self.repetitions = repetitions  # successful reviews in a row
+        self.lapses = lapses
+        self.replays = replays  # Down presses and drills on the line
+        self.due = due  # epoch seconds
+        self.reviewed = reviewed
+
+    @property
+    def key(self):
+        return (self.subtitle, self.track, self.start, self.text)
+
+    def find_in(self, store):
+        # Index of the line in a parsed track, or None if the file changed
+        index = bisect_left(store.starts, self.start)
+        while index < len(store) and store.starts[index] == self.start:
+            if store.texts[index] == self.text:
+                return index
+            index += 1
+        return None
+
+    def row(self):
+        return tuple(getattr(self, field) for field in self.FIELDS)
+
+
+class ReviewScheduler:
+    # Cards in memory with a heap of (due, key) on top. Rescheduling pushes
+    # a new entry instead of finding the old one; entries whose time no
+    # longer matches their card are dropped when they reach the top. Both
+    # are O(log n), so picking the next card stays cheap with 100k cards.
+    # Grades follow SM-2: 1 again, 2 hard, 3 good, 4 easy.
+    QUALITY = {1: 0, 2: 3, 3: 4, 4: 5}  # grade -> SM-2 response quality
+    RELEARN_S = 600  # A failed card comes back in ten minutes
+    DAY_S = 86400
+    MIN_EASE = 1.3
+
+    def __init__(self, cards=()):
+        self.cards = {card.key: card for card in cards}
+        self.heap = [(card.due, card.key) for card in self.cards.values()]
+        heapq.heapify(self.heap)
+
+    def __len__(self):
+        return len(self.cards)
+
+    def get(self, key):
+        return self.cards.get(key)
+
+    def add(self, card):
+        self.cards[card.key] = card
+        heapq.heappush(self.heap, (card.due, card.key))
+
+    def next_due(self, now):
+        # Most overdue card due by now, or None
+        heap = self.heap
+        while heap:
+            due, key = heap[0]
+            card = self.cards.get(key)
+            if card is None or card.due != due:
+                heapq.heappop(heap)  # Rescheduled since, a newer entry exists
+                continue
+            return card if due <= now else None
+        return None
+
+    def postpone(self, card, seconds):
+        card.due += seconds
+        heapq.heappush(self.heap, (card.due, card.key))
+
+    def due_count(self, now):
+        return sum(1 for card in self.cards.values() if card.due <= now)
+
+    def rate(self, card, grade, now):
+        quality = self.QUALITY[grade]
+        if quality < 3:
+            card.repetitions = 0
+            card.lapses += 1
+            card.interval = 0.0
+            card.due = now + self.RELEARN_S
+        else:
+            if card.repetitions == 0:
+                card.interval = 1.0
+            elif card.repetitions == 1:
+                card.interval = 6.0
+            else:
+                card.interval = round(card.interval * card.ease, 2)
+            card.repetitions += 1
+            card.due = now + card.interval * self.DAY_S
+        card.ease = max(self.MIN_EASE,
+                        card.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        card.reviewed = now
+        heapq.heappush(self.heap, (card.due, card.key))
+
+
+class ReviewStore(SQLiteStore):
+    # Review cards and the log of what happened to each line: replays,
+    # drills and ratings. Written in batches from the review pool's one
+    # thread, so rows land in the order they were recorded.
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cards (
+            subtitle TEXT NOT NULL, track INTEGER NOT NULL, start INTEGER NOT NULL,
+            text TEXT NOT NULL, video TEXT NOT NULL, end INTEGER NOT NULL,
+            ease REAL NOT NULL, interval REAL NOT NULL,
+            repetitions INTEGER NOT NULL, lapses INTEGER NOT NULL, replays INTEGER NOT NULL,
+            due REAL NOT NULL, reviewed REAL,
+            PRIMARY KEY (subtitle, track, start, text)) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS outcomes (
+            subtitle TEXT NOT NULL, track INTEGER NOT NULL, start INTEGER NOT NULL,
+            text TEXT NOT NULL, time REAL NOT NULL, kind TEXT NOT NULL, grade INTEGER);
+    """
+
+    def load(self):
+        columns = ', '.join(ReviewCard.FIELDS)
+        return [ReviewCard(*row) for row in
+                self.connection().execute(f'SELECT {columns} FROM cards')]
+
+    def write(self, cards, outcomes):
+        # cards: ReviewCard.row() tuples, outcomes: (*ReviewCard.key, time, kind, grade)
+        columns = ', '.join(ReviewCard.FIELDS)
+        placeholders = ', '.join('?' * len(ReviewCard.FIELDS))
+        db = self.connection()
+        with self.write_lock, db:
+            db.executemany(f'INSERT OR REPLACE INTO cards ({columns}) VALUES ({placeholders})',
+                           cards)
+            db.executemany('INSERT INTO outcomes VALUES (?, ?, ?, ?, ?, ?, ?)', outcomes)
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile of an already sorted sequence
+    if not sorted_values:
+        return 0
+    rank = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[rank]
+
+
+class CueScheduler(QObject):
+    # Arms one precise single-shot timer for the next cue boundary or pause
+    # target instead of polling. libvlc time/state events re-anchor the
+    # playback clock, and seeks re-arm the deadline immediately. Deadlines
+    # are judged on the extrapolated clock: libvlc's get_time() only moves
+    # in coarse steps, and waiting for it to pass a deadline would poll.
+    player_event = pyqtSignal(str, int, float)  # kind, media time, monotonic stamp
+    playing_changed = pyqtSignal(bool)
+
+    MIN_DELAY_MS = 5  # Shortest timer, even for a deadline already due
+
+    def __init__(self, next_deadline, on_deadline, parent=None):
+        super().__init__(parent)
+        self.next_deadline = next_deadline  # callable(current_time) -> ms or None
+        self.on_deadline = on_deadline  # callable(current_time)
+        self.media_player = None
+        self.playing = False
+        self.anchor_time = 0
+        self.anchor_clock = time.monotonic()
+        self.armed_deadline = None
+        self.hit_latencies = deque(maxlen=1000)
+        self.pending_hit = None  # Pause target waiting for libvlc's Paused event
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self._fire)
+
+        # libvlc calls back on its own thread, hop to the GUI thread first
+        self.player_event.connect(self._on_player_event)
+
+    def attach(self, media_player):
+        self.detach()
+        self.media_player = media_player
+        try:
+            events = media_player.event_manager()
+            events.event_attach(vlc.EventType.MediaPlayerTimeChanged,
+                                self._vlc_time_changed)
+            events.event_attach(vlc.EventType.MediaPlayerPlaying,
+                                self._vlc_state_changed, 'playing')
+            events.event_attach(vlc.EventType.MediaPlayerPaused,
+                                self._vlc_state_changed, 'paused')
+            events.event_attach(vlc.EventType.MediaPlayerStopped,
+                                self._vlc_state_changed, 'stopped')
+            events.event_attach(vlc.EventType.MediaPlayerEndReached,
+                                self._vlc_state_changed, 'stopped')
+        except Exception as e:
+            # Deadlines still work from the extrapolated clock without events
+            print(f"Error attaching player events: {e}")
+
+    def detach(self):
+        self.timer.stop()
+        if self.media_player is None:
+            return
+        try:
+            events = self.media_player.event_manager()
+            for event_type in (vlc.EventType.MediaPlayerTimeChanged,
+                               vlc.EventType.MediaPlayerPlaying,
+                               vlc.EventType.MediaPlayerPaused,
+                               vlc.EventType.MediaPlayerStopped,
+                               vlc.EventType.MediaPlayerEndReached):
+                events.event_detach(event_type)
+        except Exception:
+            pass
+        self.media_player = None
+
+    # Stamped on the libvlc thread so latency figures leave out the hop
+    def _vlc_time_changed(self, event):
+        self.player_event.emit('time', event.u.new_time, time.monotonic())
+
+    def _vlc_state_changed(self, event, state):
+        self.player_event.emit(state, -1, time.monotonic())
+
+    def _on_player_event(self, kind, new_time, stamp):
+        if kind == 'time':
+            self._anchor(new_time)
+            self.rearm()
+        else:
+            if (kind == 'paused' and self.pending_hit is not None and
+                    self.media_player is not None):
+                # Where libvlc stopped, not where the clock thought it was
+                self.hit_latencies.append(self.media_player.get_time() - self.pending_hit)
+            self.pending_hit = None
+            self.set_playing(kind == 'playing')
+
+    def _anchor(self, media_time):
+        self.anchor_time = media_time
+        self.anchor_clock = time.monotonic()
+
+    def current_time(self):
+        # Media time extrapolated from the last known position
+        if not self.playing:
+            return self.anchor_time
+        elapsed = (time.monotonic() - self.anchor_clock) * 1000
+        return self.anchor_time + int(elapsed)
+
+    def seek(self, media_time):
+        self.pending_hit = None
+        self._anchor(media_time)
+        self.rearm()
+
+    def set_playing(self, playing):
+        changed = playing != self.playing
+        if changed:
+            self._anchor(self.current_time())
+            self.playing = playing
+        self.rearm()
+        if changed:
+            self.playing_changed.emit(playing)
+
+    def rearm(self):
+        if not self.playing or self.media_player is None:
+            self.timer.stop()
+            self.armed_deadline = None
+            return
+
+        now = self.current_time()
+        deadline = self.next_deadline(now)
+        if deadline is None:
+            self.timer.stop()
+            self.armed_deadline = None
+            return
+
+        self.armed_deadline = deadline
+        delay = max(self.MIN_DELAY_MS, int(deadline - now) + 1)
+        self.timer.start(delay)
+
+    def _fire(self):
+        self.on_deadline(self.current_time())
+        if self.playing and self.media_player is not None:
+            self.rearm()
+
+    def record_hit(self, target_time):
+        # Measured once libvlc reports the pause
+        self.pending_hit = target_time
+
+    def latency_stats(self):
+        # Boundary-hit latency in ms (positive means paused after the target)
+        values = sorted(self.hit_latencies)
+        if not values:
+            return {'count': 0}
+        return {
+            'count': len(values),
+            'mean_ms': sum(values) / len(values),
+            'p50_ms': percentile(values, 0.5),
+            'p95_ms': percentile(values, 0.95),
+            'max_ms': values[-1],
+        }
+
+
+class StandbyPlayer:
+    # Second libvlc player on the same instance, paused and muted at the
+    # most likely next jump target on a video surface of its own. Taking
+    # that jump swaps the players and the visible surface, so it costs no
+    # demux or decode seek; the other player then parks for the next jump.
+    def __init__(self, media_player, surface):
+        self.media_player = media_player
+        self.surface = surface
+        self.target = None  # Media time the player is parked at
+        self.started = False
+
+    def load(self, media):
+        self.media_player.set_media(media)
+        self.target = None
+        self.started = False
+
+    def park(self, target):
+        if target == self.target:
+            return
+        if not self.started:
+            # Same trick as the preload: play briefly to open the file
+            self.media_player.audio_set_mute(True)
+            self.media_player.play()
+            self.media_player.set_pause(1)
+            self.started = True
+        self.media_player.set_time(target)
+        self.target = target
+
+    def swap(self, media_player, surface):
+        # Hand over the parked player and take the active one in its place
+        parked = self.media_player, self.surface
+        self.media_player, self.surface = media_player, surface
+        self.target = None  # Left wherever playback stopped
+        self.started = True
+        return parked
+
+
+class RollingHistogram:
+    # Last samples of one measure (a latency in ms by default), bucketed
+    # when asked for
+    BUCKETS = (0, 0.1, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self, capacity=1000, unit='ms'):
+        self.samples = deque(maxlen=capacity)
+        self.unit = unit
+
+    def add(self, value):
+        self.samples.append(value)
+
+    def stats(self):
+        values = sorted(self.samples)
+        if not values:
+            return {'count': 0}
+        counts = [0] * (len(self.BUCKETS) + 1)
+        for value in values:
+            counts[bisect_left(self.BUCKETS, value)] += 1
+        labels = [f"<={bound}" for bound in self.BUCKETS] + [f">{self.BUCKETS[-1]}"]
+        unit = self.unit
+        return {
+            'count': len(values),
+            f'mean_{unit}': round(sum(values) / len(values), 3),
+            f'p50_{unit}': round(percentile(values, 0.5), 3),
+            f'p95_{unit}': round(percentile(values, 0.95), 3),
+            f'p99_{unit}': round(percentile(values, 0.99), 3),
+            f'max_{unit}': round(values[-1], 3),
+            'histogram': {label: count for label, count in zip(labels, counts) if count},
+        }
+
+
+class SeekMonitor:
+    # Per-file seek and pause timings from libvlc's own events. A seek is
+    # timed from the request to the first time event at the target
+    # (position reached) and to the first one past it while playing, the
+    # earliest sign that frames from the new spot are on screen. Pauses are
+    # timed to the Paused event; auto-pauses also record how far past the
+    # line's end libvlc reports having stopped once it is paused.
+    REACHED_TOLERANCE_MS = 250
+    METRICS = (
+        ('seek_reached', "seek -> position"),
+        ('seek_first_frame', "seek -> first frame"),
+        ('pause', "pause -> paused"),
+        ('pause_overshoot', "auto-pause overshoot"),
+    )
+
+    def __init__(self, get_time):
+        self.get_time = get_time  # callable -> libvlc's media time
+        self.files = {}  # video path -> {metric: RollingHistogram}
+        self.histograms = None
+        self.pending_seek = None  # [target, requested at, reached at or None]
+        self.pause_requested_at = None
+        self.pause_target = None  # Line end of a pending auto-pause
+        self.playing = False
+
+    def set_file(self, video_path):
+        self.histograms = self.files.setdefault(
+            video_path, {name: RollingHistogram() for name, _ in self.METRICS})
+        self.pending_seek = None
+        self.pause_requested_at = None
+        self.pause_target = None
+
+    def seek_requested(self, target):
+        if self.histograms is not None:
+            self.pending_seek = [target, time.monotonic(), None]
+            self.pause_target = None
+
+    def pause_requested(self, target=None):
+        if self.histograms is None:
+            return
+        self.pause_requested_at = time.monotonic()
+        self.pause_target = target
+
+    def on_player_event(self, kind, new_time, stamp):
+        if self.histograms is None:
+            return
+        if kind != 'time':
+            self.playing = kind == 'playing'
+            if kind == 'paused' and self.pause_requested_at is not None:
+                self.histograms['pause'].add((stamp - self.pause_requested_at) * 1000)
+                self.pause_requested_at = None
+                if self.pause_target is not None:
+                    self.histograms['pause_overshoot'].add(self.get_time() - self.pause_target)
+                    self.pause_target = None
+            return
+
+        pending = self.pending_seek
+        if pending is None:
+            return
+        target, requested_at, reached = pending
+        if reached is None:
+            if abs(new_time - target) <= self.REACHED_TOLERANCE_MS:
+                pending[2] = new_time
+                self.histograms['seek_reached'].add((stamp - requested_at) * 1000)
+        elif self.playing and new_time > reached:
+            self.histograms['seek_first_frame'].add((stamp - requested_at) * 1000)
+            self.pending_seek = None
+
+    def summary_lines(self):
+        if self.histograms is None:
+            return ["No video loaded"]
+        lines = []
+        for name, title in self.METRICS:
+            stats = self.histograms[name].stats()
+            if stats['count']:
+                lines.append(f"{title:<21} n={stats['count']:<4} p50 {stats['p50_ms']:>6.0f}  "
+                             f"p95 {stats['p95_ms']:>6.0f}  max {stats['max_ms']:>6.0f} ms")
+            else:
+                lines.append(f"{title:<21} n=0")
+        return lines
+
+    def dump(self, path):
+        # Merge into the existing report so files from earlier sessions stay
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            report = {}
+        for video_path, histograms in self.files.items():
+            stats = {name: histogram.stats() for name, histogram in histograms.items()}
+            if any(entry['count'] for entry in stats.values()):
+                report[video_path] = stats
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+
+class HotPathProfiler:
+    # Opt-in timing of the hot entry points, for slowdowns reported from the
+    # field. install() wraps the handlers at class level, so nothing is paid
+    # while profiling is off. Every FLUSH_INTERVAL_MS one JSON line goes to a
+    # rotating log: wall time per handler and the subtitle labels' setText
+    # and setVisible calls per tick. Calls slower than SLOW_CALL_MS are
+    # logged on their own, and capture() adds a cProfile snapshot.
+    HANDLERS = ('update_subtitle', 'keyPressEvent', 'load_subtitle', 'on_subtitle_finished')
+    FLUSH_INTERVAL_MS = 30 * 1000
+    SLOW_CALL_MS = 50
+    CAPTURE_SECONDS = 10
+
+    def __init__(self, log_path):
+        # Imported here to keep them out of start-up when profiling is off
+        import logging.handlers
+        self.logger = logging.getLogger('video_player.profile')
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        handler = logging.handlers.RotatingFileHandler(
+            log_path, maxBytes=1 << 20, backupCount=3, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        self.logger.addHandler(handler)
+        self.log_path = log_path
+        self.timings = {name: RollingHistogram() for name in self.HANDLERS}
+        self.set_text_per_tick = RollingHistogram(unit='calls')
+        self.set_visible_per_tick = RollingHistogram(unit='calls')
+        self.set_text_calls = 0
+        self.set_visible_calls = 0
+        self.profile = None  # cProfile.Profile while capturing
+        self.flush_timer = None
+
+    def install(self):
+        for name in self.HANDLERS:
+            setattr(VideoPlayer, name, self.timed(name, getattr(VideoPlayer, name)))
+
+        set_text, set_visible = SubtitleLabel.setText, SubtitleLabel.setVisible
+
+        def counted_set_text(label, text):
+            self.set_text_calls += 1
+            set_text(label, text)
+
+        def counted_set_visible(label, visible):
+            self.set_visible_calls += 1
+            set_visible(label, visible)
+
+        SubtitleLabel.setText = counted_set_text
+        SubtitleLabel.setVisible = counted_set_visible
+
+        self.flush_timer = QTimer()
+        self.flush_timer.setInterval(self.FLUSH_INTERVAL_MS)
+        self.flush_timer.timeout.connect(self.flush)
+        self.flush_timer.start()
+        self.logger.info("profiling started, pid %d", os.getpid())
+
+    def timed(self, name, method):
+        histogram = self.timings[name]
+        is_tick = name == 'update_subtitle'
+
+        def wrapper(player, *args):
+            if is_tick:
+                self.set_text_calls = self.set_visible_calls = 0
+            started = time.perf_counter()
+            try:
+                return method(player, *args)
+            finally:
+                elapsed = (time.perf_counter() - started) * 1000
+                histogram.add(elapsed)
+                if is_tick:
+                    self.set_text_per_tick.add(self.set_text_calls)
+                    self.set_visible_per_tick.add(self.set_visible_calls)
+                if elapsed >= self.SLOW_CALL_MS:
+                    self.logger.info("slow %s: %.1f ms", name, elapsed)
+
+        wrapper.__name__ = method.__name__
+        wrapper.__doc__ = method.__doc__
+        return wrapper
+
+    def flush(self):
+        # One line per interval; the histograms start over after each line
+        handlers = {name: histogram.stats() for name, histogram in self.timings.items()
+                    if histogram.samples}
+        if not handlers:
+            return
+        report = {
+            'handlers_ms': handlers,
+            'set_text_per_tick': self.set_text_per_tick.stats(),
+            'set_visible_per_tick': self.set_visible_per_tick.stats(),
+        }
+        self.logger.info("summary %s", json.dumps(report))
+        for histogram in (*self.timings.values(), self.set_text_per_tick,
+                          self.set_visible_per_tick):
+            histogram.samples.clear()
+
+    def capture(self):
+        # cProfile the GUI thread for CAPTURE_SECONDS, then log the top calls
+        if self.profile is not None:
+            return
+        import cProfile
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+        QTimer.singleShot(self.CAPTURE_SECONDS * 1000, self.finish_capture)
+        self.logger.info("cProfile capture started for %d s", self.CAPTURE_SECONDS)
+
+    def finish_capture(self):
+        import pstats
+        self.profile.disable()
+        stream = io.StringIO()
+        pstats.Stats(self.profile, stream=stream).sort_stats('cumulative').print_stats(40)
+        self.profile = None
+        self.logger.info("cProfile snapshot\n%s", stream.getvalue())
+
+
+def subtitle_markup(text):
+    # QStaticText ignores newlines in plain text, so always hand it rich text
+    if not Qt.mightBeRichText(text):
+        text = html.escape(text)
+    return text.replace('\n', '<br>')
+
+
+class SubtitleLayoutCache:
+    # LRU of shaped QStaticText layouts keyed by text, font, width and alignment
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.layouts = OrderedDict()
+
+    def get(self, text, font, width, alignment):
+        key = (text, font.key(), width, alignment.value)
+        layout = self.layouts.get(key)
+        if layout is not None:
+            self.layouts.move_to_end(key)
+            return layout
+
+        layout = QStaticText(subtitle_markup(text))
+        layout.setTextFormat(Qt.TextFormat.RichText)
+        option = QTextOption(alignment)
+        option.setWrapMode(QTextOption.WrapMode.WordWrap)
+        layout.setTextOption(option)
+        layout.setTextWidth(width)
+        layout.setPerformanceHint(QStaticText.PerformanceHint.AggressiveCaching)
+        layout.prepare(QTransform(), font)
+
+        self.layouts[key] = layout
+        if len(self.layouts) > self.capacity:
+            self.layouts.popitem(last=False)
+        return layout
+
+
+class SubtitleLabel(QLabel):
+    # QLabel look-alike that repaints only when its text really changes and
+    # draws from cached layouts instead of re-running word wrap and shaping.
+    # The stylesheet box is still painted by QLabel, whose own text stays empty.
+    # Texts found in highlights are drawn from their marked-up version.
+    def __init__(self, layout_cache, parent=None):
+        super().__init__(parent)
+        self.layout_cache = layout_cache
+        self.subtitle_text = ""
+        self.highlights = {}
+
+    def set_highlights(self, highlights):
+        self.highlights = highlights
+        self.update()
+
+    def setText(self, text):
+        if text == self.subtitle_text:
+            return
+        old_height = self.heightForWidth(self.width())
+        self.subtitle_text = text
+        # Only ask the layout to move things when the line count changed
+        if self.heightForWidth(self.width()) != old_height:
+            self.updateGeometry()
+        self.update()
+
+    def text(self):
+        return self.subtitle_text
+
+    def margins_size(self):
+        contents = self.contentsRect()
+        return (self.width() - contents.width(), self.height() - contents.height())
+
+    def layout_for(self, text, text_width):
+        horizontal = self.alignment() & Qt.AlignmentFlag.AlignHorizontal_Mask
+        return self.layout_cache.get(self.highlights.get(text, text), self.font(),
+                                     max(1, text_width), horizontal)
+
+    def prepare(self, text):
+        # Shape a line ahead of time so showing it later is just a blit
+        if text:
+            self.layout_for(text, self.contentsRect().width())
+
+    def hasHeightForWidth(self):
+        return True
+
+    def heightForWidth(self, width):
+        horizontal, vertical = self.margins_size()
+        line_height = self.fontMetrics().height()
+        if not self.subtitle_text:
+            return vertical + line_height
+        layout = self.layout_for(self.subtitle_text, width - horizontal)
+        return vertical + max(line_height, int(layout.size().height() + 0.5))
+
+    def sizeHint(self):
+        return QSize(super().sizeHint().width(), self.heightForWidth(self.width()))
+
+    def minimumSizeHint(self):
+        _, vertical = self.margins_size()
+        return QSize(0, vertical + self.fontMetrics().height())
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.subtitle_text:
+            return
+
+        rect = self.contentsRect()
+        layout = self.layout_for(self.subtitle_text, rect.width())
+        top = rect.top() + (rect.height() - layout.size().height()) / 2
+        painter = QPainter(self)
+        painter.setFont(self.font())
+        painter.setPen(self.palette().color(self.foregroundRole()))
+        painter.drawStaticText(QPointF(rect.left(), top), layout)
+        painter.end()
+
+
+def format_media_time(ms):
+    seconds = max(0, ms) // 1000
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+LIST_DIALOG_STYLE = """
+    QDialog, QLabel, QCheckBox {
+        background-color: #1A1A1A;
+        color: white;
+    }
+    QLineEdit, QListView, QSpinBox, QComboBox {
+        background-color: #2A2A2A;
+        color: white;
+        border: 1px solid #404040;
+        padding: 4px;
+        font-size: 14px;
+    }
+    QListView::item:selected {
+        background-color: #505050;
+    }
+    QPushButton {
+        background-color: #2A2A2A;
+        color: white;
+        border: none;
+        padding: 5px 15px;
+        border-radius: 3px;
+    }
+    QPushButton:hover {
+        background-color: #404040;
+    }
+"""
+
+
+class SubtitleSearchDialog(QDialog):
+    # Search-as-you-type over the subtitle index, lines of the open files
+    # first. Activating a hit emits hit_activated and the player takes it
+    # from there. Indexed folders are rescanned in the background on open.
+    hit_activated = pyqtSignal(object)
+    folder_progress = pyqtSignal(int, int)  # files done, total
+    folder_finished = pyqtSignal(int)  # files (re)indexed
+    SEARCH_DELAY_MS = 150
+
+    def __init__(self, index, open_files, index_pool, parent=None, thumbnail_for=None):
+        super().__init__(parent)
+        self.index = index
+        self.open_files = open_files  # callable -> [(path, embedded_track)]
+        self.thumbnail_for = thumbnail_for  # callable(hit) -> QImage or None
+        self.index_pool = index_pool  # Kept apart from the subtitle loads
+        self.indexing = False
+        self.setWindowTitle("Search Subtitles")
+        self.resize(700, 500)
+
+        layout = QVBoxLayout(self)
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Type words to find in your subtitles...")
+        self.results = QListWidget()
+        self.results.setIconSize(QSize(96, 54))
+        self.status_label = QLabel()
+        folder_button = QPushButton("Index Folder...")
+        folder_button.clicked.connect(self.choose_folder)
+        self.folder_button = folder_button
+
+        footer = QHBoxLayout()
+        footer.addWidget(self.status_label, 1)
+        footer.addWidget(folder_button)
+        layout.addWidget(self.query_edit)
+        layout.addWidget(self.results)
+        layout.addLayout(footer)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.run_search)
+        self.query_edit.textChanged.connect(self.search_timer.start)
+        self.query_edit.returnPressed.connect(self.activate_current)
+        self.results.itemActivated.connect(self.activate_item)
+        self.folder_progress.connect(self.on_folder_progress)
+        self.folder_finished.connect(self.on_folder_finished)
+        self.setStyleSheet(LIST_DIALOG_STYLE)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.query_edit.setFocus()
+        self.query_edit.selectAll()
+        folders = self.index.folders()
+        if folders and not self.indexing:
+            self.start_indexing(folders)
+
+    def run_search(self):
+        started = time.perf_counter()
+        try:
+            hits = self.index.search(self.query_edit.text(), prefer=self.open_files())
+        except sqlite3.Error as e:
+            self.status_label.setText(f"Search failed: {e}")
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+
+        self.results.clear()
+        for hit in hits:
+            text = ' '.join(hit.text.split())
+            item = QListWidgetItem(f"{format_media_time(hit.start)}  {text}    "
+                                   f"({os.path.basename(hit.path)})")
+            item.setData(Qt.ItemDataRole.UserRole, hit)
+            image = self.thumbnail_for(hit) if self.thumbnail_for else None
+            if image is not None:
+                item.setIcon(QIcon(QPixmap.fromImage(image)))
+            self.results.addItem(item)
+        if hits:
+            self.results.setCurrentRow(0)
+        if self.query_edit.text().strip():
+            self.status_label.setText(f"{len(hits)} lines found in {elapsed:.1f} ms")
+
+    def activate_current(self):
+        item = self.results.currentItem()
+        if item is not None:
+            self.activate_item(item)
+
+    def activate_item(self, item):
+        self.hit_activated.emit(item.data(Qt.ItemDataRole.UserRole))
+
+    def choose_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Index a Folder of Subtitles")
+        if folder:
+            self.start_indexing([folder])
+
+    def start_indexing(self, folders):
+        if self.indexing:
+            return
+        self.indexing = True
+        self.folder_button.setEnabled(False)
+        self.status_label.setText("Indexing...")
+        self.index_pool.start(lambda: self.run_indexing(folders))
+
+    def run_indexing(self, folders):
+        # Runs on the index pool
+        indexed = 0
+        try:
+            for folder in folders:
+                indexed += self.index.index_folder(folder, self.folder_progress.emit)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Error indexing subtitles: {e}")
+        self.folder_finished.emit(indexed)
+
+    def on_folder_progress(self, done, total):
+        self.status_label.setText(f"Indexing... {done}/{total} files")
+
+    def on_folder_finished(self, indexed):
+        self.indexing = False
+        self.folder_button.setEnabled(True)
+        self.status_label.setText(f"Index up to date ({indexed} files updated)")
+        if indexed and self.query_edit.text().strip():
+            self.run_search()
+
+
+class TranscriptModel(QAbstractListModel):
+    # The primary track's cues as rows, each followed by the lines the other
+    # tracks pair with it. A row's text is only built when the view paints
+    # it, so the model keeps nothing per cue. Rows never report changes:
+    # dataChanged makes QListView lay out every row again, so the dock
+    # repaints the rows it changed instead.
+    THUMBNAIL_CAPACITY = 256
+
+    def __init__(self, player, parent=None):
+        super().__init__(parent)
+        self.player = player
+        self.row_count = 0
+        self.row_size = QSize()
+        self.current = -1
+        self.highlight = QBrush(QColor('#505050'))
+        self.thumbnails = OrderedDict()  # cue index -> QIcon, LRU
+        self.blank = None  # Stands in for missing frames so the text lines up
+
+    def reset(self, row_height, icon_size=None):
+        self.beginResetModel()
+        timeline = self.player.primary_track.timeline
+        self.row_count = len(timeline) if timeline else 0
+        self.row_size = QSize(0, row_height)
+        self.thumbnails.clear()
+        if icon_size is None:
+            self.blank = None
+        else:
+            blank = QPixmap(icon_size)
+            blank.fill(Qt.GlobalColor.transparent)
+            self.blank = QIcon(blank)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.row_count
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        row = index.row()
+        if role == Qt.ItemDataRole.DisplayRole:
+            player = self.player
+            primary = player.primary_track
+            lines = [f"{format_media_time(primary.timeline.starts[row])}  "
+                     f"{primary.store.texts[row]}"]
+            for track in player.secondary_tracks:
+                if track.store:
+                    lines.append(player.track_text_for_index(track, row) or "")
+            return '\n'.join(' '.join(line.split()) for line in lines)
+        if role == Qt.ItemDataRole.BackgroundRole:
+            return self.highlight if row == self.current else None
+        if role == Qt.ItemDataRole.SizeHintRole:
+            return self.row_size
+        if role == Qt.ItemDataRole.DecorationRole and self.blank is not None:
+            return self.thumbnail(row)
+        return None
+
+    def thumbnail(self, row):
+        icon = self.thumbnails.get(row)
+        if icon is not None:
+            self.thumbnails.move_to_end(row)
+            return icon
+        image = self.player.cue_thumbnail(row)
+        icon = self.blank if image is None else QIcon(QPixmap.fromImage(image))
+        self.thumbnails[row] = icon
+        if len(self.thumbnails) > self.THUMBNAIL_CAPACITY:
+            self.thumbnails.popitem(last=False)
+        return icon
+
+
+class TranscriptDock(QDockWidget):
+    # Dockable list of every line of the video. The view draws the rows
+    # itself from TranscriptModel, no widget per row, with one row height
+    # for all so scrolling and finding a row take constant time. Moving the
+    # highlight repaints the two rows involved and keeps the new one in
+    # sight. Clicking a line emits cue_activated.
+    cue_activated = pyqtSignal(int)  # primary cue index
+    ICON_SIZE = QSize(96, 54)
+    MIN_WIDTH = 320
+    LAYOUT_BATCH = 20000  # Rows laid out per event loop pass after a reset
+
+    def __init__(self, player, parent=None):
+        super().__init__("Transcript", parent)
+        self.player = player
+        self.model = TranscriptModel(player, self)
+        self.view = QListView()
+        self.view.setModel(self.model)
+        self.view.setUniformItemSizes(True)
+        self.view.setLayoutMode(QListView.LayoutMode.Batched)
+        self.view.setBatchSize(self.LAYOUT_BATCH)
+        self.view.setIconSize(self.ICON_SIZE)
+        self.view.setFocusPolicy(Qt.FocusPolicy.NoFocus)  # Keys stay with the player
+        self.view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.view.setMinimumWidth(self.MIN_WIDTH)
+        self.view.clicked.connect(self.on_clicked)
+        self.setWidget(self.view)
+        self.setStyleSheet(LIST_DIALOG_STYLE)
+        self.refresh()
+
+    def refresh(self):
+        # After the tracks change. Rows hold the primary line plus one per
+        # loaded secondary track, beside room for the cue's frame.
+        self.view.ensurePolished()
+        lines = 1 + sum(1 for track in self.player.secondary_tracks if track.store)
+        row_height = lines * self.view.fontMetrics().lineSpacing() + 8
+        icon_size = None
+        if self.player.thumbnail_cache is not None:
+            icon_size = self.ICON_SIZE
+            row_height = max(row_height, icon_size.height() + 8)
+        self.model.reset(row_height, icon_size)
+        self.set_current(self.player.current_subtitle_index)
+
+    def on_clicked(self, index):
+        # Shift and Ctrl clicks only select lines, e.g. to export them
+        if QApplication.keyboardModifiers() == Qt.KeyboardModifier.NoModifier:
+            self.cue_activated.emit(index.row())
+
+    def selected_cues(self):
+        return sorted(index.row() for index in self.view.selectionModel().selectedIndexes())
+
+    def update_row(self, row):
+        if 0 <= row < self.model.row_count:
+            self.view.update(self.model.index(row))
+
+    def set_current(self, row):
+        previous, self.model.current = self.model.current, row
+        self.update_row(previous)
+        self.update_row(row)
+        if 0 <= row < self.model.row_count:
+            self.view.scrollTo(self.model.index(row),
+                               QAbstractItemView.ScrollHint.EnsureVisible)
+
+    def thumbnails_changed(self, row=None):
+        # A frame was saved for row, or for any row when None
+        if row is None:
+            self.model.thumbnails.clear()
+            self.view.viewport().update()
+        else:
+            self.model.thumbnails.pop(row, None)
+            self.update_row(row)
+
+
+class ClipExportDialog(QDialog):
+    # Exports a range of lines of the open video, or the lines selected in
+    # the transcript, as clips with a manifest. ClipExporter runs on the
+    # thread pool and cuts the clips in worker processes; running the same
+    # export again fills in whatever is missing.
+    export_progress = pyqtSignal(int, int)  # clips done, total
+    export_finished = pyqtSignal(int, int, object, str)  # made, already there, failures, error
+    FORMATS = (('audio', "Audio clips (.m4a)"), ('video', "Video clips (.mp4)"))
+
+    def __init__(self, video_path, cue_count, selected_cues, make_jobs, export_pool, parent=None):
+        super().__init__(parent)
+        self.video_path = video_path
+        self.selected_cues = selected_cues
+        self.make_jobs = make_jobs  # callable(cue indexes, padding ms) -> [ClipJob]
+        self.export_pool = export_pool  # Kept apart from the subtitle loads
+        self.cancel_event = None  # Set to stop the running export
+        stem = os.path.splitext(os.path.basename(video_path))[0]
+        self.folder = os.path.join(os.path.dirname(video_path), f"{stem} clips")
+        self.setWindowTitle("Export Clips")
+        self.resize(560, 220)
+
+        layout = QVBoxLayout(self)
+        self.first_spin = QSpinBox()
+        self.last_spin = QSpinBox()
+        for spin in (self.first_spin, self.last_spin):
+            spin.setRange(1, max(1, cue_count))
+        self.last_spin.setValue(cue_count)
+        range_row = QHBoxLayout()
+        range_row.addWidget(QLabel("Lines"))
+        range_row.addWidget(self.first_spin)
+        range_row.addWidget(QLabel("to"))
+        range_row.addWidget(self.last_spin)
+        range_row.addStretch(1)
+
+        self.selected_check = QCheckBox(
+            f"Only the {len(selected_cues)} lines selected in the transcript")
+        self.selected_check.setEnabled(bool(selected_cues))
+        self.selected_check.setChecked(len(selected_cues) > 1)
+
+        self.format_combo = QComboBox()
+        for key, title in self.FORMATS:
+            self.format_combo.addItem(title, key)
+        self.padding_spin = QSpinBox()
+        self.padding_spin.setRange(0, 5000)
+        self.padding_spin.setSingleStep(100)
+        self.padding_spin.setValue(250)
+        self.padding_spin.setSuffix(" ms")
+        format_row = QHBoxLayout()
+        format_row.addWidget(self.format_combo)
+        format_row.addWidget(QLabel("Padding"))
+        format_row.addWidget(self.padding_spin)
+        format_row.addStretch(1)
+
+        self.folder_label = QLabel(self.folder)
+        folder_button = QPushButton("Choose Folder...")
+        folder_button.clicked.connect(self.choose_folder)
+        self.folder_button = folder_button
+        folder_row = QHBoxLayout()
+        folder_row.addWidget(self.folder_label, 1)
+        folder_row.addWidget(folder_button)
+
+        self.status_label = QLabel()
+        self.export_button = QPushButton("Export")
+        self.export_button.clicked.connect(self.start_export)
+        footer = QHBoxLayout()
+        footer.addWidget(self.status_label, 1)
+        footer.addWidget(self.export_button)
+
+        layout.addLayout(range_row)
+        layout.addWidget(self.selected_check)
+        layout.addLayout(format_row)
+        layout.addLayout(folder_row)
+        layout.addStretch(1)
+        layout.addLayout(footer)
+
+        self.export_progress.connect(self.on_export_progress)
+        self.export_finished.connect(self.on_export_finished)
+        self.setStyleSheet(LIST_DIALOG_STYLE)
+
+    @property
+    def exporting(self):
+        return self.cancel_event is not None
+
+    def choose_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Export Clips To", self.folder)
+        if folder:
+            self.folder = folder
+            self.folder_label.setText(folder)
+
+    def start_export(self):
+        if self.exporting:
+            self.cancel_event.set()
+            self.export_button.setEnabled(False)
+            self.status_label.setText("Cancelling after the clips being cut...")
+            return
+        if self.selected_check.isChecked():
+            cues = self.selected_cues
+        else:
+            first, last = self.first_spin.value(), self.last_spin.value()
+            cues = range(min(first, last) - 1, max(first, last))
+        jobs = self.make_jobs(cues, self.padding_spin.value())
+        exporter = ClipExporter(self.video_path, self.folder, self.format_combo.currentData())
+        cancel_event = threading.Event()
+        self.cancel_event = cancel_event
+        self.export_button.setText("Cancel")
+        self.folder_button.setEnabled(False)
+        self.status_label.setText("Starting...")
+        self.export_pool.start(lambda: self.run_export(exporter, jobs, cancel_event))
+
+    def run_export(self, exporter, jobs, cancel_event):
+        # Runs on the export pool, the clips are cut in worker processes
+        made, existing, failed = 0, 0, []
+        error = ""
+        try:
+            made, existing, failed = exporter.run(jobs, self.export_progress.emit, cancel_event)
+        except (OSError, RuntimeError) as e:
+            error = str(e)
+        self.export_finished.emit(made, existing, failed, error)
+
+    def on_export_progress(self, done, total):
+        self.status_label.setText(f"Exporting... {done}/{total} clips")
+
+    def on_export_finished(self, made, existing, failed, error):
+        cancelled = self.cancel_event.is_set()
+        self.cancel_event = None
+        self.export_button.setText("Export")
+        self.export_button.setEnabled(True)
+        self.folder_button.setEnabled(True)
+        if error:
+            self.status_label.setText(f"Export failed: {error}")
+            return
+        status = f"{made} clips made, {existing} already there"
+        if failed:
+            status += f", {len(failed)} failed (e.g. line {failed[0][0] + 1}: {failed[0][1]})"
+        self.status_label.setText(("Cancelled: " if cancelled else "") + status)
+
+    def reject(self):
+        if self.exporting:
+            self.cancel_event.set()
+        super().reject()
+
+
+class LibraryDialog(QDialog):
+    # The videos of the library folders with the subtitles paired to them.
+    # The stored catalog shows at once; folders are rescanned in the
+    # background on open and the list refreshes if anything changed.
+    # Activating an entry emits entry_activated with the LibraryEntry.
+    # Analyze Words counts the words of the library's English subtitles
+    # into the vocabulary corpus and lists each video's coverage.
+    entry_activated = pyqtSignal(object)
+    scan_progress = pyqtSignal(int)  # folders visited
+    scan_finished = pyqtSignal(int, str)  # folders re-read, error
+    analysis_progress = pyqtSignal(int, int)  # files done, total
+    analysis_finished = pyqtSignal(int, str)  # files counted, error
+
+    def __init__(self, library, corpus, track_titles, scan_pool, word_pool, parent=None):
+        super().__init__(parent)
+        self.library = library
+        self.corpus = corpus  # VocabularyCorpus, or None without word stats
+        self.track_titles = track_titles  # callable -> {track key: title}
+        self.scan_pool = scan_pool  # Kept apart from the subtitle loads
+        self.word_pool = word_pool  # Likewise for the corpus analysis
+        self.scanning = False
+        self.analyzing = False
+        self.setWindowTitle("Library")
+        self.resize(700, 500)
+
+        layout = QVBoxLayout(self)
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Filter videos by name...")
+        self.entries_list = QListWidget()
+        self.status_label = QLabel()
+        folder_button = QPushButton("Add Folder...")
+        folder_button.clicked.connect(self.choose_folder)
+        self.folder_button = folder_button
+        analyze_button = QPushButton("Analyze Words")
+        analyze_button.clicked.connect(self.start_analysis)
+        analyze_button.setEnabled(corpus is not None)
+        self.analyze_button = analyze_button
+
+        footer = QHBoxLayout()
+        footer.addWidget(self.status_label, 1)
+        footer.addWidget(analyze_button)
+        footer.addWidget(folder_button)
+        layout.addWidget(self.filter_edit)
+        layout.addWidget(self.entries_list)
+        layout.addLayout(footer)
+
+        self.filter_edit.textChanged.connect(self.apply_filter)
+        self.filter_edit.returnPressed.connect(self.activate_current)
+        self.entries_list.itemActivated.connect(self.activate_item)
+        self.scan_progress.connect(self.on_scan_progress)
+        self.scan_finished.connect(self.on_scan_finished)
+        self.analysis_progress.connect(self.on_analysis_progress)
+        self.analysis_finished.connect(self.on_analysis_finished)
+        self.setStyleSheet(LIST_DIALOG_STYLE)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.filter_edit.setFocus()
+        self.refresh()
+        if not self.scanning:
+            self.start_scan(self.library.roots())
+
+    def refresh(self):
+        titles = self.track_titles()
+        first_key = next(iter(titles))
+        roots = self.library.roots()
+        coverage = self.corpus.coverage() if self.corpus is not None else {}
+        self.entries_list.clear()
+        for entry in self.library.entries():
+            root = next((root for root in roots
+                         if entry.video.startswith(os.path.join(root, ''))), None)
+            name = os.path.relpath(entry.video, root) if root else entry.video
+            tracks = ', '.join(titles.get(key, key) for key in titles if key in entry.subtitles)
+            words = coverage.get(entry.subtitles.get(first_key))
+            stats = f"    {words[0]:.0%} common words, {words[1]} rare" if words else ""
+            item = QListWidgetItem(f"{name}    ({tracks or 'no subtitles'}){stats}")
+            item.setData(Qt.ItemDataRole.UserRole, entry)
+            self.entries_list.addItem(item)
+        self.apply_filter()
+        if not self.scanning and not self.analyzing:
+            self.status_label.setText(f"{self.entries_list.count()} videos")
+
+    def apply_filter(self):
+        words = self.filter_edit.text().lower().split()
+        first = None
+        for row in range(self.entries_list.count()):
+            item = self.entries_list.item(row)
+            hidden = not all(word in item.text().lower() for word in words)
+            item.setHidden(hidden)
+            if first is None and not hidden:
+                first = row
+        if first is not None:
+            self.entries_list.setCurrentRow(first)
+
+    def activate_current(self):
+        item = self.entries_list.currentItem()
+        if item is not None and not item.isHidden():
+            self.activate_item(item)
+
+    def activate_item(self, item):
+        self.entry_activated.emit(item.data(Qt.ItemDataRole.UserRole))
+
+    def choose_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Add a Folder of Videos")
+        if folder:
+            self.start_scan([self.library.add_root(folder)])
+
+    def start_scan(self, roots):
+        if self.scanning or not roots:
+            return
+        self.scanning = True
+        self.folder_button.setEnabled(False)
+        self.status_label.setText("Scanning...")
+        self.scan_pool.start(lambda: self.run_scan(roots))
+
+    def run_scan(self, roots):
+        # Runs on the scan pool
+        changed = 0
+        error = ""
+        try:
+            for root in roots:
+                changed += self.library.scan(root, self.scan_progress.emit)
+        except (OSError, sqlite3.Error) as e:
+            error = str(e)
+        self.scan_finished.emit(changed, error)
+
+    def on_scan_progress(self, folders):
+        self.status_label.setText(f"Scanning... {folders} folders")
+
+    def on_scan_finished(self, changed, error):
+        self.scanning = False
+        self.folder_button.setEnabled(True)
+        if changed:
+            self.refresh()
+        if error:
+            self.status_label.setText(f"Scan failed: {error}")
+        else:
+            self.status_label.setText(f"{self.entries_list.count()} videos, "
+                                      f"{changed} folders updated")
+
+    def start_analysis(self):
+        roots = self.library.roots()
+        if self.analyzing or not roots:
+            return
+        self.analyzing = True
+        self.analyze_button.setEnabled(False)
+        self.status_label.setText("Counting words...")
+        self.word_pool.start(lambda: self.run_analysis(roots))
+
+    def run_analysis(self, roots):
+        # Runs on the word pool, the counting itself in worker processes
+        counted = 0
+        error = ""
+        try:
+            counted = self.corpus.analyze(roots, self.analysis_progress.emit)
+        except (OSError, sqlite3.Error, RuntimeError) as e:
+            error = str(e)
+        self.analysis_finished.emit(counted, error)
+
+    def on_analysis_progress(self, done, total):
+        self.status_label.setText(f"Counting words... {done}/{total} subtitles")
+
+    def on_analysis_finished(self, counted, error):
+        self.analyzing = False
+        self.analyze_button.setEnabled(True)
+        self.refresh()
+        if error:
+            self.status_label.setText(f"Word count failed: {error}")
+        else:
+            self.status_label.setText(f"Word stats up to date ({counted} subtitles counted)")
 
 
 class VideoPlayer(QMainWindow):
+    PREPARE_AHEAD = 4  # Upcoming cues to pre-shape after each cue change
+    # (key, title, practice visibility state it appears at). Navigation and
+    # auto-pause follow the first track; more can be added at run time.
+    SUBTITLE_TRACKS = (('english', 'English', 1), ('persian', 'Persian', 2))
+    MAX_SUBTITLE_TRACKS = 9  # Ctrl+1..9 toggles them
+    # Language codes of embedded Matroska tracks picked up for each track,
+    # and the names that mark a subtitle file as that track's
+    TRACK_LANGUAGES = {'english': ('en', 'eng', 'english'),
+                       'persian': ('fa', 'fas', 'per', 'persian', 'farsi')}
+    MEDIA_PARSE_TIMEOUT_MS = 10000
+    KEYFRAME_LEAD_MS = 500  # Most a cue may start after the keyframe it is played from
+    THUMBNAIL_IDLE_MS = 2000  # Frames are only made after this long paused
+    REVIEW_FLUSH_MS = 2000  # Review outcomes are written at most this long after
+    REVIEW_BATCH = 500  # or as soon as this many are waiting
+
+    media_parsed = pyqtSignal(object)  # Emitted from libvlc's thread
+    embedded_subtitles_found = pyqtSignal(str, object)  # Video path, text tracks
+    subtitle_sync_finished = pyqtSignal(object, str)  # {key: SyncResult}, error
+    rare_words_found = pyqtSignal(object, object)  # CueStore, {cue text: markup}
+    keyframes_found = pyqtSignal(str, object)  # Video path, keyframe times or None
+    cue_seek_times_ready = pyqtSignal(object, object)  # Primary timeline, seek targets
+    vlc_initialized = pyqtSignal()  # Emitted from the start-up thread
+    review_loaded = pyqtSignal(object, str)  # ReviewCards, error
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Video Player for Language Learners V1.1.2")
         self.setGeometry(100, 100, 1280, 720)
 
-        # Create VLC instance with minimal options
-        vlc_args = ['--quiet']  # Removed potentially suspicious options
-        self.instance = vlc.Instance(' '.join(vlc_args))
-        self.media_player = self.instance.media_player_new()
+        # libvlc starts on a background thread after the first paint
+        self.instance = None
+        self.media_player = None
+        self.vlc_thread = None
+        self.vlc_error = None
+        self.vlc_ready = False
+        self.first_paint_done = False
+        self.vlc_initialized.connect(self.on_vlc_initialized)
 
         # Create central widget and layout
         central_widget = QWidget()
@@ -87,9 +4307,10 @@ How to Use:
         3. Press Spacebar to start playing
 
 Note:
-        If your subtitles are not synchronized with the video, 
-        you can sync them using VLC, PotPlayer, or any other video player, 
-        then save the modified subtitle files to use in this application.
+        If your Persian subtitles are not synchronized with the English ones, 
+        click 'Sync Subtitles' to line them up automatically. 
+        If both are off from the video, 'Sync Subtitles' can also match 
+        the English ones to the speech in the video's audio.
                                          
 
 check for new releases at:
@@ -113,48 +4334,41 @@ https://github.com/rabiejavadian/video-player-for-language-learners/releases/lat
             Qt.WidgetAttribute.WA_OpaquePaintEvent)  # Prevent flickering
         self.splitter.addWidget(self.video_frame)
 
+        # Window libvlc draws into; with --preseek each player gets its own
+        # surface and jumps only switch which one is shown
+        self.video_surface = self.video_frame
+        self.video_surfaces = []
+        self.standby = None
+        if PRESEEK_REQUESTED:
+            video_layout.setContentsMargins(0, 0, 0, 0)
+            for _ in range(2):
+                surface = QWidget(self.video_frame)
+                surface.setAttribute(Qt.WidgetAttribute.WA_NativeWindow)
+                surface.setStyleSheet("background-color: black;")
+                surface.hide()
+                video_layout.addWidget(surface)
+                self.video_surfaces.append(surface)
+            self.video_surface = self.video_surfaces[0]
+
         # Create subtitle container with dark background
         subtitle_container = QWidget()
         subtitle_container.setStyleSheet("background-color: #2A2A2A;")
         subtitle_layout = QVBoxLayout(subtitle_container)
         subtitle_layout.setContentsMargins(10, 10, 10, 10)
-        # Space between English and Persian subtitles
+        # Space between subtitle tracks
         subtitle_layout.setSpacing(10)
         self.splitter.addWidget(subtitle_container)
 
-        # Create subtitle labels
-        self.english_subtitle_label = QLabel()
-        self.persian_subtitle_label = QLabel()
+        self.subtitle_layout = subtitle_layout
 
-        # Style subtitle labels with larger font and semi-transparent background
-        subtitle_style = """
-            QLabel {
-                color: white;
-                background-color: rgba(42, 42, 42, 180);
-                padding: 8px;
-                border-radius: 8px;
-            }
-        """
-        self.english_subtitle_label.setStyleSheet(subtitle_style)
-        self.persian_subtitle_label.setStyleSheet(subtitle_style)
-
-        # Set larger fonts for subtitles
-        english_font = QFont("Calibri", 22)  # Increased from 14 to 16
-        persian_font = QFont("Calibri", 22)  # Increased from 14 to 16
-        english_font.setBold(True)  # Make English subtitles bold
-        persian_font.setBold(True)
-        self.english_subtitle_label.setFont(english_font)
-        self.persian_subtitle_label.setFont(persian_font)
-
-        self.english_subtitle_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.persian_subtitle_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-
-        # Add word wrap to handle long subtitles
-        self.english_subtitle_label.setWordWrap(True)
-        self.persian_subtitle_label.setWordWrap(True)
-
-        subtitle_layout.addWidget(self.english_subtitle_label)
-        subtitle_layout.addWidget(self.persian_subtitle_label)
+        # Create subtitle tracks, their labels share one cache of shaped layouts
+        self.subtitle_layouts = SubtitleLayoutCache()
+        self.tracks = {}  # key -> SubtitleTrack, in display order
+        self.secondary_tracks = []  # Every track but the primary one
+        self.button_layout = None
+        for key, title, reveal_step in self.SUBTITLE_TRACKS:
+            self.add_subtitle_track(key, title, reveal_step)
+        self.primary_track = self.tracks[self.SUBTITLE_TRACKS[0][0]]
 
         # Set initial splitter sizes (90% video, 10% subtitles)
         self.splitter.setSizes(
@@ -165,73 +4379,491 @@ https://github.com/rabiejavadian/video-player-for-language-learners/releases/lat
         button_container.setStyleSheet("background-color: #2A2A2A;")
         button_layout = self.create_buttons()  # Use the create_buttons method
         button_container.setLayout(button_layout)
+        self.button_layout = button_layout
         layout.addWidget(button_container)
 
         # Initialize variables
         self.media = None
-        self.english_subtitles = None
-        self.persian_subtitles = None
+        self.merged_timeline = None  # One lookup over every loaded track
+        self.prepared_from_index = None  # Index the upcoming layouts were shaped from
+        self.subtitle_tasks = {}  # track key -> SubtitleLoadTask still running
+        self.thread_pool = QThreadPool.globalInstance()
+        self.video_preloaded = False
+        self.media_parsed.connect(self.on_media_parsed)
+        self.embedded_subtitles = []  # MatroskaTextTrack list of the current video
+        self.embedded_subtitles_found.connect(self.on_embedded_subtitles_found)
+        self.subtitle_sync_finished.connect(self.on_subtitle_sync_finished)
+        self.rare_words_found.connect(self.on_rare_words_found)
+        self.keyframes = None  # Keyframe times of the current video, if known
+        self.cue_seek_times = None  # Seek target of each primary cue, see cue_seek_times
+        self.keyframes_found.connect(self.on_keyframes_found)
+        self.cue_seek_times_ready.connect(self.on_cue_seek_times_ready)
+        try:
+            self.keyframe_cache = KeyframeIndexCache(app_cache_dir('keyframes'))
+        except OSError as e:
+            print(f"Keyframe cache disabled: {e}")
+            self.keyframe_cache = None
+        try:
+            self.subtitle_cache = SubtitleCache(app_cache_dir('subtitles'))
+        except OSError as e:
+            print(f"Subtitle cache disabled: {e}")
+            self.subtitle_cache = None
+        self.audio_sync_task = None  # AudioSpeechTask still running
+        self.sync_pool = QThreadPool(self)  # Audio decoding and sync matching
+        self.sync_pool.setMaxThreadCount(1)
+        # Cue frames are made one video at a time on a pool of their own,
+        # so a long run never holds up subtitle loading on the shared pool
+        try:
+            self.thumbnail_cache = ThumbnailCache(app_cache_dir('thumbnails'))
+        except OSError as e:
+            print(f"Cue thumbnails disabled: {e}")
+            self.thumbnail_cache = None
+        self.thumbnail_pool = QThreadPool(self)
+        self.thumbnail_pool.setMaxThreadCount(1)
+        self.thumbnail_task = None  # ThumbnailTask still running
+        self.thumbnails_complete = None  # Primary timeline whose frames are all cached
+        self.thumbnail_idle_timer = QTimer(self)
+        self.thumbnail_idle_timer.setSingleShot(True)
+        self.thumbnail_idle_timer.setInterval(self.THUMBNAIL_IDLE_MS)
+        self.thumbnail_idle_timer.timeout.connect(self.start_thumbnails)
+        self.thumbnail_fingerprint = None  # Cache key of the current video's frames
+        self.transcript = None  # TranscriptDock, made on first use
+        self.transcript_following = False  # Only kept up to date while shown
+        self.export_dialog = None
+        self.export_pool = QThreadPool(self)  # Only waits on the worker processes
+        self.export_pool.setMaxThreadCount(1)
+        self.search_index = None  # SubtitleSearchIndex, opened on first use
+        self.index_pool = QThreadPool(self)  # Never holds up a subtitle load
+        self.index_pool.setMaxThreadCount(1)
+        self.analysis_pool = QThreadPool(self)  # Keyframes, embedded tracks, rare words
+        self.analysis_pool.setMaxThreadCount(1)
+        self.deferred_jobs = []  # (pool, job) started once no subtitles are loading
+        self.search_dialog = None
+        self.library = None  # MediaLibrary, opened on first use
+        self.library_dialog = None
+        self.library_scan_pool = QThreadPool(self)
+        self.library_scan_pool.setMaxThreadCount(1)
+        self.word_count_pool = QThreadPool(self)
+        self.word_count_pool.setMaxThreadCount(1)
+        self.vocabulary = None  # VocabularyCorpus, opened once word stats exist
+        self.highlight_rare_words = True
+        self.pending_search_hit = None  # SearchHit to jump to once its file loads
+        self.review_store = None  # ReviewStore, opened on first use
+        self.review_scheduler = None  # ReviewScheduler once the cards are loaded
+        self.review_waiting = []  # Calls waiting for the cards to load
+        self.review_pool = QThreadPool(self)  # One thread keeps writes in order
+        self.review_pool.setMaxThreadCount(1)
+        self.review_rows = {}  # key -> ReviewCard.row() not written yet
+        self.review_outcomes = []  # Outcomes not written yet
+        self.review_flush_timer = QTimer(self)
+        self.review_flush_timer.setSingleShot(True)
+        self.review_flush_timer.setInterval(self.REVIEW_FLUSH_MS)
+        self.review_flush_timer.timeout.connect(self.flush_review_writes)
+        self.review_mode = False
+        self.review_left = 0  # Lines due when review mode started, less those passed
+        self.review_card = None  # ReviewCard being reviewed
+        self.review_hit = None  # SearchHit opening its files
+        self.review_loaded.connect(self.on_review_loaded)
+        try:
+            self.speech_cache = SpeechActivityCache(app_cache_dir('speech'))
+        except OSError as e:
+            print(f"Audio sync disabled: {e}")
+            self.speech_cache = None
         self.current_subtitle_index = 0
-        self.current_persian_index = 0
         self.is_playing = False
         self.is_fullscreen = False
         self.current_video_path = None
-        self.current_english_subtitle_path = None
-        self.current_persian_subtitle_path = None
         self.next_subtitle_end_time = None
-        # 0: all hidden, 1: English only, 2: both visible
+        # 0: all hidden, 1: primary track only, 2: all tracks visible
         self.subtitle_visibility_state = 0
         self.practice_step = 0  # 0: not in practice, 1-4: current step
         self.practice_times = None  # Store start and end times during practice
-
-        # Timer for updating subtitle display
-        self.timer = QTimer(self)
-        self.timer.setInterval(100)  # 100ms interval
-        self.timer.timeout.connect(self.update_subtitle)
+        self.jumping_ahead = False  # Last jump was Ctrl+Right, expect another
+
+        # Wake up only at cue boundaries and pause targets
+        self.cue_scheduler = CueScheduler(
+            self.next_cue_deadline, self.update_subtitle, self)
+
+        # Seek and pause timings per file, shown on the video with P
+        self.seek_monitor = SeekMonitor(lambda: self.media_player.get_time())
+        self.cue_scheduler.player_event.connect(self.seek_monitor.on_player_event)
+        self.cue_scheduler.playing_changed.connect(self.on_playing_changed)
+        self.performance_overlay = QLabel(self.video_frame)
+        self.performance_overlay.setAttribute(Qt.WidgetAttribute.WA_NativeWindow)  # Above VLC's window
+        self.performance_overlay.setStyleSheet("""
+            QLabel {
+                color: #80FF80;
+                background-color: #101010;
+                font-family: Consolas, monospace;
+                font-size: 12px;
+                padding: 6px;
+            }
+        """)
+        self.performance_overlay.hide()
+        self.overlay_timer = QTimer(self)
+        self.overlay_timer.setInterval(500)
+        self.overlay_timer.timeout.connect(self.update_performance_overlay)
+        self.review_overlay = QLabel(self.video_frame)
+        self.review_overlay.setAttribute(Qt.WidgetAttribute.WA_NativeWindow)
+        self.review_overlay.setStyleSheet("""
+            QLabel {
+                color: #FFD080;
+                background-color: #101010;
+                font-size: 14px;
+                padding: 6px;
+            }
+        """)
+        self.review_overlay.hide()
+        self.review_overlay_timer = QTimer(self)
+        self.review_overlay_timer.setSingleShot(True)
+        self.review_overlay_timer.setInterval(2500)
+        self.review_overlay_timer.timeout.connect(self.update_review_overlay)
 
         # Set up key event handling
         self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
 
         # Add subtitle visibility control
-        self.english_subtitle_label.setVisible(True)
-        self.persian_subtitle_label.setVisible(True)
+        for track in self.tracks.values():
+            track.label.setVisible(True)
+
+    def create_subtitle_label(self):
+        label = SubtitleLabel(self.subtitle_layouts)
+
+        # Style subtitle labels with larger font and semi-transparent background
+        label.setStyleSheet("""
+            QLabel {
+                color: white;
+                background-color: rgba(42, 42, 42, 180);
+                padding: 8px;
+                border-radius: 8px;
+            }
+        """)
+        font = QFont("Calibri", 22)
+        font.setBold(True)
+        label.setFont(font)
+        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+        # Add word wrap to handle long subtitles
+        label.setWordWrap(True)
+        return label
+
+    def add_subtitle_track(self, key, title, reveal_step):
+        track = SubtitleTrack(key, title, reveal_step, self.create_subtitle_label())
+        self.subtitle_layout.addWidget(track.label)
+        if self.tracks:
+            self.secondary_tracks.append(track)
+        self.tracks[key] = track
+        if self.button_layout is not None:
+            # Added at run time, its button goes after the other tracks'
+            track.button = self.create_track_button(track)
+            self.button_layout.insertWidget(
+                self.button_layout.indexOf(self.add_track_button), track.button)
+            track.label.show()
+        return track
+
+    def add_subtitle_track_from_file(self):
+        if not self.media:  # Same rule as the other subtitle buttons
+            return
+
+        title, ok = QInputDialog.getText(
+            self, "Add Subtitle Track", "Track name (e.g. Romanization, Notes):")
+        title = title.strip()
+        if not ok or not title:
+            return
+
+        key = title.lower()
+        if key not in self.tracks:
+            if len(self.tracks) >= self.MAX_SUBTITLE_TRACKS:
+                QMessageBox.warning(self, "Add Subtitle Track",
+                                    f"At most {self.MAX_SUBTITLE_TRACKS} subtitle tracks are supported.")
+                return
+            steps = [f"Practice step 2 (with {self.primary_track.title})",
+                     "Practice step 3 (with all subtitles)"]
+            step, ok = QInputDialog.getItem(
+                self, "Add Subtitle Track", "Show this track from:", steps, 1, False)
+            if not ok:
+                return
+            self.add_subtitle_track(key, title, steps.index(step) + 1)
+        self.open_subtitle_file(key)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.first_paint_done:
+            self.first_paint_done = True
+            startup_timeline.mark('first_paint')
+            self.start_vlc_init()
+
+    def start_vlc_init(self):
+        if self.vlc_thread is None:
+            self.vlc_thread = threading.Thread(
+                target=self.init_vlc, name='vlc-init', daemon=True)
+            self.vlc_thread.start()
+
+    def init_vlc(self):
+        try:
+            load_vlc()
+            # Create VLC instance with minimal options
+            vlc_args = ['--quiet']  # Removed potentially suspicious options
+            instance = vlc.Instance(' '.join(vlc_args))
+            self.media_player = instance.media_player_new()
+            self.instance = instance
+            startup_timeline.mark('vlc_init')
+        except Exception as e:
+            self.vlc_error = e
+        self.vlc_initialized.emit()
+
+    def on_vlc_initialized(self):
+        if self.vlc_ready:
+            return
+        if self.vlc_error is not None:
+            print(f"Error starting VLC: {self.vlc_error}")
+            show_vlc_missing()
+            return
+
+        self.vlc_ready = True
+        self.cue_scheduler.attach(self.media_player)
+        if self.video_surfaces:
+            self.standby = StandbyPlayer(self.instance.media_player_new(),
+                                         self.video_surfaces[1])
+        if STARTUP_TIMELINE_REQUESTED:
+            try:
+                startup_timeline.dump(
+                    os.path.join(app_cache_dir('diagnostics'), 'startup_timeline.json'))
+            except OSError as e:
+                print(f"Error writing startup timeline: {e}")
+
+    def ensure_vlc(self):
+        # Block until libvlc is up, starting it here if it never started
+        if not self.vlc_ready:
+            self.start_vlc_init()
+            self.vlc_thread.join()
+            self.on_vlc_initialized()
+        return self.vlc_ready
 
     def load_video(self, video_path):
         if not os.path.exists(video_path):
             return
+        if not self.ensure_vlc():
+            return
 
+        self.cancel_audio_sync()
+        self.cancel_thumbnails()
+        self.thumbnail_fingerprint = None
         self.current_video_path = video_path
+        self.seek_monitor.set_file(video_path)
+        self.video_preloaded = False
+        self.embedded_subtitles = []
+        self.keyframes = None
+        self.cue_seek_times = None
         self.video_instructions.hide()  # Hide instructions when video is loaded
 
         # Unload any existing subtitles
-        self.english_subtitles = None
-        self.persian_subtitles = None
-        self.current_english_subtitle_path = None
-        self.current_persian_subtitle_path = None
+        for key in self.tracks:
+            self.unload_subtitle(key)
         self.current_subtitle_index = 0
-        self.english_subtitle_label.setText("")
-        self.persian_subtitle_label.setText("")
+        for track in self.tracks.values():
+            track.label.setText("")
 
         # Create media with minimal options
         self.media = self.instance.media_new(video_path)
         self.media_player.set_media(self.media)
 
-        # Use simpler window handle setting
-        if sys.platform.startswith('win'):
-            self.media_player.set_hwnd(int(self.video_frame.winId()))
-        else:
-            self.media_player.set_xwindow(int(self.video_frame.winId()))
+        self.set_video_output(self.media_player, self.video_surface)
+        if self.standby is not None:
+            self.video_surface.show()
+            self.standby.surface.hide()
+            self.set_video_output(self.standby.media_player, self.standby.surface)
+            self.standby.load(self.instance.media_new(video_path))
 
-        # Play briefly to load the video then pause
-        self.media_player.play()
-        self.media_player.set_pause(1)
         self.is_playing = False
-        self.timer.start()
+        self.cue_scheduler.seek(0)
+        self.cue_scheduler.set_playing(False)
+
+        # Let libvlc probe the file in the background (slow on network
+        # shares) and preload the first frame once it reports back
+        media = self.media
+        try:
+            media.event_manager().event_attach(
+                vlc.EventType.MediaParsedChanged,
+                lambda event: self.media_parsed.emit(media))
+            parse_flags = vlc.MediaParseFlag(vlc.MediaParseFlag.local.value |
+                                             vlc.MediaParseFlag.network.value)
+            started = media.parse_with_options(
+                parse_flags, self.MEDIA_PARSE_TIMEOUT_MS)
+        except Exception as e:
+            print(f"Error parsing media: {e}")
+            started = -1
+        if started != 0:
+            self.preload_video(media)
+
+        # List the text tracks inside Matroska files off the GUI thread
+        if os.path.splitext(video_path)[1].lower() in MATROSKA_EXTENSIONS:
+            self.analysis_pool.start(lambda: self.probe_embedded_subtitles(video_path))
+        self.analysis_pool.start(lambda: self.find_keyframes(video_path))
 
         # Set focus to main window for keyboard control
         self.setFocus()
         self.activateWindow()
 
+    @staticmethod
+    def set_video_output(media_player, widget):
+        # Use simpler window handle setting
+        if sys.platform.startswith('win'):
+            media_player.set_hwnd(int(widget.winId()))
+        else:
+            media_player.set_xwindow(int(widget.winId()))
+
+    def on_media_parsed(self, media):
+        if media is self.media:
+            self.preload_video(media)
+
+    def preload_video(self, media):
+        # Play briefly to load the video then pause
+        if media is self.media and not self.video_preloaded:
+            self.video_preloaded = True
+            self.media_player.play()
+            self.media_player.set_pause(1)
+
+    def probe_embedded_subtitles(self, video_path):
+        # Runs on the analysis pool
+        try:
+            with MatroskaReader(video_path) as reader:
+                tracks = list(reader.tracks.values())
+        except (OSError, ValueError) as e:
+            print(f"Error reading embedded subtitles: {e}")
+            tracks = []
+        self.embedded_subtitles_found.emit(video_path, tracks)
+
+    def find_keyframes(self, video_path):
+        # Runs on the analysis pool: from the cache, else from the container
+        times = None
+        try:
+            if self.keyframe_cache is not None:
+                times = self.keyframe_cache.lookup(video_path)
+            if times is None:
+                times = read_keyframe_times(video_path)
+                if self.keyframe_cache is not None:
+                    times = self.keyframe_cache.save(video_path, times)
+        except (OSError, ValueError, IndexError, struct.error) as e:
+            print(f"Error reading keyframes: {e}")
+        self.keyframes_found.emit(video_path, times or None)
+
+    def on_keyframes_found(self, video_path, times):
+        if video_path != self.current_video_path:
+            return  # Another video was opened meanwhile
+        self.keyframes = times
+        self.update_cue_seek_times()
+
+    def update_cue_seek_times(self):
+        self.cue_seek_times = None
+        timeline = self.primary_track.timeline
+        keyframes = self.keyframes
+        if not timeline or not keyframes:
+            return
+        lead = self.KEYFRAME_LEAD_MS
+        self.analysis_pool.start(lambda: self.cue_seek_times_ready.emit(
+            timeline, cue_seek_times(timeline, keyframes, lead)))
+
+    def on_cue_seek_times_ready(self, timeline, times):
+        if timeline is self.primary_track.timeline:
+            self.cue_seek_times = times
+
+    def cue_seek_time(self, index):
+        # Where to seek to play primary cue index from its start
+        times = self.cue_seek_times
+        if times is not None:
+            return times[index]
+        return self.primary_track.timeline.starts[index]
+
+    def schedule_thumbnails(self):
+        # The frame grabber has its own libvlc decoder, whose threads no
+        # pool priority reaches, so it only runs once playback has been
+        # paused for a while and stops as soon as it resumes. Frames made
+        # by an earlier run are found in the cache and skipped.
+        self.cancel_thumbnails()
+        if not self.cue_scheduler.playing:
+            self.thumbnail_idle_timer.start()
+
+    def on_playing_changed(self, playing):
+        if playing:
+            self.cancel_thumbnails()
+        else:
+            self.schedule_thumbnails()
+
+    def start_thumbnails(self):
+        self.cancel_thumbnails()
+        timeline = self.primary_track.timeline
+        if (self.thumbnail_cache is None or not timeline or self.current_video_path is None
+                or self.primary_track.key in self.subtitle_tasks or
+                timeline is self.thumbnails_complete or self.cue_scheduler.playing):
+            return  # Nothing to show yet, only a first batch, done, or playing
+        task = ThumbnailTask(self.current_video_path, timeline, self.keyframes,
+                             self.KEYFRAME_LEAD_MS, self.thumbnail_cache)
+        task.signals.ready.connect(self.on_thumbnails_ready)
+        task.signals.frame_saved.connect(self.on_thumbnail_saved)
+        task.signals.finished.connect(self.on_thumbnails_finished)
+        task.signals.failed.connect(self.on_thumbnails_failed)
+        self.thumbnail_task = task
+        self.thumbnail_pool.start(task)
+
+    def cancel_thumbnails(self):
+        self.thumbnail_idle_timer.stop()
+        if self.thumbnail_task is not None:
+            self.thumbnail_task.cancel()
+            self.thumbnail_task = None
+
+    def on_thumbnails_ready(self, task, fingerprint):
+        if task.video_path == self.current_video_path:
+            self.thumbnail_fingerprint = fingerprint
+            if self.transcript_following:
+                self.transcript.thumbnails_changed()
+
+    def on_thumbnail_saved(self, task, start):
+        timeline = self.primary_track.timeline
+        if task is self.thumbnail_task and self.transcript_following and timeline:
+            self.transcript.thumbnails_changed(bisect_left(timeline.starts, start))
+
+    def on_thumbnails_finished(self, task, cached, total):
+        if task is self.thumbnail_task:
+            self.thumbnail_task = None
+            if cached == total:
+                self.thumbnails_complete = task.timeline
+
+    def on_thumbnails_failed(self, task, message):
+        if task is self.thumbnail_task:
+            print(f"Error making cue thumbnails: {message}")
+            self.thumbnail_task = None
+
+    def cue_thumbnail(self, index):
+        # Cached frame of primary cue index, or None
+        timeline = self.primary_track.timeline
+        if self.thumbnail_fingerprint is None or not timeline or not 0 <= index < len(timeline):
+            return None
+        return self.thumbnail_cache.lookup(self.thumbnail_fingerprint, timeline.starts[index])
+
+    def search_hit_thumbnail(self, hit):
+        primary = self.primary_track
+        if (primary.store and primary.embedded_track == hit.embedded_track and
+                self.same_file(primary.path, hit.path)):
+            return self.cue_thumbnail(hit.cue)
+        return None
+
+    def on_embedded_subtitles_found(self, video_path, tracks):
+        if video_path != self.current_video_path:
+            return  # Another video was opened meanwhile
+        self.embedded_subtitles = tracks
+
+        # Fill empty tracks from embedded ones in their language
+        for key, languages in self.TRACK_LANGUAGES.items():
+            track = self.tracks.get(key)
+            if track is None or track.store is not None or key in self.subtitle_tasks:
+                continue
+            matches = [embedded for embedded in tracks
+                       if embedded.language.lower().split('-')[0] in languages]
+            matches.sort(key=lambda embedded: (embedded.forced, not embedded.default))
+            if matches:
+                self.load_subtitle(video_path, key, matches[0].number)
+
     def open_file(self):
         dialog = QFileDialog()
         video_path, _ = dialog.getOpenFileName(self, "Open Video File", "",
@@ -239,78 +4871,793 @@ https://github.com/rabiejavadian/video-player-for-language-learners/releases/lat
         if video_path:
             self.load_video(video_path)
 
-    def open_subtitle_file(self, language):
+    def open_subtitle_file(self, key):
         if not self.media:  # If no video is loaded, don't open subtitle dialog
             return
 
+        title = self.tracks[key].title
+        if self.embedded_subtitles:
+            # Offer the video's own text tracks next to a file
+            choices = ["Subtitle file..."] + [
+                describe_matroska_track(embedded) for embedded in self.embedded_subtitles]
+            choice, ok = QInputDialog.getItem(
+                self, f"Open {title} Subtitle", "Load subtitles from:", choices, 0, False)
+            if not ok:
+                return
+            index = choices.index(choice)
+            if index > 0:
+                self.load_subtitle(self.current_video_path, key,
+                                   self.embedded_subtitles[index - 1].number)
+                return
+
         dialog = QFileDialog()
-        subtitle_path, _ = dialog.getOpenFileName(self, f"Open {language.title()} Subtitle File", "",
-                                                  "Subtitle Files (*.srt)")
+        subtitle_path, _ = dialog.getOpenFileName(self, f"Open {title} Subtitle File", "",
+                                                  "Subtitle Files (*.srt *.vtt *.ass *.ssa)")
         if subtitle_path:
-            self.load_subtitle(subtitle_path, language)
+            self.load_subtitle(subtitle_path, key)
+
+    def load_subtitle(self, subtitle_path, key, embedded_track=None):
+        if not os.path.exists(subtitle_path) or key not in self.tracks:
+            return
+
+        # Parse on the thread pool, the window stays responsive meanwhile
+        self.cancel_subtitle_load(key)
+        task = SubtitleLoadTask(subtitle_path, key, self.subtitle_cache, embedded_track)
+        task.signals.first_batch.connect(self.on_subtitle_first_batch)
+        task.signals.finished.connect(self.on_subtitle_finished)
+        task.signals.progress.connect(self.on_subtitle_progress)
+        task.signals.failed.connect(self.on_subtitle_failed)
+        task.signals.cancelled.connect(self.on_subtitle_cancelled)
+        self.subtitle_tasks[key] = task
+        self.thread_pool.start(task)
+
+        # Set focus to main window for keyboard control
+        self.setFocus()
+        self.activateWindow()
 
-    def load_subtitle(self, subtitle_path, language):
-        if not os.path.exists(subtitle_path):
+    def cancel_subtitle_load(self, key):
+        task = self.subtitle_tasks.pop(key, None)
+        if task is not None:
+            task.cancel()
+            self.set_subtitle_button_progress(key, None)
+            self.start_deferred_jobs()
+
+    def on_subtitle_first_batch(self, task, store):
+        # Only worth it on an empty screen: with another track loaded, the
+        # merged index would be rebuilt over all of it for a few cues, so
+        # this track waits for its full load instead
+        if self.subtitle_tasks.get(task.track_key) is not task:
             return
+        if any(track.timeline for key, track in self.tracks.items() if key != task.track_key):
+            return
+        self.install_subtitle_track(task.track_key, task.path, store, task.embedded_track)
+
+    def on_subtitle_finished(self, task, store):
+        if self.subtitle_tasks.get(task.track_key) is not task:
+            return  # Superseded by another load
+        del self.subtitle_tasks[task.track_key]
+        self.set_subtitle_button_progress(task.track_key, None)
+        self.install_subtitle_track(task.track_key, task.path, store, task.embedded_track)
+        self.index_subtitles(task.path, store, task.embedded_track)
+        if task.track_key == self.primary_track.key:
+            self.find_rare_words(store)
+
+        hit = self.pending_search_hit
+        if (hit is not None and self.same_file(hit.path, task.path) and
+                hit.embedded_track == task.embedded_track):
+            self.pending_search_hit = None
+            self.jump_to_track_cue(self.tracks[task.track_key], hit.cue)
+            if hit is self.review_hit:
+                self.play_review_line()
+        self.start_deferred_jobs()
+
+    def after_subtitle_loads(self, pool, job):
+        # Background work that would slow a load down waits for it to finish
+        self.deferred_jobs.append((pool, job))
+        self.start_deferred_jobs()
+
+    def start_deferred_jobs(self):
+        if self.subtitle_tasks:
+            return
+        jobs, self.deferred_jobs = self.deferred_jobs, []
+        for pool, job in jobs:
+            pool.start(job)
 
+    def install_subtitle_track(self, key, subtitle_path, store, embedded_track=None):
+        track = self.tracks[key]
         try:
-            # Use explicit encoding to avoid file operation flags
-            with open(subtitle_path, 'r', encoding='utf-8-sig') as f:
-                if language == 'english':
-                    self.english_subtitles = pysrt.from_string(f.read())
-                    self.current_english_subtitle_path = subtitle_path
-                else:
-                    self.persian_subtitles = pysrt.from_string(f.read())
-                    self.current_persian_subtitle_path = subtitle_path
+            # Cue times come straight from the store until something
+            # (e.g. a sync correction) gives the track its own timeline
+            track.store = store
+            track.timeline = store
+            track.path = subtitle_path
+            track.embedded_track = embedded_track
+            track.sync = None
+
+            self.rebuild_track_index(track)
 
             # Make sure VLC subtitles are still disabled
-            self.media_player.video_set_spu(-1)
-            self.media_player.video_set_subtitle_file("")
+            if self.media_player is not None:
+                self.media_player.video_set_spu(-1)
+                self.media_player.video_set_subtitle_file("")
             # Find current subtitle index
             self.find_current_subtitle_index()
             self.update_subtitle_text()
-
-            # Set focus to main window for keyboard control
-            self.setFocus()
-            self.activateWindow()
+            self.cue_scheduler.rearm()
 
         except Exception as e:
             print(f"Error loading subtitle: {e}")
-            if language == 'english':
-                self.english_subtitles = None
-                self.current_english_subtitle_path = None
+            self.unload_subtitle(key)
+
+    def on_subtitle_progress(self, task, percent):
+        if self.subtitle_tasks.get(task.track_key) is task:
+            self.set_subtitle_button_progress(task.track_key, percent)
+
+    def on_subtitle_failed(self, task, message):
+        if self.subtitle_tasks.get(task.track_key) is task:
+            print(f"Error loading subtitle: {message}")
+            self.unload_subtitle(task.track_key)
+
+    def on_subtitle_cancelled(self, task):
+        if self.subtitle_tasks.get(task.track_key) is task:
+            del self.subtitle_tasks[task.track_key]
+            self.set_subtitle_button_progress(task.track_key, None)
+            self.start_deferred_jobs()
+
+    def set_subtitle_button_progress(self, key, percent):
+        track = self.tracks[key]
+        title = f"Open {track.title} Subtitle"
+        track.button.setText(title if percent is None else f"{title} ({percent}%)")
+
+    def unload_subtitle(self, key):
+        self.cancel_subtitle_load(key)
+        track = self.tracks[key]
+        track.store = None
+        track.timeline = None
+        track.path = None
+        track.embedded_track = None
+        track.sync = None
+        track.highlights = {}
+        track.label.set_highlights({})
+        self.rebuild_track_index(track)
+
+    def subtitle_search_index(self):
+        # Opened on first use to keep SQLite out of start-up
+        if self.search_index is None:
+            try:
+                self.search_index = SubtitleSearchIndex(
+                    os.path.join(app_cache_dir('search'), 'subtitles.sqlite3'))
+            except (OSError, sqlite3.Error) as e:
+                print(f"Subtitle search disabled: {e}")
+        return self.search_index
+
+    def index_subtitles(self, path, store, embedded_track=None):
+        index = self.subtitle_search_index()
+        if index is None:
+            return
+
+        def run():
+            # Runs on the index pool
+            try:
+                index.add_store(path, store, embedded_track)
+            except (OSError, sqlite3.Error) as e:
+                print(f"Error indexing subtitles: {e}")
+        self.after_subtitle_loads(self.index_pool, run)
+
+    def with_review_cards(self, call):
+        # call(scheduler) now, or once the cards are loaded on the review pool
+        if self.review_scheduler is not None:
+            call(self.review_scheduler)
+            return
+        if not self.review_waiting:
+            if self.review_store is None:
+                try:
+                    self.review_store = ReviewStore(
+                        os.path.join(app_data_dir('review'), 'review.sqlite3'))
+                except (OSError, sqlite3.Error) as e:
+                    print(f"Review disabled: {e}")
+                    return
+            store = self.review_store
+
+            def load():
+                # Runs on the review pool
+                try:
+                    self.review_loaded.emit(store.load(), "")
+                except sqlite3.Error as e:
+                    self.review_loaded.emit([], str(e))
+            self.review_pool.start(load)
+        self.review_waiting.append(call)
+
+    def on_review_loaded(self, cards, error):
+        if error:
+            print(f"Error loading review cards: {error}")
+        self.review_scheduler = ReviewScheduler(cards)
+        waiting, self.review_waiting = self.review_waiting, []
+        for call in waiting:
+            call(self.review_scheduler)
+
+    def current_review_line(self):
+        # New card for the current primary cue; its key finds an existing one
+        primary = self.primary_track
+        index = self.current_subtitle_index
+        if (not primary.store or primary.path is None or self.current_video_path is None or
+                not 0 <= index < len(primary.store)):
+            return None
+        track = -1 if primary.embedded_track is None else primary.embedded_track
+        return ReviewCard(SubtitleSearchIndex.normalized(primary.path), track,
+                          primary.store.starts[index], primary.store.texts[index],
+                          os.path.abspath(self.current_video_path), primary.store.ends[index],
+                          due=time.time())
+
+    def record_review(self, kind, grade=None):
+        # Taken now, applied once the cards are loaded: playback never waits
+        line = self.current_review_line()
+        if line is None:
+            return
+        now = time.time()
+
+        def apply(scheduler):
+            card = scheduler.get(line.key)
+            if card is None:
+                card = line
+                scheduler.add(card)
+            if grade is None:
+                card.replays += 1
             else:
-                self.persian_subtitles = None
-                self.current_persian_subtitle_path = None
+                scheduler.rate(card, grade, now)
+            self.review_rows[card.key] = card.row()
+            self.review_outcomes.append((*card.key, now, kind, grade))
+            if len(self.review_outcomes) >= self.REVIEW_BATCH:
+                self.flush_review_writes()
+            elif not self.review_flush_timer.isActive():
+                self.review_flush_timer.start()
+            if grade is not None:
+                self.on_line_rated(card, now)
+        self.with_review_cards(apply)
+
+    def flush_review_writes(self):
+        self.review_flush_timer.stop()
+        if not self.review_outcomes:
+            return
+        store, cards, outcomes = self.review_store, list(self.review_rows.values()), self.review_outcomes
+        self.review_rows, self.review_outcomes = {}, []
+
+        def write():
+            # Runs on the review pool, after any earlier batch
+            try:
+                store.write(cards, outcomes)
+            except sqlite3.Error as e:
+                print(f"Error saving review progress: {e}")
+        self.review_pool.start(write)
+
+    def on_line_rated(self, card, now):
+        if self.review_mode:
+            if card.due > now + ReviewScheduler.RELEARN_S:
+                self.review_left = max(0, self.review_left - 1)
+            self.review_next()
+            return
+        days = (card.due - now) / ReviewScheduler.DAY_S
+        if days < 1:
+            when = f"in {round(days * 24 * 60)} minutes"
+        else:
+            when = f"in {days:.0f} days" if days >= 1.5 else "tomorrow"
+        self.show_review_message(f"Next review {when}")
 
-    def find_current_subtitle_index(self):
-        if not self.english_subtitles:
+    def toggle_review_mode(self):
+        if self.review_mode:
+            self.stop_review("Review stopped")
+            return
+        self.review_mode = True
+        self.show_review_message("Loading review cards...")
+
+        def start(scheduler):
+            # Counted once here; O(n) is fine per session, not per card
+            self.review_left = scheduler.due_count(time.time())
+            self.review_next()
+        self.with_review_cards(start)
+
+    def review_next(self):
+        # Go to the most overdue line through the search hit path, which
+        # opens its video and subtitles when they are not the current ones
+        if not self.review_mode:
+            return
+        scheduler = self.review_scheduler
+        now = time.time()
+        while True:
+            card = scheduler.next_due(now)
+            if card is None:
+                self.stop_review("No lines are due for review")
+                return
+            if os.path.exists(card.subtitle) and os.path.exists(card.video):
+                break
+            scheduler.postpone(card, ReviewScheduler.DAY_S)  # Drive not plugged in?
+        # No cue index (-1): the hit only opens the files, play_review_line
+        # then finds the line in the track as it was parsed this time
+        hit = SearchHit(card.subtitle, None if card.track < 0 else card.track,
+                        -1, card.start, card.end, card.text)
+        self.review_card = card
+        self.review_hit = hit
+        self.update_review_overlay()
+        self.go_to_search_hit(hit)
+        if self.pending_search_hit is not hit:
+            self.play_review_line()  # Already open
+
+    def play_review_line(self):
+        # Listen first: step 1 of the practice drill, Up shows the subtitles
+        card, hit = self.review_card, self.review_hit
+        for track in self.tracks.values():
+            if (track.store and self.same_file(track.path, hit.path) and
+                    track.embedded_track == hit.embedded_track):
+                index = card.find_in(track.store)
+                if index is not None:
+                    self.jump_to_track_cue(track, index)
+                    self.practice_step = 0
+                    self.practice_subtitle_sequence()
+                    self.cue_scheduler.set_playing(self.is_playing)
+                    return
+                break
+        # The line is gone from the file (edited, or read differently)
+        self.review_scheduler.postpone(card, ReviewScheduler.DAY_S)
+        self.review_next()
+
+    def stop_review(self, message):
+        self.review_mode = False
+        self.review_card = None
+        self.review_hit = None
+        self.show_review_message(message)
+
+    def show_review_message(self, text):
+        self.review_overlay.setText(text)
+        self.place_review_overlay()
+        self.review_overlay_timer.start()
+
+    def update_review_overlay(self):
+        # Rating hints while reviewing, hidden otherwise
+        if not self.review_mode:
+            self.review_overlay.hide()
+            return
+        self.review_overlay.setText(
+            f"Review: {self.review_left} due\n"
+            "Up: show subtitles, Down: replay\n"
+            "1 again  2 hard  3 good  4 easy  (R: stop)")
+        self.place_review_overlay()
+
+    def place_review_overlay(self):
+        self.review_overlay.adjustSize()
+        self.review_overlay.move(
+            max(10, self.video_frame.width() - self.review_overlay.width() - 10), 10)
+        self.review_overlay.show()
+        self.review_overlay.raise_()
+
+    def toggle_transcript(self):
+        if self.transcript is None:
+            self.transcript = TranscriptDock(self, self)
+            self.transcript.cue_activated.connect(self.on_transcript_cue)
+            self.transcript.visibilityChanged.connect(self.on_transcript_visibility)
+            self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.transcript)
+            self.transcript.show()
+        else:
+            self.transcript.setVisible(not self.transcript.isVisible())
+
+    def on_transcript_visibility(self, visible):
+        # Hidden, the panel is left alone entirely; shown, it catches up
+        if visible and not self.transcript_following:
+            self.transcript.refresh()
+        self.transcript_following = visible
+
+    def on_transcript_cue(self, index):
+        self.practice_step = 0
+        self.jump_to_track_cue(self.primary_track, index)
+
+    def export_clips(self):
+        primary = self.primary_track
+        if self.export_dialog is not None and self.export_dialog.exporting:
+            self.export_dialog.show()
+            self.export_dialog.raise_()
+            return
+        if self.current_video_path is None or not primary.store:
+            QMessageBox.information(self, "Export Clips",
+                                    f"Open a video and its {primary.title} subtitles first.")
+            return
+        selected = self.transcript.selected_cues() if self.transcript_following else []
+        self.export_dialog = ClipExportDialog(self.current_video_path, len(primary.timeline),
+                                              selected, self.clip_jobs, self.export_pool, self)
+        self.export_dialog.show()
+
+    def clip_jobs(self, cues, padding):
+        # One ClipJob per primary cue index, with the lines of every loaded track
+        primary = self.primary_track
+        timeline = primary.timeline
+        jobs = []
+        for cue in cues:
+            texts = {primary.title: primary.store.texts[cue]}
+            for track in self.secondary_tracks:
+                if track.store:
+                    texts[track.title] = self.track_text_for_index(track, cue) or ""
+            jobs.append(ClipJob(cue, max(0, timeline.starts[cue] - padding),
+                                timeline.ends[cue] + padding, texts))
+        return jobs
+
+    def open_search(self):
+        index = self.subtitle_search_index()
+        if index is None:
+            QMessageBox.warning(self, "Search Subtitles", "The subtitle index could not be opened.")
+            return
+        if self.search_dialog is None:
+            self.search_dialog = SubtitleSearchDialog(
+                index, self.open_subtitle_files, self.index_pool, self,
+                thumbnail_for=self.search_hit_thumbnail)
+            self.search_dialog.hit_activated.connect(self.go_to_search_hit)
+        self.search_dialog.show()
+        self.search_dialog.raise_()
+        self.search_dialog.activateWindow()
+
+    def media_library(self):
+        # Opened on first use like the search index
+        if self.library is None:
+            try:
+                self.library = MediaLibrary(
+                    os.path.join(app_cache_dir('library'), 'catalog.sqlite3'),
+                    self.TRACK_LANGUAGES)
+            except (OSError, sqlite3.Error) as e:
+                print(f"Library disabled: {e}")
+        return self.library
+
+    def vocabulary_corpus(self, create=False):
+        # Word stats only exist once the user analyzed their library, so
+        # there is nothing to open (or highlight) before that
+        if self.vocabulary is None:
+            path = os.path.join(app_cache_dir('library'), 'vocabulary.sqlite3')
+            if create or os.path.exists(path):
+                try:
+                    self.vocabulary = VocabularyCorpus(path, self.TRACK_LANGUAGES)
+                except (OSError, sqlite3.Error) as e:
+                    print(f"Word stats disabled: {e}")
+        return self.vocabulary
+
+    def find_rare_words(self, store):
+        corpus = self.vocabulary_corpus()
+        if corpus is None:
             return
 
-        current_time = self.media_player.get_time()
-        if current_time < 0:  # Handle invalid time
-            self.current_subtitle_index = 0
+        def run():
+            # Runs on the analysis pool
+            try:
+                rare_words = corpus.rare_words(
+                    word for text in store.texts for word in english_words(text))
+            except sqlite3.Error as e:
+                print(f"Error reading word stats: {e}")
+                return
+            if rare_words is None:
+                return
+            highlights = {}
+            for text in store.texts:
+                if text not in highlights:
+                    markup = rare_word_markup(text, rare_words)
+                    if markup is not None:
+                        highlights[text] = markup
+            self.rare_words_found.emit(store, highlights)
+        self.after_subtitle_loads(self.analysis_pool, run)
+
+    def on_rare_words_found(self, store, highlights):
+        primary = self.primary_track
+        if primary.store is not store:
+            return  # Another file was loaded meanwhile
+        primary.highlights = highlights
+        if self.highlight_rare_words:
+            primary.label.set_highlights(highlights)
+
+    def toggle_rare_word_highlights(self):
+        self.highlight_rare_words = not self.highlight_rare_words
+        primary = self.primary_track
+        primary.label.set_highlights(primary.highlights if self.highlight_rare_words else {})
+
+    def on_vocabulary_updated(self):
+        if self.primary_track.store:
+            self.find_rare_words(self.primary_track.store)
+
+    def open_library(self):
+        library = self.media_library()
+        if library is None:
+            QMessageBox.warning(self, "Library", "The library catalog could not be opened.")
             return
+        if self.library_dialog is None:
+            self.library_dialog = LibraryDialog(
+                library, self.vocabulary_corpus(create=True),
+                lambda: {key: track.title for key, track in self.tracks.items()},
+                self.library_scan_pool, self.word_count_pool, self)
+            self.library_dialog.entry_activated.connect(self.open_library_entry)
+            self.library_dialog.analysis_finished.connect(self.on_vocabulary_updated)
+        self.library_dialog.show()
+        self.library_dialog.raise_()
+        self.library_dialog.activateWindow()
+
+    def open_library_entry(self, entry):
+        if not os.path.exists(entry.video):
+            QMessageBox.information(self, "Library",
+                                    f"{os.path.basename(entry.video)} is no longer there.")
+            return
+        self.load_video(entry.video)
+        for key, path in entry.subtitles.items():
+            if key in self.tracks and os.path.exists(path):
+                self.load_subtitle(path, key)
+
+    def open_subtitle_files(self):
+        return [(track.path, track.embedded_track) for track in self.tracks.values()
+                if track.store]
+
+    @staticmethod
+    def same_file(path, other):
+        return os.path.normcase(os.path.abspath(path)) == os.path.normcase(os.path.abspath(other))
+
+    def go_to_search_hit(self, hit):
+        for track in self.tracks.values():
+            if (track.store and self.same_file(track.path, hit.path) and
+                    track.embedded_track == hit.embedded_track):
+                self.jump_to_track_cue(track, hit.cue)
+                return
 
-        # Find the appropriate subtitle index for the current time
-        for i, subtitle in enumerate(self.english_subtitles):
-            start_time = (subtitle.start.hours * 3600 +
-                          subtitle.start.minutes * 60 +
-                          subtitle.start.seconds) * 1000 + subtitle.start.milliseconds
-            end_time = (subtitle.end.hours * 3600 +
-                        subtitle.end.minutes * 60 +
-                        subtitle.end.seconds) * 1000 + subtitle.end.milliseconds
-
-            if start_time <= current_time <= end_time:
-                self.current_subtitle_index = i
+        # A line from another file: open it with its video, jump once loaded
+        if hit.embedded_track is not None:
+            video_path = hit.path
+        else:
+            video_path = find_sibling_video(hit.path)
+        if video_path is None or not os.path.exists(hit.path):
+            QMessageBox.information(self, "Search Subtitles",
+                                    f"No video found for {os.path.basename(hit.path)}.")
+            return
+        self.load_video(video_path)
+        self.pending_search_hit = hit
+        self.load_subtitle(hit.path, self.track_key_for_file(hit.path),
+                           hit.embedded_track)
+
+    def track_key_for_file(self, path):
+        # Track whose language the file name ends in ("Movie.fa.srt"), else the primary one
+        stem = os.path.splitext(os.path.basename(path))[0]
+        language = os.path.splitext(stem)[1][1:].lower()
+        for key, languages in self.TRACK_LANGUAGES.items():
+            if language in languages and key in self.tracks:
+                return key
+        return self.primary_track.key
+
+    def jump_to_track_cue(self, track, cue):
+        if not track.timeline or not 0 <= cue < len(track.timeline):
+            return
+        self.set_subtitle_visibility(2)
+        primary = self.primary_track
+        if track is primary:
+            index = cue
+        elif primary.timeline:
+            index = primary.timeline.index_at(track.timeline.starts[cue])
+        else:
+            self.seek(track.timeline.starts[cue])
+            self.update_subtitle_text()
+            return
+        self.current_subtitle_index = index
+        self.jump_to_subtitle(index)
+        self.cue_scheduler.set_playing(self.is_playing)
+
+    def sync_subtitles(self):
+        primary = self.primary_track
+        tracks = [track for track in self.secondary_tracks if track.store]
+        if not primary.store:
+            QMessageBox.information(self, "Sync Subtitles",
+                                    f"Open the {primary.title} subtitles first.")
+            return
+        if self.subtitle_tasks or self.audio_sync_task:
+            return  # Wait for the tracks to finish loading
+        try:
+            load_numpy()
+        except ImportError:
+            QMessageBox.warning(self, "Sync Subtitles",
+                                "Subtitle sync needs NumPy (pip install numpy).")
+            return
+
+        modes = []
+        if tracks:
+            modes.append(f"Match the other tracks to {primary.title}")
+        if self.current_video_path and self.speech_cache:
+            modes.append(f"Match {primary.title} to the speech in the video")
+        if not modes:
+            QMessageBox.information(self, "Sync Subtitles",
+                                    "Open a video or at least one other track first.")
+            return
+        if len(modes) > 1:
+            mode, ok = QInputDialog.getItem(self, "Sync Subtitles", "Sync by:", modes, 0, False)
+            if not ok:
                 return
-            elif current_time < start_time:
-                self.current_subtitle_index = max(0, i - 1)
+        else:
+            mode = modes[0]
+        if mode != modes[0] or not tracks:
+            self.sync_to_audio()
+            return
+
+        # Sync from each track's own cue times so syncing again starts over
+        reference = primary.timeline
+        stores = {track.key: track.store for track in tracks}
+        self.sync_button.setEnabled(False)
+        self.sync_button.setText("Syncing...")
+        self.sync_pool.start(lambda: self.run_subtitle_sync(reference, stores))
+
+    def sync_to_audio(self):
+        # Decoding runs once per video, later syncs read the cached speech
+        task = AudioSpeechTask(self.instance, self.current_video_path, self.speech_cache)
+        task.signals.progress.connect(self.on_audio_sync_progress)
+        task.signals.finished.connect(self.on_audio_speech_found)
+        task.signals.failed.connect(self.on_audio_sync_failed)
+        self.audio_sync_task = task
+        self.sync_button.setEnabled(False)
+        self.sync_button.setText("Listening...")
+        self.after_subtitle_loads(self.sync_pool, task)
+
+    def cancel_audio_sync(self):
+        if self.audio_sync_task is not None:
+            self.audio_sync_task.cancel()
+            self.audio_sync_task = None
+            self.sync_button.setEnabled(True)
+            self.sync_button.setText("Sync Subtitles")
+
+    def on_audio_sync_progress(self, task, percent):
+        if task is self.audio_sync_task:
+            self.sync_button.setText(f"Listening... {percent}%")
+
+    def on_audio_sync_failed(self, task, error):
+        if task is self.audio_sync_task:
+            self.cancel_audio_sync()
+            QMessageBox.warning(self, "Sync Subtitles", f"Could not read the video's audio: {error}")
+
+    def on_audio_speech_found(self, task, speech):
+        if task is not self.audio_sync_task:
+            return
+        self.audio_sync_task = None
+        primary = self.primary_track
+        if not primary.store:
+            self.on_subtitle_sync_finished({}, "the subtitles were closed")
+            return
+        if not len(speech):
+            self.on_subtitle_sync_finished({}, "no speech found in the video's audio")
+            return
+        self.sync_button.setText("Syncing...")
+        stores = {primary.key: primary.store}
+        self.sync_pool.start(lambda: self.run_subtitle_sync(speech, stores, refine=False))
+
+    def run_subtitle_sync(self, reference, stores, refine=True):
+        # Runs on the sync pool
+        try:
+            sync = SubtitleSync(reference)
+            results = {key: (store, sync.find(store, refine)) for key, store in stores.items()}
+        except Exception as e:
+            self.subtitle_sync_finished.emit({}, str(e))
+            return
+        self.subtitle_sync_finished.emit(results, "")
+
+    def on_subtitle_sync_finished(self, results, error):
+        self.sync_button.setEnabled(True)
+        self.sync_button.setText("Sync Subtitles")
+        if error:
+            QMessageBox.warning(self, "Sync Subtitles", f"Subtitle sync failed: {error}")
+            return
+
+        found = {}
+        lines = []
+        for key, (store, result) in results.items():
+            track = self.tracks.get(key)
+            if track is None or track.store is not store:
+                continue  # Reloaded meanwhile
+            reference = "the video's speech" if track is self.primary_track else self.primary_track.title
+            if result is None or result.confidence < SubtitleSync.MIN_CONFIDENCE:
+                lines.append(f"{track.title}: no reliable match with {reference}")
+                continue
+            found[key] = result
+            lines.append(f"{track.title}: shift {result.offset / 1000:+.2f} s, "
+                         f"speed x{result.scale:.4f} ({result.matched} lines matched)")
+        if not found:
+            QMessageBox.information(self, "Sync Subtitles", "\n".join(lines))
+            return
+
+        answer = QMessageBox.question(
+            self, "Sync Subtitles", "\n".join(lines) + "\n\nApply this correction?")
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+        primary = self.primary_track
+        if primary.key in found:
+            # Tracks lined up with the primary one move along with it
+            result = found.pop(primary.key)
+            moved = self.compose_sync((result.scale, result.offset),
+                                      self.invert_sync(primary.sync or (1.0, 0.0)))
+            for track in self.secondary_tracks:
+                if track.store and track.key not in found:
+                    scale, offset = self.compose_sync(moved, track.sync or (1.0, 0.0))
+                    self.apply_time_correction(track, scale, offset)
+            self.apply_time_correction(primary, result.scale, result.offset)
+        for key, result in found.items():
+            self.apply_time_correction(self.tracks[key], result.scale, result.offset)
+
+    @staticmethod
+    def compose_sync(outer, inner):
+        # (scale, offset) of t -> outer(inner(t))
+        return outer[0] * inner[0], outer[0] * inner[1] + outer[1]
+
+    @staticmethod
+    def invert_sync(sync):
+        scale, offset = sync
+        return 1 / scale, -offset / scale
+
+    def apply_time_correction(self, track, scale, offset):
+        # Give the track its own timeline; the file and the store stay as they are
+        if track.store is None:
+            return
+        if abs(scale - 1) < 1e-6 and abs(offset) < 1:
+            track.timeline = track.store
+            track.sync = None
+        else:
+            track.timeline = corrected_timeline(track.store, scale, offset)
+            track.sync = (scale, offset)
+        self.rebuild_track_index(track)
+        self.find_current_subtitle_index()
+        self.update_subtitle_text()
+        self.cue_scheduler.rearm()
+
+    def rebuild_track_index(self, changed_track):
+        # Re-pair the tracks with the primary one, O(n + m) per pair and only
+        # for the pairs that changed, then merge all loaded tracks again
+        primary = self.primary_track
+        for track in self.secondary_tracks:
+            if changed_track is not primary and track is not changed_track:
+                continue
+            if primary.timeline and track.timeline:
+                track.alignment = CueAlignment(primary.timeline, track.timeline)
+            else:
+                track.alignment = None
+
+        loaded = []
+        for track in self.tracks.values():
+            track.column = len(loaded) if track.timeline else None
+            if track.timeline:
+                loaded.append(track.timeline)
+        self.merged_timeline = MergedTimeline(loaded) if loaded else None
+        if changed_track is primary:
+            self.update_cue_seek_times()
+            self.schedule_thumbnails()
+        if self.transcript_following:
+            self.transcript.refresh()
+
+    def segment_at(self, current_time):
+        # The one merged lookup a tick needs for every track
+        if self.merged_timeline is None:
+            return -1
+        return self.merged_timeline.segment_at(current_time)
+
+    def find_current_subtitle_index(self, segment=None):
+        primary = self.primary_track
+        if not primary.store:
+            return
+
+        if segment is None:
+            current_time = self.media_player.get_time()
+            if current_time < 0:  # Handle invalid time
+                self.current_subtitle_index = 0
                 return
+            segment = self.segment_at(current_time)
 
-        self.current_subtitle_index = len(self.english_subtitles) - 1
+        # Find the appropriate subtitle index for the current time
+        self.current_subtitle_index = self.merged_timeline.index_at(
+            primary.column, segment)
 
     def keyPressEvent(self, event):
+        if event.modifiers() == Qt.KeyboardModifier.ControlModifier:
+            if event.key() == Qt.Key.Key_F:
+                self.open_search()
+                return
+            if event.key() == Qt.Key.Key_L:
+                self.open_library()
+                return
+            if event.key() == Qt.Key.Key_E:
+                self.export_clips()
+                return
+        if event.key() == Qt.Key.Key_R and event.modifiers() == Qt.KeyboardModifier.NoModifier:
+            self.toggle_review_mode()  # Opens the videos it needs
+            return
         if not self.media:  # If no media is loaded, ignore keyboard shortcuts
             if event.key() == Qt.Key.Key_F:  # Allow fullscreen toggle even without media
                 self.toggle_fullscreen()
@@ -324,48 +5671,66 @@ https://github.com/rabiejavadian/video-player-for-language-learners/releases/lat
             # Reset practice sequence if in progress
             if self.practice_step > 0:
                 self.practice_step = 0
-                # self.subtitle_visibility_state = 2  # Show both subtitles
-                # self.english_subtitle_label.setVisible(True)
-                # self.persian_subtitle_label.setVisible(True)
+                # self.set_subtitle_visibility(2)  # Show all subtitles
 
             if event.modifiers() == Qt.KeyboardModifier.ControlModifier:
                 self.start_from_next_subtitle()
+                self.jumping_ahead = True
             else:
                 self.play_until_next_subtitle()
         elif event.key() == Qt.Key.Key_Left:
             # Reset practice sequence if in progress
             if self.practice_step > 0:
                 self.practice_step = 0
-                # self.subtitle_visibility_state = 2  # Show both subtitles
-                # self.english_subtitle_label.setVisible(True)
-                # self.persian_subtitle_label.setVisible(True)
+                # self.set_subtitle_visibility(2)  # Show all subtitles
             self.previous_subtitle()
+            self.jumping_ahead = False
         elif event.key() == Qt.Key.Key_Down:
+            self.record_review('replay')
             self.repeat_current_subtitle()
             if not self.media_player.is_playing():
                 self.media_player.play()
                 self.is_playing = True
+            self.jumping_ahead = False
         elif event.key() == Qt.Key.Key_Up:
+            if self.practice_step == 0:
+                self.record_review('practice')
             self.practice_subtitle_sequence()
+            self.jumping_ahead = False
         elif event.key() == Qt.Key.Key_F:
             self.toggle_fullscreen()
+        elif (event.key() == Qt.Key.Key_P and hot_path_profiler is not None and
+              event.modifiers() == Qt.KeyboardModifier.ShiftModifier):
+            hot_path_profiler.capture()
+        elif event.key() == Qt.Key.Key_P:
+            self.toggle_performance_overlay()
+        elif event.key() == Qt.Key.Key_W:
+            self.toggle_rare_word_highlights()
+        elif event.key() == Qt.Key.Key_T:
+            self.toggle_transcript()
         elif event.key() == Qt.Key.Key_Escape and self.is_fullscreen:
             self.toggle_fullscreen()
+        elif (event.modifiers() == Qt.KeyboardModifier.ControlModifier and
+              Qt.Key.Key_1 <= event.key() <= Qt.Key.Key_9):
+            self.toggle_subtitle_track(event.key() - Qt.Key.Key_1)
+        elif (Qt.Key.Key_1 <= event.key() <= Qt.Key.Key_4 and
+              not event.modifiers() & Qt.KeyboardModifier.ControlModifier):
+            self.record_review('rating', event.key() - Qt.Key.Key_0)
+
+        # Re-arm the next cue deadline for the new position and state
+        self.cue_scheduler.set_playing(self.is_playing)
+        self.park_standby()
 
     def toggle_fullscreen(self):
         if not self.is_fullscreen:
             self.normal_geometry = self.geometry()
-            self.open_button.hide()
-            self.open_english_subtitle_button.hide()
-            self.open_persian_subtitle_button.hide()
-            self.help_button.hide()
+            for button in self.control_buttons():
+                button.hide()
             self.showFullScreen()
             self.is_fullscreen = True
         else:
-            self.open_button.show()
-            self.open_english_subtitle_button.show()
-            self.open_persian_subtitle_button.show()
-            self.help_button.show()
+            for button in self.control_buttons():
+                button.show()
             self.showNormal()
             self.setGeometry(self.normal_geometry)
             self.is_fullscreen = False
@@ -375,6 +5740,7 @@ https://github.com/rabiejavadian/video-player-for-language-learners/releases/lat
             return
 
         if self.media_player.is_playing():
+            self.seek_monitor.pause_requested()
             self.media_player.pause()
             self.is_playing = False
         else:
@@ -383,33 +5749,72 @@ https://github.com/rabiejavadian/video-player-for-language-learners/releases/lat
                 self.is_playing = True
                 self.next_subtitle_end_time = None
                 # Update subtitle display immediately when resuming
-                if self.english_subtitles:
+                if self.primary_track.store:
                     self.find_current_subtitle_index()
                     self.update_subtitle_text()
+        self.cue_scheduler.set_playing(self.is_playing)
+
+    def seek(self, time_ms):
+        self.seek_monitor.seek_requested(time_ms)
+        if self.standby is not None and self.standby.target == time_ms:
+            self.swap_to_standby()
+        else:
+            self.media_player.set_time(time_ms)
+        self.cue_scheduler.seek(time_ms)
+
+    def swap_to_standby(self):
+        # The parked player is already there: show it instead of seeking
+        previous_player, previous_surface = self.media_player, self.video_surface
+        self.media_player, self.video_surface = self.standby.swap(
+            previous_player, previous_surface)
+        self.media_player.audio_set_mute(False)
+        self.video_surface.show()
+        previous_surface.hide()
+        self.performance_overlay.raise_()
+        self.review_overlay.raise_()
+        self.cue_scheduler.attach(self.media_player)  # Before the old one reports its pause
+        previous_player.set_pause(1)
+        previous_player.audio_set_mute(True)
+
+    def standby_target(self):
+        # Where the next jump most likely goes: the start of the current
+        # line (Down, Up), the next line after Ctrl+Right, or the end of the
+        # line before practice step 4 moves on from there
+        timeline = self.primary_track.timeline
+        index = self.current_subtitle_index
+        if not timeline or not 0 <= index < len(timeline):
+            return None
+        if self.practice_step == 3:
+            return timeline.ends[index]
+        if self.jumping_ahead and index + 1 < len(timeline):
+            return self.cue_seek_time(index + 1)
+        return self.cue_seek_time(index)
+
+    def park_standby(self):
+        if self.standby is None or not self.media:
+            return
+        target = self.standby_target()
+        if target is not None:
+            self.standby.park(target)
 
     def next_subtitle(self):
-        if self.english_subtitles and self.current_subtitle_index < len(self.english_subtitles) - 1:
+        if self.primary_track.store and self.current_subtitle_index < len(self.primary_track.store) - 1:
             self.current_subtitle_index += 1
             self.jump_to_subtitle(self.current_subtitle_index)
 
     def previous_subtitle(self):
-        if not self.english_subtitles or not self.media:
+        if not self.primary_track.store or not self.media:
             return
 
         if self.current_subtitle_index > 0:
-            # Show both subtitles
-            self.subtitle_visibility_state = 2
-            self.english_subtitle_label.setVisible(True)
-            self.persian_subtitle_label.setVisible(True)
+            # Show all subtitles
+            self.set_subtitle_visibility(2)
 
             self.current_subtitle_index -= 1
-            subtitle = self.english_subtitles[self.current_subtitle_index]
-            start_time = (subtitle.start.hours * 3600 +
-                          subtitle.start.minutes * 60 +
-                          subtitle.start.seconds) * 1000 + subtitle.start.milliseconds
+            end_time = self.primary_track.timeline.ends[self.current_subtitle_index]
 
             # Set video to start of the subtitle
-            self.media_player.set_time(start_time)
+            self.seek(self.cue_seek_time(self.current_subtitle_index))
             self.update_subtitle_text()
 
             # Start playing and set end time for auto-pause
@@ -417,23 +5822,17 @@ https://github.com/rabiejavadian/video-player-for-language-learners/releases/lat
             self.is_playing = True
 
             # Set end time for auto-pause
-            end_time = (subtitle.end.hours * 3600 +
-                        subtitle.end.minutes * 60 +
-                        subtitle.end.seconds) * 1000 + subtitle.end.milliseconds
             self.next_subtitle_end_time = end_time
 
     def repeat_current_subtitle(self):
-        if not self.english_subtitles or not self.media:
+        if not self.primary_track.store or not self.media:
             return
 
-        if 0 <= self.current_subtitle_index < len(self.english_subtitles):
-            subtitle = self.english_subtitles[self.current_subtitle_index]
-            start_time = (subtitle.start.hours * 3600 +
-                          subtitle.start.minutes * 60 +
-                          subtitle.start.seconds) * 1000 + subtitle.start.milliseconds
+        if 0 <= self.current_subtitle_index < len(self.primary_track.store):
+            end_time = self.primary_track.timeline.ends[self.current_subtitle_index]
 
             # Set video to start of current subtitle
-            self.media_player.set_time(start_time)
+            self.seek(self.cue_seek_time(self.current_subtitle_index))
             self.update_subtitle_text()
 
             # Start playing and set end time for auto-pause
@@ -441,158 +5840,181 @@ https://github.com/rabiejavadian/video-player-for-language-learners/releases/lat
             self.is_playing = True
 
             # Set end time for auto-pause
-            end_time = (subtitle.end.hours * 3600 +
-                        subtitle.end.minutes * 60 +
-                        subtitle.end.seconds) * 1000 + subtitle.end.milliseconds
             self.next_subtitle_end_time = end_time
 
     def jump_to_subtitle(self, index):
-        if self.english_subtitles:
-            subtitle = self.english_subtitles[index]
-            start_time = (subtitle.start.hours * 3600 +
-                          subtitle.start.minutes * 60 +
-                          subtitle.start.seconds) * 1000 + subtitle.start.milliseconds
-            self.media_player.set_time(start_time)
+        if self.primary_track.store:
+            start_time = self.primary_track.timeline.starts[index]
+            self.seek(start_time)
             self.update_subtitle_text()
 
     def update_subtitle_text(self):
-        # Update English subtitle
-        if self.english_subtitles and 0 <= self.current_subtitle_index < len(self.english_subtitles):
-            self.english_subtitle_label.setText(
-                self.english_subtitles[self.current_subtitle_index].text)
+        # Update primary subtitle
+        primary = self.primary_track
+        if primary.store and 0 <= self.current_subtitle_index < len(primary.store):
+            primary.label.setText(primary.store.texts[self.current_subtitle_index])
         else:
-            self.english_subtitle_label.setText("")
+            primary.label.setText("")
 
-        # Update Persian subtitle
-        if self.persian_subtitles and 0 <= self.current_subtitle_index < len(self.persian_subtitles):
-            self.persian_subtitle_label.setText(
-                self.persian_subtitles[self.current_subtitle_index].text)
-        else:
-            self.persian_subtitle_label.setText("")
+        # Update the other tracks
+        self.update_secondary_subtitles(
+            self.segment_at(self.cue_scheduler.current_time()))
+        self.schedule_subtitle_prepare()
 
-    def update_subtitle(self):
+    def update_subtitle(self, current_time=None):
+        # current_time: the cue scheduler's clock, else asked from libvlc
         if not self.media:
             return
 
-        current_time = self.media_player.get_time()
+        if current_time is None:
+            current_time = self.media_player.get_time()
         if current_time < 0:
             return
 
         # Check if we need to stop at next subtitle's end
         if self.next_subtitle_end_time and current_time >= self.next_subtitle_end_time:
-            self.media_player.pause()
-            self.is_playing = False
+            self.pause_at_boundary(self.next_subtitle_end_time)
             self.next_subtitle_end_time = None
-
-            # Keep subtitles visible based on visibility state
-            if self.subtitle_visibility_state == 0:
-                self.english_subtitle_label.setVisible(False)
-                self.persian_subtitle_label.setVisible(False)
-            elif self.subtitle_visibility_state == 1:
-                self.english_subtitle_label.setVisible(True)
-                self.persian_subtitle_label.setVisible(False)
-            elif self.subtitle_visibility_state == 2:
-                self.english_subtitle_label.setVisible(True)
-                self.persian_subtitle_label.setVisible(True)
             return
 
+        segment = self.segment_at(current_time)
+        primary = self.primary_track
+
         # Only update subtitle index if video is playing and not waiting for next subtitle end
         if self.media_player.is_playing() and not self.next_subtitle_end_time:
-            if self.english_subtitles:
-                self.find_current_subtitle_index()
+            if primary.store:
+                self.find_current_subtitle_index(segment)
 
-        # Update English subtitle based on current index
-        if self.english_subtitles and self.current_subtitle_index < len(self.english_subtitles):
-            current_subtitle = self.english_subtitles[self.current_subtitle_index]
-            self.english_subtitle_label.setText(current_subtitle.text)
+        # Update primary subtitle based on current index
+        if primary.store and self.current_subtitle_index < len(primary.store):
+            primary.label.setText(primary.store.texts[self.current_subtitle_index])
 
             # Only auto-pause at current subtitle end if not playing until next subtitle
             if self.media_player.is_playing() and not self.next_subtitle_end_time:
-                end_time = (current_subtitle.end.hours * 3600 +
-                            current_subtitle.end.minutes * 60 +
-                            current_subtitle.end.seconds) * 1000 + current_subtitle.end.milliseconds
+                end_time = primary.timeline.ends[self.current_subtitle_index]
 
                 if current_time >= end_time:
-                    self.media_player.pause()
-                    self.is_playing = False
-
-                    # Keep subtitles visible based on visibility state
-                    if self.subtitle_visibility_state == 0:
-                        self.english_subtitle_label.setVisible(False)
-                        self.persian_subtitle_label.setVisible(False)
-                    elif self.subtitle_visibility_state == 1:
-                        self.english_subtitle_label.setVisible(True)
-                        self.persian_subtitle_label.setVisible(False)
-                    elif self.subtitle_visibility_state == 2:
-                        self.english_subtitle_label.setVisible(True)
-                        self.persian_subtitle_label.setVisible(True)
-        else:
-            self.english_subtitle_label.setText("")
-
-        # Update Persian subtitle based on current video time
-        if self.persian_subtitles:
-            persian_subtitle = self.find_persian_subtitle(current_time)
-            if persian_subtitle:
-                self.persian_subtitle_label.setText(persian_subtitle.text)
-            else:
-                self.persian_subtitle_label.setText("")
+                    self.pause_at_boundary(end_time)
         else:
-            self.persian_subtitle_label.setText("")
-
-    def find_persian_subtitle(self, current_time):
-        if not self.persian_subtitles:
+            primary.label.setText("")
+
+        # Update the other tracks to match the primary line
+        self.update_secondary_subtitles(segment)
+        self.schedule_subtitle_prepare()
+
+    def update_secondary_subtitles(self, segment):
+        for track in self.secondary_tracks:
+            track.label.setText(self.track_text_at(track, segment))
+
+    def schedule_subtitle_prepare(self):
+        if self.prepared_from_index != self.current_subtitle_index:
+            self.prepared_from_index = self.current_subtitle_index
+            QTimer.singleShot(0, self.prepare_upcoming_subtitles)
+
+    def prepare_upcoming_subtitles(self):
+        # Shape the next few lines while idle so cue changes only repaint,
+        # and move the standby player to the new line
+        self.park_standby()
+        if self.transcript_following:
+            self.transcript.set_current(self.current_subtitle_index)
+        primary = self.primary_track
+        if not primary.store:
+            return
+        first = self.current_subtitle_index + 1
+        last = min(len(primary.store), first + self.PREPARE_AHEAD)
+        for index in range(first, last):
+            primary.label.prepare(primary.store.texts[index])
+            for track in self.secondary_tracks:
+                track.label.prepare(self.track_text_for_index(track, index))
+
+    def set_subtitle_visibility(self, state):
+        # Show the tracks revealed at this practice state, except the ones
+        # the user switched off
+        self.subtitle_visibility_state = state
+        for track in self.tracks.values():
+            track.label.setVisible(track.shown and state >= track.reveal_step)
+
+    def toggle_subtitle_track(self, number):
+        tracks = list(self.tracks.values())
+        if number >= len(tracks):
+            return
+        track = tracks[number]
+        track.shown = not track.shown
+        track.label.setVisible(
+            track.shown and self.subtitle_visibility_state >= track.reveal_step)
+
+    def pause_at_boundary(self, target_time):
+        self.seek_monitor.pause_requested(target_time)
+        self.media_player.pause()
+        self.is_playing = False
+        self.cue_scheduler.record_hit(target_time)
+        self.cue_scheduler.set_playing(False)
+
+        # Keep subtitles visible based on visibility state
+        self.set_subtitle_visibility(self.subtitle_visibility_state)
+
+    def next_cue_deadline(self, current_time):
+        # Earliest moment the display or auto-pause state can change
+        deadlines = []
+        if self.next_subtitle_end_time:
+            deadlines.append(self.next_subtitle_end_time)
+
+        timeline = self.primary_track.timeline
+        if (timeline and not self.next_subtitle_end_time and
+                0 <= self.current_subtitle_index < len(timeline)):
+            deadlines.append(timeline.ends[self.current_subtitle_index])
+
+        # Next cue change on any track
+        if self.merged_timeline is not None:
+            boundary = self.merged_timeline.next_boundary(
+                self.merged_timeline.segment_at(current_time))
+            if boundary is not None:
+                deadlines.append(boundary)
+
+        return min(deadlines) if deadlines else None
+
+    def track_text_at(self, track, segment):
+        if not track.store:
+            return ""
+
+        # Pair with the current primary cue when the alignment covers it
+        text = self.track_text_for_index(track, self.current_subtitle_index)
+        if text is not None:
+            return text
+
+        # No primary track loaded: look it up by time
+        index = self.merged_timeline.cue_at(track.column, segment)
+        return track.store.texts[index] if index >= 0 else ""
+
+    def track_text_for_index(self, track, index):
+        # Track text aligned with primary cue index, None if not aligned
+        alignment = track.alignment
+        if alignment is None or not 0 <= index < len(alignment):
             return None
-
-        # Binary search for the appropriate Persian subtitle
-        left, right = 0, len(self.persian_subtitles) - 1
-
-        while left <= right:
-            mid = (left + right) // 2
-            subtitle = self.persian_subtitles[mid]
-
-            start_time = (subtitle.start.hours * 3600 +
-                          subtitle.start.minutes * 60 +
-                          subtitle.start.seconds) * 1000 + subtitle.start.milliseconds
-            end_time = (subtitle.end.hours * 3600 +
-                        subtitle.end.minutes * 60 +
-                        subtitle.end.seconds) * 1000 + subtitle.end.milliseconds
-
-            if start_time <= current_time <= end_time:
-                return subtitle
-            elif current_time < start_time:
-                right = mid - 1
-            else:
-                left = mid + 1
-
-        return None
+        texts = track.store.texts
+        return '\n'.join(texts[j] for j in alignment.partners(index))
 
     def play_until_next_subtitle(self):
-        if not self.english_subtitles or not self.media:
+        if not self.primary_track.store or not self.media:
             return
 
-        # Show both subtitles
-        self.subtitle_visibility_state = 2
-        self.english_subtitle_label.setVisible(True)
-        self.persian_subtitle_label.setVisible(True)
+        # Show all subtitles
+        self.set_subtitle_visibility(2)
 
         # If already playing to a next subtitle, extend to the one after that
         if self.next_subtitle_end_time and self.media_player.is_playing():
             next_index = self.current_subtitle_index + 1
-            if next_index < len(self.english_subtitles):
-                next_subtitle = self.english_subtitles[next_index]
-                self.next_subtitle_end_time = (next_subtitle.end.hours * 3600 +
-                                               next_subtitle.end.minutes * 60 +
-                                               next_subtitle.end.seconds) * 1000 + next_subtitle.end.milliseconds
+            if next_index < len(self.primary_track.store):
+                self.next_subtitle_end_time = self.primary_track.timeline.ends[next_index]
                 self.current_subtitle_index = next_index
             return
 
         # Normal case - play until next subtitle
-        if self.current_subtitle_index < len(self.english_subtitles) - 1:
-            next_subtitle = self.english_subtitles[self.current_subtitle_index + 1]
-            self.next_subtitle_end_time = (next_subtitle.end.hours * 3600 +
-                                           next_subtitle.end.minutes * 60 +
-                                           next_subtitle.end.seconds) * 1000 + next_subtitle.end.milliseconds
+        if self.current_subtitle_index < len(self.primary_track.store) - 1:
+            self.next_subtitle_end_time = self.primary_track.timeline.ends[
+                self.current_subtitle_index + 1]
             self.current_subtitle_index += 1
+            self.update_subtitle_text()
 
             # Start playing if not already playing
             if not self.media_player.is_playing():
@@ -600,22 +6022,17 @@ https://github.com/rabiejavadian/video-player-for-language-learners/releases/lat
                 self.is_playing = True
 
     def start_from_next_subtitle(self):
-        if not self.english_subtitles or not self.media:
+        if not self.primary_track.store or not self.media:
             return
 
-        # Show both subtitles
-        self.subtitle_visibility_state = 2
-        self.english_subtitle_label.setVisible(True)
-        self.persian_subtitle_label.setVisible(True)
+        # Show all subtitles
+        self.set_subtitle_visibility(2)
 
-        if self.current_subtitle_index < len(self.english_subtitles) - 1:
-            next_subtitle = self.english_subtitles[self.current_subtitle_index + 1]
-            start_time = (next_subtitle.start.hours * 3600 +
-                          next_subtitle.start.minutes * 60 +
-                          next_subtitle.start.seconds) * 1000 + next_subtitle.start.milliseconds
+        if self.current_subtitle_index < len(self.primary_track.store) - 1:
+            end_time = self.primary_track.timeline.ends[self.current_subtitle_index + 1]
 
             # Set video to start of next subtitle
-            self.media_player.set_time(start_time)
+            self.seek(self.cue_seek_time(self.current_subtitle_index + 1))
             self.current_subtitle_index += 1
             self.update_subtitle_text()
 
@@ -624,72 +6041,52 @@ https://github.com/rabiejavadian/video-player-for-language-learners/releases/lat
             self.is_playing = True
 
             # Set end time for auto-pause
-            end_time = (next_subtitle.end.hours * 3600 +
-                        next_subtitle.end.minutes * 60 +
-                        next_subtitle.end.seconds) * 1000 + next_subtitle.end.milliseconds
             self.next_subtitle_end_time = end_time
 
     def practice_subtitle_sequence(self):
-        if not self.english_subtitles or not self.media:
+        if not self.primary_track.store or not self.media:
             return
 
-        if 0 <= self.current_subtitle_index < len(self.english_subtitles):
+        if 0 <= self.current_subtitle_index < len(self.primary_track.store):
             # If not in practice mode or finished previous sequence, start new sequence
             if self.practice_step == 0:
-                subtitle = self.english_subtitles[self.current_subtitle_index]
-
                 # Calculate times
-                start_time = (subtitle.start.hours * 3600 +
-                              subtitle.start.minutes * 60 +
-                              subtitle.start.seconds) * 1000 + subtitle.start.milliseconds
-                end_time = (subtitle.end.hours * 3600 +
-                            subtitle.end.minutes * 60 +
-                            subtitle.end.seconds) * 1000 + subtitle.end.milliseconds
+                start_time, end_time = self.primary_track.timeline.span(
+                    self.current_subtitle_index)
 
                 # Store times for reuse
                 self.practice_times = (start_time, end_time)
                 self.practice_step = 1
 
                 # Step 1: Hide subtitles and play
-                self.subtitle_visibility_state = 0
-                self.english_subtitle_label.setVisible(False)
-                self.persian_subtitle_label.setVisible(False)
+                self.set_subtitle_visibility(0)
 
-                self.media_player.set_time(start_time)
+                self.seek(self.cue_seek_time(self.current_subtitle_index))
                 self.next_subtitle_end_time = end_time
                 self.media_player.play()
                 self.is_playing = True
 
             # Continue with next step based on current progress
             elif self.practice_step == 1:
-                # Step 2: Show English and repeat
-                subtitle = self.english_subtitles[self.current_subtitle_index]
-                start_time = (subtitle.start.hours * 3600 +
-                              subtitle.start.minutes * 60 +
-                              subtitle.start.seconds) * 1000 + subtitle.start.milliseconds
-                end_time = (subtitle.end.hours * 3600 +
-                            subtitle.end.minutes * 60 +
-                            subtitle.end.seconds) * 1000 + subtitle.end.milliseconds
+                # Step 2: Show the primary track and repeat
+                start_time, end_time = self.primary_track.timeline.span(
+                    self.current_subtitle_index)
 
                 self.practice_times = (start_time, end_time)
-                self.subtitle_visibility_state = 1
-                self.english_subtitle_label.setVisible(True)
-                self.persian_subtitle_label.setVisible(False)
+                self.set_subtitle_visibility(1)
 
-                self.media_player.set_time(start_time)
+                self.seek(self.cue_seek_time(self.current_subtitle_index))
                 self.next_subtitle_end_time = end_time
                 self.media_player.play()
                 self.is_playing = True
                 self.practice_step = 2
 
             elif self.practice_step == 2:
-                # Step 3: Show both subtitles and repeat
-                start_time, end_time = self.practice_times
-                self.subtitle_visibility_state = 2
-                self.english_subtitle_label.setVisible(True)
-                self.persian_subtitle_label.setVisible(True)
+                # Step 3: Show all subtitles and repeat
+                _, end_time = self.practice_times
+                self.set_subtitle_visibility(2)
 
-                self.media_player.set_time(start_time)
+                self.seek(self.cue_seek_time(self.current_subtitle_index))
                 self.next_subtitle_end_time = end_time
                 self.media_player.play()
                 self.is_playing = True
@@ -697,26 +6094,19 @@ https://github.com/rabiejavadian/video-player-for-language-learners/releases/lat
 
             elif self.practice_step == 3:
                 # Step 4: Continue to next subtitle with hidden subtitles
-                if self.current_subtitle_index < len(self.english_subtitles) - 1:
+                if self.current_subtitle_index < len(self.primary_track.store) - 1:
                     # Hide subtitles
-                    self.subtitle_visibility_state = 0
-                    self.english_subtitle_label.setVisible(False)
-                    self.persian_subtitle_label.setVisible(False)
+                    self.set_subtitle_visibility(0)
 
                     # Get current subtitle end time to start from
-                    current_subtitle = self.english_subtitles[self.current_subtitle_index]
-                    start_time = (current_subtitle.end.hours * 3600 +
-                                  current_subtitle.end.minutes * 60 +
-                                  current_subtitle.end.seconds) * 1000 + current_subtitle.end.milliseconds
+                    start_time = self.primary_track.timeline.ends[self.current_subtitle_index]
 
                     # Get next subtitle end time
-                    next_subtitle = self.english_subtitles[self.current_subtitle_index + 1]
-                    end_time = (next_subtitle.end.hours * 3600 +
-                                next_subtitle.end.minutes * 60 +
-                                next_subtitle.end.seconds) * 1000 + next_subtitle.end.milliseconds
+                    next_start_time, end_time = self.primary_track.timeline.span(
+                        self.current_subtitle_index + 1)
 
                     # Start from end of current subtitle
-                    self.media_player.set_time(start_time)
+                    self.seek(start_time)
                     self.next_subtitle_end_time = end_time
                     self.current_subtitle_index += 1
                     self.media_player.play()
@@ -724,13 +6114,43 @@ https://github.com/rabiejavadian/video-player-for-language-learners/releases/lat
                     self.practice_step = 1  # Set to step 1 for next practice sequence
 
                     # Store times for the next subtitle for subsequent steps
-                    next_subtitle = self.english_subtitles[self.current_subtitle_index]
-                    next_start_time = (next_subtitle.start.hours * 3600 +
-                                       next_subtitle.start.minutes * 60 +
-                                       next_subtitle.start.seconds) * 1000 + next_subtitle.start.milliseconds
                     self.practice_times = (next_start_time, end_time)
 
+    def toggle_performance_overlay(self):
+        if self.performance_overlay.isVisible():
+            self.performance_overlay.hide()
+            self.overlay_timer.stop()
+            self.dump_seek_report()
+        else:
+            self.update_performance_overlay()
+            self.performance_overlay.show()
+            self.performance_overlay.raise_()
+            self.overlay_timer.start()
+
+    def update_performance_overlay(self):
+        self.performance_overlay.setText('\n'.join(self.seek_monitor.summary_lines()))
+        self.performance_overlay.adjustSize()
+        self.performance_overlay.move(10, 10)
+
+    def dump_seek_report(self):
+        if not any(histogram.samples for histograms in self.seek_monitor.files.values()
+                   for histogram in histograms.values()):
+            return
+        try:
+            self.seek_monitor.dump(
+                os.path.join(app_cache_dir('diagnostics'), 'seek_latency.json'))
+        except OSError as e:
+            print(f"Error writing seek latency report: {e}")
+
     def closeEvent(self, event):
+        for language in list(self.subtitle_tasks):
+            self.cancel_subtitle_load(language)
+        self.cancel_audio_sync()
+        self.cancel_thumbnails()
+        self.cue_scheduler.detach()
+        self.dump_seek_report()
+        self.flush_review_writes()
+        self.review_pool.waitForDone()
         super().closeEvent(event)
 
     def create_buttons(self):
@@ -742,49 +6162,76 @@ https://github.com/rabiejavadian/video-player-for-language-learners/releases/lat
         open_button = QPushButton("Open Video")
         open_button.clicked.connect(self.open_file)
 
-        open_english_subtitle = QPushButton("Open English Subtitle")
-        open_english_subtitle.clicked.connect(
-            lambda: self.open_subtitle_file('english'))
+        library_button = QPushButton("Library")
+        library_button.clicked.connect(self.open_library)
+
+        add_track_button = QPushButton("Add Subtitle Track")
+        add_track_button.clicked.connect(self.add_subtitle_track_from_file)
 
-        open_persian_subtitle = QPushButton("Open Persian Subtitle")
-        open_persian_subtitle.clicked.connect(
-            lambda: self.open_subtitle_file('persian'))
+        sync_button = QPushButton("Sync Subtitles")
+        sync_button.clicked.connect(self.sync_subtitles)
+
+        search_button = QPushButton("Search")
+        search_button.clicked.connect(self.open_search)
 
         help_button = QPushButton("Keyboard Shortcuts")
         help_button.clicked.connect(self.show_shortcuts)
 
         # Store buttons as instance variables for fullscreen toggle
         self.open_button = open_button
-        self.open_english_subtitle_button = open_english_subtitle
-        self.open_persian_subtitle_button = open_persian_subtitle
+        self.library_button = library_button
+        self.add_track_button = add_track_button
+        self.sync_button = sync_button
+        self.search_button = search_button
         self.help_button = help_button
 
-        # Add buttons to layout
+        # Add buttons to layout, one per subtitle track after the video one
         button_layout.addWidget(open_button)
-        button_layout.addWidget(open_english_subtitle)
-        button_layout.addWidget(open_persian_subtitle)
+        button_layout.addWidget(library_button)
+        for track in self.tracks.values():
+            track.button = self.create_track_button(track)
+            button_layout.addWidget(track.button)
+        button_layout.addWidget(add_track_button)
+        button_layout.addWidget(sync_button)
+        button_layout.addWidget(search_button)
         button_layout.addWidget(help_button)
 
         # Style the buttons
-        for button in [open_button, open_english_subtitle, open_persian_subtitle, help_button]:
-            button.setStyleSheet("""
-                QPushButton {
-                    background-color: #2A2A2A;
-                    color: white;
-                    border: none;
-                    padding: 5px 15px;
-                    border-radius: 3px;
-                }
-                QPushButton:hover {
-                    background-color: #404040;
-                }
-                QPushButton:pressed {
-                    background-color: #505050;
-                }
-            """)
+        for button in [open_button, library_button, add_track_button, sync_button,
+                       search_button, help_button]:
+            self.style_button(button)
 
         return button_layout
 
+    def create_track_button(self, track):
+        button = QPushButton(f"Open {track.title} Subtitle")
+        button.clicked.connect(lambda: self.open_subtitle_file(track.key))
+        self.style_button(button)
+        return button
+
+    def style_button(self, button):
+        button.setStyleSheet("""
+            QPushButton {
+                background-color: #2A2A2A;
+                color: white;
+                border: none;
+                padding: 5px 15px;
+                border-radius: 3px;
+            }
+            QPushButton:hover {
+                background-color: #404040;
+            }
+            QPushButton:pressed {
+                background-color: #505050;
+            }
+        """)
+
+    def control_buttons(self):
+        # Buttons hidden in fullscreen
+        return ([self.open_button, self.library_button] + [track.button for track in self.tracks.values()] +
+                [self.add_track_button, self.sync_button, self.search_button,
+                 self.help_button])
+
     def show_shortcuts(self):
         shortcuts_text = """
 <h2>How to Use</h2>
@@ -792,6 +6239,7 @@ https://github.com/rabiejavadian/video-player-for-language-learners/releases/lat
     <ol>
         <li style='margin-bottom: 8px;'>Click 'Open Video' to select your video file</li>
         <li style='margin-bottom: 8px;'>Open English and Persian subtitle files</li>
+        <li style='margin-bottom: 8px;'>Optionally add more tracks (e.g. romanization or notes) with 'Add Subtitle Track'</li>
         <li style='margin-bottom: 8px;'>Press Spacebar to start playing</li>
     </ol>
 </div>
@@ -834,6 +6282,42 @@ https://github.com/rabiejavadian/video-player-for-language-learners/releases/lat
         <td style='padding: 8px; border: 1px solid #404040;'>Escape</td>
         <td style='padding: 8px; border: 1px solid #404040;'>Exit fullscreen</td>
     </tr>
+    <tr>
+        <td style='padding: 8px; border: 1px solid #404040;'>Ctrl + 1 to 9</td>
+        <td style='padding: 8px; border: 1px solid #404040;'>Show/hide subtitle track 1 to 9</td>
+    </tr>
+    <tr style='background-color: #2A2A2A;'>
+        <td style='padding: 8px; border: 1px solid #404040;'>P</td>
+        <td style='padding: 8px; border: 1px solid #404040;'>Show/hide seek and pause timings</td>
+    </tr>
+    <tr>
+        <td style='padding: 8px; border: 1px solid #404040;'>Ctrl + F</td>
+        <td style='padding: 8px; border: 1px solid #404040;'>Search the lines of all your subtitles</td>
+    </tr>
+    <tr style='background-color: #2A2A2A;'>
+        <td style='padding: 8px; border: 1px solid #404040;'>Ctrl + L</td>
+        <td style='padding: 8px; border: 1px solid #404040;'>Open a video from your library with its subtitles</td>
+    </tr>
+    <tr>
+        <td style='padding: 8px; border: 1px solid #404040;'>W</td>
+        <td style='padding: 8px; border: 1px solid #404040;'>Show/hide rare word highlights</td>
+    </tr>
+    <tr style='background-color: #2A2A2A;'>
+        <td style='padding: 8px; border: 1px solid #404040;'>T</td>
+        <td style='padding: 8px; border: 1px solid #404040;'>Show/hide the transcript panel; click a line to go to it</td>
+    </tr>
+    <tr>
+        <td style='padding: 8px; border: 1px solid #404040;'>Ctrl + E</td>
+        <td style='padding: 8px; border: 1px solid #404040;'>Export lines as audio or video clips</td>
+    </tr>
+    <tr style='background-color: #2A2A2A;'>
+        <td style='padding: 8px; border: 1px solid #404040;'>1 to 4</td>
+        <td style='padding: 8px; border: 1px solid #404040;'>Rate how well you knew the current line (1 again, 2 hard, 3 good, 4 easy)</td>
+    </tr>
+    <tr>
+        <td style='padding: 8px; border: 1px solid #404040;'>R</td>
+        <td style='padding: 8px; border: 1px solid #404040;'>Start/stop review mode: go through the lines due for review, across videos</td>
+    </tr>
 </table>
 
 <h3 style='margin-top: 15px;'>Practical Tips:</h3>
@@ -900,7 +6384,15 @@ https://github.com/rabiejavadian/video-player-for-language-learners/releases/lat
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # Word stats and clip export workers in the built executable
     app = QApplication(sys.argv)
+    startup_timeline.mark('qt_init')
+    if PROFILE_REQUESTED:
+        hot_path_profiler = HotPathProfiler(
+            os.path.join(app_cache_dir('diagnostics'), 'profile.log'))
+        hot_path_profiler.install()
+        app.aboutToQuit.connect(hot_path_profiler.flush)
     player = VideoPlayer()
+    startup_timeline.mark('window_created')
     player.show()
     sys.exit(app.exec())